@@ -0,0 +1,223 @@
+"""End-to-end benchmarks of the host-side hot paths, run against the simulated SmartWave device.
+
+The results can be saved as JSON and compared with the results of an earlier run, to track performance regressions
+between releases."""
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import random
+import struct
+import sys
+import threading
+import time
+
+from SmartWaveAPI import SmartWave
+from SmartWaveAPI.communication import SimulatedDevice, SimulatedTransport, StatusFrameDecoder, \
+    unpackReadbackSamples
+from SmartWaveAPI.configitems import Stimulus, I2CDriver
+from SmartWaveAPI.definitions import Statusbit
+
+_benchmarks = []
+
+
+def benchmark(name, unit):
+    """Register a benchmark function, which returns the number of processed units and the elapsed seconds."""
+    def register(function):
+        _benchmarks.append((name, unit, function))
+        return function
+    return register
+
+
+def timed(function, iterations):
+    """Call a function repeatedly and return the elapsed seconds."""
+    start = time.perf_counter()
+    for i in range(iterations):
+        function(i)
+    return time.perf_counter() - start
+
+
+@benchmark("i2c_write", "ops/s")
+def i2cWrite(sw, args):
+    with sw.createI2CConfig() as i2c:
+        return args.iterations, timed(lambda i: i2c.write(0x20, bytes([i & 0xff, 0x55])), args.iterations)
+
+
+@benchmark("i2c_read", "ops/s")
+def i2cRead(sw, args):
+    with sw.createI2CConfig() as i2c:
+        return args.iterations, timed(lambda i: i2c.read(0x20, 1 + i % 4), args.iterations)
+
+
+@benchmark("i2c_readRegister", "ops/s")
+def i2cReadRegister(sw, args):
+    with sw.createI2CConfig() as i2c:
+        return args.iterations, timed(lambda i: i2c.readRegister(0x20, bytes([i & 0xff]), 2), args.iterations)
+
+
+@benchmark("i2c_scanAddresses", "scans/s")
+def i2cScanAddresses(sw, args):
+    with sw.createI2CConfig() as i2c:
+        iterations = max(args.iterations // 100, 1)
+        return iterations, timed(lambda i: i2c.scanAddresses(), iterations)
+
+
+def spiWrite(sw, args, bit_width):
+    with sw.createSPIConfig(bit_width=bit_width) as spi:
+        words = 64
+        mask = (1 << bit_width) - 1
+        data = [[(i * words + j) & mask for j in range(words)] for i in range(16)]
+        return args.iterations * words, timed(lambda i: spi.write(data[i % 16]), args.iterations)
+
+
+for _bitWidth in (8, 16, 32):
+    benchmark("spi_write_%dbit" % _bitWidth, "words/s")(
+        lambda sw, args, bit_width=_bitWidth: spiWrite(sw, args, bit_width))
+
+
+def stimulusEncoding(sw, args, bit_width):
+    samples = [random.getrandbits(bit_width) for _ in range(4096)]
+    iterations = max(args.iterations // 10, 1)
+    return iterations * len(samples) * bit_width // 8, \
+        timed(lambda i: Stimulus.packSamples(samples, bit_width), iterations)
+
+
+for _bitWidth in (8, 16, 24, 32):
+    benchmark("stimulus_encoding_%dbit" % _bitWidth, "B/s")(
+        lambda sw, args, bit_width=_bitWidth: stimulusEncoding(sw, args, bit_width))
+
+
+@benchmark("readback_decoding", "B/s")
+def readbackDecoding(sw, args):
+    numSamples = 256
+    frame = struct.pack('>BBH%dI' % numSamples, Statusbit.Readback.value, 0, numSamples,
+                        *[random.getrandbits(32) for _ in range(numSamples)])
+    stream = frame * 64
+    decoder = StatusFrameDecoder()
+
+    def decode(i):
+        for statusFrame in decoder.feed(stream):
+            unpackReadbackSamples(statusFrame.payload[3:])
+
+    iterations = max(args.iterations // 10, 1)
+    return iterations * len(stream), timed(decode, iterations)
+
+
+@benchmark("i2c_result_decoding", "transactions/s")
+def i2cResultDecoding(sw, args):
+    samples = []
+    for i in range(64):
+        samples.append(8 | (0x20 << 8) | (1 << 17))
+        samples += [0x1000100 | 0x2000200 | random.getrandbits(8) | (random.getrandbits(8) << 16) for _ in range(4)]
+
+    iterations = max(args.iterations // 10, 1)
+    return iterations * 64, timed(lambda i: list(I2CDriver.decodeSamples(samples)), iterations)
+
+
+@benchmark("i2c_config_creation", "configs/s")
+def i2cConfigCreation(sw, args):
+    iterations = max(args.iterations // 10, 1)
+    return iterations, timed(lambda i: sw.createI2CConfig().delete(), iterations)
+
+
+@benchmark("spi_config_creation", "configs/s")
+def spiConfigCreation(sw, args):
+    iterations = max(args.iterations // 10, 1)
+    return iterations, timed(lambda i: sw.createSPIConfig().delete(), iterations)
+
+
+@benchmark("firmware_upload", "B/s")
+def firmwareUpload(sw, args):
+    done = threading.Event()
+    succeeded = []
+
+    def ok():
+        succeeded.append(True)
+        done.set()
+
+    sw.firmwareUpdateOKCallback = ok
+    sw.firmwareUpdateFailedCallback = done.set
+
+    start = time.perf_counter()
+    sw.updateFirmware()
+    finished = done.wait(10)
+    seconds = time.perf_counter() - start
+    if not finished:
+        raise TimeoutError("The firmware update did not finish within 10s")
+    if not succeeded:
+        raise Exception("The firmware update failed")
+    return SmartWave.FirmwareEnd - SmartWave.FirmwareStart, seconds
+
+
+@benchmark("bitstream_upload", "B/s")
+def bitstreamUpload(sw, args):
+    sw.firmwareUpdateStatusCallback = None
+    path = os.path.join(os.path.dirname(os.path.abspath(sys.modules[SmartWave.__module__].__file__)),
+                        "newest_fpga_bitstream.bin")
+
+    start = time.perf_counter()
+    sw.updateFPGABitstream(blocking=True)
+    return os.path.getsize(path), time.perf_counter() - start
+
+
+def packageVersion():
+    """Get the installed version of SmartWaveAPI, if it is installed."""
+    try:
+        from importlib.metadata import version
+        return version("SmartWaveAPI")
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=1000, help="number of operations per benchmark")
+    parser.add_argument("--latency", type=float, default=0.0, help="response latency of the simulated device in s")
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this string")
+    parser.add_argument("--output", help="save the results as JSON to this file")
+    parser.add_argument("--compare", help="compare the results with an earlier JSON result file")
+    args = parser.parse_args()
+
+    # the update benchmarks would otherwise print their progress between the results
+    logging.getLogger("SmartWaveAPI").addHandler(logging.NullHandler())
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {result["name"]: result["value"] for result in json.load(f)["results"]}
+
+    results = []
+    print("%-28s %16s %-16s %9s" % ("benchmark", "value", "unit", "change"))
+    for name, unit, function in _benchmarks:
+        if args.filter not in name:
+            continue
+
+        device = SimulatedDevice(latency=args.latency)
+        with SmartWave().connectTransport(SimulatedTransport(device)) as sw:
+            units, seconds = function(sw, args)
+
+        value = units / seconds
+        results.append({"name": name, "value": value, "unit": unit, "units": units, "seconds": seconds})
+
+        change = ""
+        if name in baseline and baseline[name]:
+            change = "%+8.1f%%" % ((value / baseline[name] - 1) * 100)
+        print("%-28s %16.1f %-16s %9s" % (name, value, unit, change))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "version": packageVersion(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "iterations": args.iterations,
+                "latency": args.latency,
+                "results": results,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Compare the bulk sample packing of Stimulus.packSamples with the previous per-byte loop."""
+import argparse
+import random
+import timeit
+
+from SmartWaveAPI.configitems import Stimulus
+
+
+def legacyPackSamples(samples, sample_bit_width):
+    """The sample packing as done by Stimulus.writeToDevice before the bulk conversion."""
+    shiftedSamples = []
+
+    for sample in samples:
+        bitShift = sample_bit_width - 8
+        while bitShift >= 0:
+            shiftedSamples.append((sample >> bitShift) & 0xff)
+
+            bitShift = bitShift - 8
+
+    return bytes(shiftedSamples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--samples", type=int, default=4096, help="number of samples per stimulus")
+    parser.add_argument("--repeat", type=int, default=20, help="number of conversions per measurement")
+    args = parser.parse_args()
+
+    print("%5s %14s %14s %9s" % ("width", "legacy [ms]", "bulk [ms]", "speedup"))
+    for bitWidth in (8, 16, 24, 32):
+        samples = [random.getrandbits(bitWidth) for _ in range(args.samples)]
+        assert Stimulus.packSamples(samples, bitWidth) == legacyPackSamples(samples, bitWidth)
+
+        legacy = min(timeit.repeat(lambda: legacyPackSamples(samples, bitWidth), number=args.repeat, repeat=3))
+        bulk = min(timeit.repeat(lambda: Stimulus.packSamples(samples, bitWidth), number=args.repeat, repeat=3))
+
+        print("%5d %14.3f %14.3f %8.1fx" % (bitWidth,
+                                             legacy * 1e3 / args.repeat,
+                                             bulk * 1e3 / args.repeat,
+                                             legacy / bulk))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,17 +7,37 @@ from SmartWaveAPI.definitions import I2CWrite, I2CRead, TriggerMode
 import time
 
 from fpga_reg import FPGA_Reg
+from SmartWaveAPI.registermap import RegisterMap
 
+_register_maps = {}
+
+
+def get_register_map(sw):
+    # compile the register description once per device, the map keeps the shadow of the written values
+    if sw not in _register_maps:
+        _register_maps[sw] = RegisterMap.fromDict(FPGA_Reg.registers, sw)
+    return _register_maps[sw]
+
+
+def forget_shadow(sw, address):
+    # a raw write bypasses the register map, so the map no longer knows the value of the register
+    if sw in _register_maps:
+        try:
+            _register_maps[sw].registerAt(address).invalidate()
+        except KeyError:
+            pass
 
 
 def set_register(sw, address, data):
     print("set register: addr: %x, data: %x" % (address, data))
     sw.writeFPGARegister(address, data)
+    forget_shadow(sw, address)
 
 
 def set_register_8bit(sw, address, data):
     print("set register: addr: %x, data: %x" % (address, data))
     sw.writeFPGARegister(address, data)
+    forget_shadow(sw, address)
 
 
 def read_register(sw, address):
@@ -27,20 +47,15 @@ def read_register(sw, address):
 
 
 def configure_core(sw, en=1, sync_count=1, subcycle_count=1):
-  localenv = FPGA_Reg.registers["wfg_core_top"]
-  addr = localenv["CFG"]["addr"]
-  sync_shift = localenv["CFG"]["SYNC"]["LSB"]
-  subcycle_shift = localenv["CFG"]["SUBCYCLE"]["LSB"]
-  set_register(sw, addr, (sync_count << sync_shift) | (subcycle_count << subcycle_shift))
-  addr = localenv["CTRL"]["addr"]
-  en_shift = localenv["CTRL"]["EN"]["LSB"]
-  set_register_8bit(sw, addr, en << en_shift)
+  core = get_register_map(sw).wfg_core_top
+  core.CFG.write(core.CFG.compose(SYNC=sync_count, SUBCYCLE=subcycle_count))
+  core.CTRL.write(core.CTRL.compose(EN=en))
 
 def configure_mem(sw, nbr, data_array):
   addr = FPGA_Reg.memory | (nbr << 13)
-  for dat in data_array:
-    set_register(sw, addr, dat)
-    addr = addr + 4
+  print("set memory %d: addr: %x, %d words" % (nbr, addr, len(data_array)))
+  # write all words of the memory in one transfer
+  sw.writeFPGARegisters(zip(range(addr, addr + 4 * len(data_array), 4), data_array))
 
 def configure_subcore(sw, en=1, sync_count=1, subcycle_count=1):
   set_register(sw, 0x42004, (sync_count << 0) | (subcycle_count << 8))
@@ -71,71 +86,44 @@ def configure_interconnect(sw, spi0=0xff, spi1=0xff, i2c0=0xff, uart0=0xff,recor
     set_register_8bit(sw, addr, recorder1)
 
 
-def configure_stim_mem(sw, localenv, en=1, count=0, start=0x0000, end=0x00FF, step=0x04, gain=0x0001, ier=0):
-  cnt_shift = localenv["CFG"]["CNT"]["LSB"]
-  addr = localenv["CFG"]["addr"]
-  set_register(sw, addr, count << cnt_shift)
-
-  start_shift = localenv["START"]["VAL"]["LSB"]
-  addr = localenv["START"]["addr"]
-  set_register(sw, addr, start << start_shift)
-
-  end_shift = localenv["STOP"]["VAL"]["LSB"]
-  addr = localenv["STOP"]["addr"]
-  set_register(sw, addr, end << end_shift)
-
-  step_shift = localenv["STEP"]["VAL"]["LSB"]
-  addr = localenv["STEP"]["addr"]
-  set_register(sw, addr, step << step_shift)
-
-  gain_shift = localenv["GAIN"]["VAL"]["LSB"]
-  addr = localenv["GAIN"]["addr"]
-  set_register(sw, addr, gain << gain_shift)
-
-  addr = localenv["IER"]["addr"]
-  set_register(sw, addr, 0)
-
-  en_shift = localenv["CTRL"]["EN"]["LSB"]
-  addr = localenv["CTRL"]["addr"]
-  set_register_8bit(sw, addr, en << en_shift)
+def configure_stim_mem(sw, block, en=1, count=0, start=0x0000, end=0x00FF, step=0x04, gain=0x0001, ier=0):
+  # unchanged registers are skipped, the rest is written in one transfer
+  get_register_map(sw).writeRegisters([
+    (block.CFG, block.CFG.compose(CNT=count)),
+    (block.START, block.START.compose(VAL=start)),
+    (block.STOP, block.STOP.compose(VAL=end)),
+    (block.STEP, block.STEP.compose(VAL=step)),
+    (block.GAIN, block.GAIN.compose(VAL=gain)),
+    (block.IER, 0),
+    (block.CTRL, block.CTRL.compose(EN=en)),
+  ])
 
 def configure_stim_mem_0(sw, en=1, count=0, start=0x0000, end=0x00FF, step=0x04, gain=0x0001):
-  localenv = FPGA_Reg.registers["wfg_stim_mem_top_0"]
-  configure_stim_mem(sw, localenv, en, count, start, end, step, gain)
+  configure_stim_mem(sw, get_register_map(sw).wfg_stim_mem_top_0, en, count, start, end, step, gain)
 
 def configure_stim_mem_1(sw, en=1, start=0x0000, end=0x00FF, step=0x04, gain=0x0001, count=0):
-  localenv = FPGA_Reg.registers["wfg_stim_mem_top_1"]
-  configure_stim_mem(sw, localenv, en, count, start, end, step, gain)
+  configure_stim_mem(sw, get_register_map(sw).wfg_stim_mem_top_1, en, count, start, end, step, gain)
 
 def configure_stim_mem_2(sw, en=1, start=0x0000, end=0x00FF, step=0x04, gain=0x0001, count=0):
-  localenv = FPGA_Reg.registers["wfg_stim_mem_top_2"]
-  configure_stim_mem(sw, localenv, en, count, start, end, step, gain)
+  configure_stim_mem(sw, get_register_map(sw).wfg_stim_mem_top_2, en, count, start, end, step, gain)
 
 def configure_stim_mem_3(sw, en=1, start=0x0000, end=0x00FF, step=0x04, gain=0x0001, count=0):
-  localenv = FPGA_Reg.registers["wfg_stim_mem_top_3"]
-  configure_stim_mem(sw, localenv, en, count, start, end, step, gain)
+  configure_stim_mem(sw, get_register_map(sw).wfg_stim_mem_top_3, en, count, start, end, step, gain)
 
 
 def reenable_stim_mem_0(sw, start=0x0000, end=0x00FF):
-  localenv = FPGA_Reg.registers["wfg_stim_mem_top_0"]
-
-  start_shift = localenv["START"]["VAL"]["LSB"]
-  addr = localenv["START"]["addr"]
-  set_register(sw, addr, start << start_shift)
-
-  end_shift = localenv["STOP"]["VAL"]["LSB"]
-  addr = localenv["STOP"]["addr"]
-  set_register(sw, addr, end << end_shift)
-
-  en_shift = localenv["CTRL"]["EN"]["LSB"]
-  addr = localenv["CTRL"]["addr"]
-  set_register_8bit(sw, addr, 1 << en_shift)
+  block = get_register_map(sw).wfg_stim_mem_top_0
+  # CTRL.EN clears itself, so it is written again even if the shadow says it was set
+  get_register_map(sw).writeRegisters([
+    (block.START, block.START.compose(VAL=start)),
+    (block.STOP, block.STOP.compose(VAL=end)),
+    (block.CTRL, block.CTRL.compose(EN=1)),
+  ])
 
 
 def clear_interrupt_stim_mem_0(sw):
-  localenv = FPGA_Reg.registers["wfg_stim_mem_top_0"]
-  addr = localenv["ICR"]["addr"]
-  set_register(sw, addr, 0x3)
+  # ICR is volatile, so the write always goes out
+  get_register_map(sw).wfg_stim_mem_top_0.ICR.write(0x3)
 
 
 
@@ -1,4 +1,7 @@
+from collections import deque
+
 from SmartWaveAPI import SmartWave
+from SmartWaveAPI.definitions import I2CWrite, I2CRead
 
 def main():
     with SmartWave().connect() as sw:
@@ -12,11 +15,15 @@ def main():
             )
             print(i2c.readRegister(0b1101010, [0x0f], 1))
 
+            # keep several register reads in flight to saturate the link
+            readAccel = [I2CWrite(devId, [0x2A]), I2CRead(devId, 2)]
+            pending = deque(i2c.submitTransactions(readAccel) for _ in range(4))
 
             while True:
-                ret1 = i2c.readRegister(0b1101010, [0x2A], 2)
+                ret1 = pending.popleft().result(timeout=1.0)[1].data
+                pending.append(i2c.submitTransactions(readAccel))
                 print("-" * (int(int.from_bytes(ret1, 'little', signed=True) / 300) + 150))
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
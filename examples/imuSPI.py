@@ -1,7 +1,6 @@
 from SmartWaveAPI import SmartWave
 import time
 
-cycle_time = 0.001
 def main():
     with (SmartWave().connect() as sw):
         # sw.createSPIConfig(miso_pin_name="B1", mosi_pin_name="B2", cs_pin_name="B3", sclk_pin_name="B4")
@@ -21,15 +20,12 @@ def main():
             spi.write([0x1010])
 
             start = time.time()
-            next_time = start + cycle_time
-            while True:
-                # while (time.time() < next_time):
-                #     pass
-                val = spi.write([0xaa00])[0]
-                val = val if val < 0x8000 else val - 0x10000
-                print(val)
-                next_time += cycle_time
-                # input()
+            # keep several reads in flight, so the sensor is sampled as fast as the device can go
+            with spi.stream([0xaa00], max_blocks=256, in_flight=8) as stream:
+                for block in stream:
+                    val = block[0]
+                    val = val if val < 0x8000 else val - 0x10000
+                    print(val)
 
             print(time.time() - start)
 
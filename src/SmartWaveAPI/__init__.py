@@ -1,3 +1,5 @@
 """An API for Semify's SmartWave."""
 
 from SmartWaveAPI.smartwave import SmartWave
+from SmartWaveAPI.asyncsmartwave import AsyncSmartWave, AsyncI2CConfig, AsyncSPIConfig
+from SmartWaveAPI.fleet import FleetUpdater, SmartWaveFleet
@@ -0,0 +1,312 @@
+import asyncio
+import functools
+from concurrent.futures import Future
+from typing import List, Optional, Union, TypeVar, Awaitable, Iterable, Dict, Tuple, Callable
+
+from SmartWaveAPI.smartwave import SmartWave
+from SmartWaveAPI.configitems.i2cconfig import I2CConfig
+from SmartWaveAPI.configitems.spiconfig import SPIConfig
+from SmartWaveAPI.definitions import I2CTransaction, I2CWrite, I2CRead, I2CTransactionResult
+
+_T = TypeVar("_T")
+
+
+async def _runBlocking(function: Callable[..., _T], *args, **kwargs) -> _T:
+    """Call a blocking function of the SmartWave device in the default executor of the running event loop.
+
+    Writes to the device wait for the serial port, so they are never made on the event loop thread.
+
+    :param Callable function: The function to call
+    :return: The return value of the function"""
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(function, *args, **kwargs))
+
+
+async def _awaitFuture(future: Union[Future, Awaitable[_T]], timeout: Union[float, None], message: str) -> _T:
+    """Await a future of the SmartWave device on the running event loop.
+
+    If the timeout is exceeded, the future is cancelled and the response is dropped when it arrives.
+
+    :param Union[Future, Awaitable] future: The future to wait for
+    :param Union[float, None] timeout: How long to wait for the response from the device in seconds,
+        or None to wait indefinitely
+    :param str message: The message of the TimeoutError
+    :return: The result of the future
+    :raises TimeoutError: If the timeout for reading back from the device is exceeded."""
+    try:
+        if isinstance(future, Future):
+            future = asyncio.wrap_future(future)
+        return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutError(message)
+
+
+class AsyncI2CConfig:
+    """An awaitable front-end for an I2C config of a SmartWave device."""
+
+    def __init__(self, config: I2CConfig):
+        """Create a new awaitable front-end for an I2C config.
+
+        :param I2CConfig config: The I2C config to wrap"""
+        self.config: I2CConfig = config
+
+    async def __aenter__(self):
+        """Enter - return instance."""
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Exit - delete config"""
+        await _runBlocking(self.delete)
+
+    def delete(self):
+        """Delete the wrapped config and return all resources to the device.
+
+        Blocks while the changes are written to the device."""
+        self.config.delete()
+
+    async def sendTransactions(self,
+                               transactions: List[I2CTransaction],
+                               timeout: Union[float, None] = 1.0) -> List[I2CTransactionResult]:
+        """Send a transaction over I2C with the connected device.
+
+        :param List[I2CTransaction] transactions: The transaction to perform on the bus
+        :param Union[float, None] timeout: How long to wait for the response from the device in seconds.
+            Default 1s, set to None to deactivate timeout.
+        :return: The information about the transaction on the I2C bus
+        :rtype: List[I2CTransactionResult]
+        :raises TimeoutError: If the timeout for reading back from the device is exceeded."""
+        future = await _runBlocking(self.config.submitTransactions, transactions)
+        return await _awaitFuture(future, timeout, "Timeout waiting for readback from device.")
+
+    async def write(self,
+                    device_id: int,
+                    data: bytes,
+                    timeout: Union[float, None] = 1.0) -> I2CTransactionResult:
+        """Write bytes over I2C with the connected device.
+
+        :param int device_id: The I2C device ID to write to
+        :param bytes data: The bytes to write to the I2C bus
+        :param Union[float, None] timeout: How long to wait for the response from the device in seconds.
+            Default 1s, set to None to deactivate timeout.
+        :return: The information on the transaction on the I2C bus
+        :rtype: I2CTransactionResult
+        :raises TimeoutError: If the timeout for reading back from the device is exceeded."""
+        return (await self.sendTransactions([I2CWrite(device_id, data)], timeout))[0]
+
+    async def writeRegister(self,
+                            device_id: int,
+                            address: bytes,
+                            value: bytes,
+                            timeout: Union[float, None] = 1.0) -> bool:
+        """Write to a register on an I2C device.
+
+        :param int device_id: The I2C device ID to write to
+        :param bytes address: The address bytes of the target I2C register
+        :param bytes value: The value bytes of the target I2C register
+        :param Union[float, None] timeout: How long to wait for the response from the device in seconds.
+            Default 1s, set to None to deactivate timeout.
+        :return: True if the transaction succeeded
+        :rtype: True
+        :raises ConnectionError: If the transaction on the I2C bus was not acknowledged by the target device.
+        :raises TimeoutError: If the timeout for reading back from the device is exceeded."""
+        return I2CConfig._checkWriteRegisterResult(await self.write(device_id, address + value, timeout))
+
+    async def read(self,
+                   device_id: int,
+                   length: int,
+                   timeout: Union[float, None] = 1.0) -> I2CTransactionResult:
+        """Read bytes from an I2C device.
+
+        :param int device_id: The I2C device ID to read from
+        :param int length: The number of bytes to read
+        :param Union[float, None] timeout: How long to wait for the response from the device in seconds.
+            Default 1s, set to None to deactivate timeout.
+        :return: The information on the transaction on the I2C bus
+        :rtype: I2CTransactionResult
+        :raises TimeoutError: If the timeout for reading back from the device is exceeded."""
+        return (await self.sendTransactions([I2CRead(device_id, length)], timeout))[0]
+
+    async def readRegister(self,
+                           device_id: int,
+                           address: bytes,
+                           length: int,
+                           timeout: Union[float, None] = 1.0) -> bytes:
+        """Read bytes from an I2C device at a specified address.
+
+        :param int device_id: The I2C device ID to read from
+        :param bytes address: The address bytes where to read from on the I2C device
+        :param int length: The number of bytes to read
+        :param Union[float, None] timeout: How long to wait for the response from the device in seconds.
+            Default 1s, set to None to deactivate timeout.
+        :return: The read bytes from the target device
+        :rtype: bytes
+        :raises ConnectionError: If the transaction on the I2C bus was not acknowledged by the target device.
+        :raises TimeoutError: If the timeout for reading back from the device is exceeded."""
+        res = await self.sendTransactions([
+            I2CWrite(device_id, address),
+            I2CRead(device_id, length)
+        ], timeout)
+        return I2CConfig._checkReadRegisterResult(res)
+
+
+class AsyncSPIConfig:
+    """An awaitable front-end for an SPI config of a SmartWave device."""
+
+    def __init__(self, config: SPIConfig):
+        """Create a new awaitable front-end for an SPI config.
+
+        :param SPIConfig config: The SPI config to wrap"""
+        self.config: SPIConfig = config
+
+    async def __aenter__(self):
+        """Enter - return instance."""
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Exit - delete config"""
+        await _runBlocking(self.delete)
+
+    def delete(self):
+        """Delete the wrapped config and return all resources to the device.
+
+        Blocks while the changes are written to the device."""
+        self.config.delete()
+
+    async def write(self, data: List[int], timeout: Union[float, None] = 1.0) -> List[int]:
+        """Write data over SPI with the connected device.
+
+        :param List[int] data: The data to write
+        :param Union[float, None] timeout: How long to wait for the response from the device in seconds.
+            Default 1s, set to None to deactivate timeout.
+        :return: The values that were read over SPI
+        :rtype: List[int]
+        :raises TimeoutError: If the timeout for reading back from the device is exceeded."""
+        future = await _runBlocking(self.config.submitWrite, data)
+        return await _awaitFuture(future, timeout, "Timeout waiting for readback from device.")
+
+
+class AsyncSmartWave:
+    """An awaitable front-end for a SmartWave device, to be used from an asyncio event loop.
+
+    The device's reading thread resolves the futures of all outstanding requests, which are awaited on the event
+    loop. This way any number of concurrent operations share one event loop, without a thread per operation.
+    Writing a request to the device waits for the serial port, so it is done in the default executor of the event
+    loop, and only waiting for the response happens on the event loop itself."""
+
+    def __init__(self, device: Optional[SmartWave] = None):
+        """Create a new AsyncSmartWave instance.
+
+        :param Optional[SmartWave] device: The SmartWave device to wrap. By default, a new instance is created."""
+        self.device: SmartWave = device if device is not None else SmartWave()
+
+    async def __aenter__(self):
+        """Enter - return instance."""
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Exit - disconnect from device."""
+        if self.device.isConnected():
+            await self.disconnect()
+
+    async def connect(self,
+                      port_name: str = None,
+                      reset: bool = True,
+                      request_info: bool = True,
+                      configure_general: bool = True):
+        """Try to connect to a SmartWave device at the specified port, or scan for one if no port is specified.
+
+        Opening the port blocks, so it is done in the default executor of the event loop.
+
+        :param str port_name: The name of the port to connect to
+        :param bool reset: Reset the device after connection
+        :param bool request_info: Request info from the device after connection
+        :param bool configure_general: Configure general with the default values
+        :return: Self
+        :rtype: AsyncSmartWave
+        :raises ConnectionRefusedError: If no connection could be established
+        :raises AttributeError: If the device at the specified port is not a SmartWave device"""
+        loop = asyncio.get_running_loop()
+        # scan with all parameters, SmartWave.connect only passes on reset when scanning
+        if port_name is None:
+            await loop.run_in_executor(None, self.device.scanAndConnect, reset, request_info, configure_general)
+        else:
+            await loop.run_in_executor(None, self.device.connect, port_name, reset, request_info, configure_general)
+        return self
+
+    async def disconnect(self):
+        """Disconnect from the connected device.
+
+        Waiting for the device threads to finish blocks, so it is done in the default executor of the event loop."""
+        await asyncio.get_running_loop().run_in_executor(None, self.device.disconnect)
+
+    def isConnected(self) -> bool:
+        """Return whether a device connection is currently active.
+
+        :return: True if the device is connected, False otherwise"""
+        return self.device.isConnected()
+
+    async def trigger(self):
+        """Start or Stop the current configuration on the connected device."""
+        await _runBlocking(self.device.trigger)
+
+    async def readFPGARegister(self, address: int, timeout: Union[float, None] = 1.0) -> int:
+        """Read directly from a register on the SmartWave's FPGA.
+
+        :param int address: The address to read from
+        :param Union[float, None] timeout: How long to wait for the response from the device in seconds.
+            Default 1s, set to None to deactivate timeout.
+        :return: The content of the specified register
+        :rtype: int
+        :raises TimeoutError: If the timeout for reading back from the device is exceeded."""
+        future = await _runBlocking(self.device.submitFPGARead, address)
+        return await _awaitFuture(future, timeout, "Timeout waiting for FPGA register read from device.")
+
+    async def writeFPGARegister(self, address: int, value: int):
+        """Write directly to a register on the SmartWave's FPGA.
+
+        :param int address: The address to write to
+        :param int value: The value to write"""
+        await _runBlocking(self.device.writeFPGARegister, address, value)
+
+    async def readFPGARegisters(self, addresses: Iterable[int], timeout: Union[float, None] = 1.0) -> List[int]:
+        """Read directly from several registers on the SmartWave's FPGA in one pipelined transfer.
+
+        :param Iterable[int] addresses: The addresses to read from, e.g. a range
+        :param Union[float, None] timeout: How long to wait for all responses from the device in seconds.
+            Default 1s, set to None to deactivate timeout.
+        :return: The contents of the specified registers, in the order of the addresses
+        :rtype: List[int]
+        :raises TimeoutError: If the timeout for reading back from the device is exceeded."""
+        futures = await _runBlocking(self.device.submitFPGAReads, addresses)
+        try:
+            return list(await _awaitFuture(asyncio.gather(*[asyncio.wrap_future(future) for future in futures]),
+                                           timeout, "Timeout waiting for FPGA register read from device."))
+        finally:
+            for future in futures:
+                future.cancel()
+
+    async def writeFPGARegisters(self, registers: Union[Dict[int, int], Iterable[Tuple[int, int]]]):
+        """Write directly to several registers on the SmartWave's FPGA in one transfer.
+
+        :param Union[Dict[int, int], Iterable[Tuple[int, int]]] registers: The addresses and values to write,
+            as a dict or as (address, value) pairs"""
+        await _runBlocking(self.device.writeFPGARegisters, registers)
+
+    async def createI2CConfig(self, *args, **kwargs) -> AsyncI2CConfig:
+        """Create an I2C config on the device and wrap it in an awaitable front-end.
+
+        Takes the same parameters as SmartWave.createI2CConfig. The config is written to the device in the default
+        executor of the event loop.
+
+        :return: The awaitable I2C config
+        :rtype: AsyncI2CConfig"""
+        return AsyncI2CConfig(await _runBlocking(self.device.createI2CConfig, *args, **kwargs))
+
+    async def createSPIConfig(self, *args, **kwargs) -> AsyncSPIConfig:
+        """Create an SPI config on the device and wrap it in an awaitable front-end.
+
+        Takes the same parameters as SmartWave.createSPIConfig. The config is written to the device in the default
+        executor of the event loop.
+
+        :return: The awaitable SPI config
+        :rtype: AsyncSPIConfig"""
+        return AsyncSPIConfig(await _runBlocking(self.device.createSPIConfig, *args, **kwargs))
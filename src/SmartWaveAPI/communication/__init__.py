@@ -0,0 +1,12 @@
+"""The building blocks for the communication with a SmartWave device: the transports to reach a device over, a
+simulated device, the splitting of command and status frames, the tuning of the write chunk size, the
+communication statistics, the capture and replay of the byte streams and the heartbeats of many devices."""
+
+from SmartWaveAPI.communication.statusframedecoder import *
+from SmartWaveAPI.communication.commandframe import *
+from SmartWaveAPI.communication.chunksizetuner import *
+from SmartWaveAPI.communication.transport import *
+from SmartWaveAPI.communication.simulateddevice import *
+from SmartWaveAPI.communication.statistics import *
+from SmartWaveAPI.communication.capture import *
+from SmartWaveAPI.communication.heartbeat import *
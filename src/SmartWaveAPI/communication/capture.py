@@ -0,0 +1,301 @@
+import mmap
+import struct
+import threading
+import time
+from enum import Enum
+from typing import BinaryIO, Dict, Iterator, Optional, Union
+
+from SmartWaveAPI.definitions import Command, Statusbit, StimulusType, DriverType
+from SmartWaveAPI.configitems.i2cdriver import I2CDriver
+from SmartWaveAPI.communication.commandframe import commandFrameLength
+from SmartWaveAPI.communication.statusframedecoder import StatusFrameDecoder, unpackReadbackSamples
+from SmartWaveAPI.communication.simulateddevice import SimulatedDevice
+
+# file header: magic, format version, start time in seconds since the epoch
+_fileHeader = struct.Struct('<6sBxd')
+_magic = b'SWCAP\0'
+_version = 1
+# record header: nanoseconds since the start of the capture, length of the data, direction
+_recordHeader = struct.Struct('<QIB3x')
+
+
+class CaptureDirection(Enum):
+    """The direction of the bytes of a capture record."""
+    Sent = 0
+    Received = 1
+
+
+class CaptureRecord(object):
+    """A piece of the byte stream between the host and a device, as it was written or read in one call."""
+    __slots__ = ('timestamp', 'direction', 'data')
+
+    def __init__(self, timestamp: int, direction: CaptureDirection, data: memoryview):
+        """Create a capture record. Only to be called by the CaptureReader.
+
+        :param int timestamp: The time of the write or read in nanoseconds since the start of the capture
+        :param CaptureDirection direction: Whether the bytes were sent to or received from the device
+        :param memoryview data: The bytes. This is a view into the capture file, which is only valid until the
+            CaptureReader is closed; copy it if it needs to be kept for longer."""
+        self.timestamp: int = timestamp
+        self.direction: CaptureDirection = direction
+        self.data: memoryview = data
+
+
+class CaptureWriter(object):
+    """Records the byte streams sent to and received from a device, with timestamps, into a binary capture file.
+
+    The file starts with a 16 byte header, followed by one record per write or read: a 16 byte little-endian record
+    header with the timestamp in nanoseconds, the length and the direction, followed by the bytes. Records are
+    appended as they happen, so a capture which was interrupted can still be read up to its last complete record.
+    See SmartWave.startCapture() to capture the communication of a device."""
+
+    def __init__(self, path: str):
+        """Create a new capture file, replacing an existing one.
+
+        :param str path: The path of the capture file
+        :raises OSError: If the file could not be created"""
+        self._lock = threading.Lock()
+        self._file: Optional[BinaryIO] = open(path, "wb")
+        self._start: int = time.perf_counter_ns()
+        self._file.write(_fileHeader.pack(_magic, _version, time.time()))
+
+    def __enter__(self):
+        """Enter - return instance."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Exit - close the file."""
+        self.close()
+
+    def _record(self, direction: CaptureDirection, data: Union[bytes, bytearray, memoryview]):
+        """Append a record to the capture file.
+
+        :param CaptureDirection direction: Whether the bytes were sent to or received from the device
+        :param Union[bytes, bytearray, memoryview] data: The bytes"""
+        timestamp = time.perf_counter_ns() - self._start
+        with self._lock:
+            if self._file is not None:
+                self._file.write(_recordHeader.pack(timestamp, len(data), direction.value))
+                self._file.write(data)
+
+    def sent(self, data: Union[bytes, bytearray, memoryview]):
+        """Record bytes sent to the device.
+
+        :param Union[bytes, bytearray, memoryview] data: The sent bytes"""
+        self._record(CaptureDirection.Sent, data)
+
+    def received(self, data: Union[bytes, bytearray, memoryview]):
+        """Record bytes received from the device.
+
+        :param Union[bytes, bytearray, memoryview] data: The received bytes"""
+        self._record(CaptureDirection.Received, data)
+
+    def close(self):
+        """Flush and close the capture file. Data recorded afterwards is dropped."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class CaptureReader(object):
+    """Reads a capture file written by a CaptureWriter, by memory-mapping it without copying the recorded bytes."""
+
+    def __init__(self, path: str):
+        """Open and memory-map a capture file.
+
+        :param str path: The path of the capture file
+        :raises OSError: If the file could not be opened
+        :raises ValueError: If the file is not a capture file"""
+        with open(path, "rb") as f:
+            size = f.seek(0, 2)
+            if size < _fileHeader.size:
+                raise ValueError("%s is not a SmartWave capture file" % path)
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, startTime = _fileHeader.unpack_from(self._mmap, 0)
+        if magic != _magic:
+            self._mmap.close()
+            raise ValueError("%s is not a SmartWave capture file" % path)
+        if version != _version:
+            self._mmap.close()
+            raise ValueError("Unsupported capture file version %d" % version)
+
+        self.startTime: float = startTime
+        self._view: memoryview = memoryview(self._mmap)
+
+    def __enter__(self):
+        """Enter - return instance."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Exit - close the file."""
+        self.close()
+
+    def __iter__(self) -> Iterator[CaptureRecord]:
+        return self.records()
+
+    def records(self, direction: Optional[CaptureDirection] = None) -> Iterator[CaptureRecord]:
+        """Iterate over the records of the capture, in the order they were recorded.
+
+        A record which was cut off at the end of the file is skipped.
+
+        :param Optional[CaptureDirection] direction: Only return the records of this direction, or None for all
+        :return: An iterator over the records
+        :rtype: Iterator[CaptureRecord]"""
+        view = self._view
+        size = len(view)
+        position = _fileHeader.size
+        unpack = _recordHeader.unpack_from
+        headerSize = _recordHeader.size
+
+        while position + headerSize <= size:
+            timestamp, length, directionValue = unpack(view, position)
+            dataStart = position + headerSize
+            position = dataStart + length
+            if position > size:
+                break
+
+            recordDirection = CaptureDirection(directionValue)
+            if direction is None or recordDirection == direction:
+                yield CaptureRecord(timestamp, recordDirection, view[dataStart:position])
+
+    def close(self):
+        """Close the capture file.
+
+        If the data of records is still referenced, the file is closed once the last reference is gone instead."""
+        self._view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+
+
+class ReplayResult(object):
+    """The outcome of replaying a capture."""
+
+    def __init__(self):
+        self.bytes: int = 0
+        self.records: int = 0
+        self.frames: Dict[str, int] = {}
+        self.i2cTransactions: int = 0
+        self.samples: int = 0
+        self.seconds: float = 0.0
+
+    def __repr__(self) -> str:
+        return "ReplayResult(%d bytes in %d records, %d frames, %.6f s, %.1f MB/s)" % \
+            (self.bytes, self.records, sum(self.frames.values()), self.seconds, self.throughput() / 1e6)
+
+    def throughput(self) -> float:
+        """Get the replayed bytes per second.
+
+        :return: The throughput in bytes per second
+        :rtype: float"""
+        return self.bytes / self.seconds if self.seconds else 0.0
+
+
+def _frameName(statusbit: int) -> str:
+    """Get the name of a status bit, or its hex value if it is unknown."""
+    try:
+        return Statusbit(statusbit).name
+    except ValueError:
+        return "0x%02x" % statusbit
+
+
+def replayToDecoder(reader: CaptureReader, decode_results: bool = True) -> ReplayResult:
+    """Replay the received stream of a capture through the status frame decoder at full speed.
+
+    The sent stream is followed to know which recorders are connected to I2C drivers, so their readbacks can be
+    decoded into I2C transactions like the I2C configs do, and the readbacks of other recorders into samples.
+
+    :param CaptureReader reader: The capture to replay
+    :param bool decode_results: Also decode the readbacks like the configs do, not only split the stream into frames
+    :return: The replayed bytes, the decoded frames and the time it took
+    :rtype: ReplayResult"""
+    result = ReplayResult()
+    decoder = StatusFrameDecoder()
+    sent = bytearray()
+    i2cRecorders = set()
+    elapsed = 0.0
+
+    for record in reader:
+        if record.direction == CaptureDirection.Sent:
+            sent += record.data
+            position = 0
+            while position < len(sent):
+                try:
+                    length = commandFrameLength(sent, position)
+                except ValueError:
+                    length = 1
+                if length is None or position + length > len(sent):
+                    break
+
+                if sent[position] == Command.StimulusDriverMatrix.value and length == 7:
+                    if sent[position + 1] != StimulusType.NoStimulus.value and \
+                            sent[position + 3] == DriverType.I2C.value:
+                        i2cRecorders.add(sent[position + 2])
+                    else:
+                        i2cRecorders.discard(sent[position + 2])
+                position += length
+            del sent[:position]
+            continue
+
+        start = time.perf_counter()
+        frames = decoder.feed(record.data)
+        for frame in frames:
+            if decode_results and frame.statusbit == Statusbit.Readback.value:
+                samples = unpackReadbackSamples(frame.payload[3:])
+                result.samples += len(samples)
+                if frame.payload[0] in i2cRecorders:
+                    result.i2cTransactions += len(list(I2CDriver.decodeSamples(samples)))
+        elapsed += time.perf_counter() - start
+
+        for frame in frames:
+            name = _frameName(frame.statusbit)
+            result.frames[name] = result.frames.get(name, 0) + 1
+        # release the payloads, so the decoder compacts its receive buffer in place
+        frames = frame = None
+        result.bytes += len(record.data)
+        result.records += 1
+
+    result.seconds = elapsed
+    return result
+
+
+def replayToDevice(reader: CaptureReader, device: Optional[SimulatedDevice] = None, realtime: bool = False) -> ReplayResult:
+    """Replay the sent stream of a capture against a simulated device, and decode the device's answers.
+
+    :param CaptureReader reader: The capture to replay
+    :param Optional[SimulatedDevice] device: The device to replay against. By default, a new one without latency.
+    :param bool realtime: Keep the original timing of the capture instead of replaying at full speed
+    :return: The replayed bytes, the frames the device answered with and the time it took
+    :rtype: ReplayResult"""
+    if device is None:
+        device = SimulatedDevice()
+
+    result = ReplayResult()
+    decoder = StatusFrameDecoder()
+    outputLock = threading.Lock()
+
+    def output(data: bytes):
+        with outputLock:
+            for frame in decoder.feed(data):
+                name = _frameName(frame.statusbit)
+                result.frames[name] = result.frames.get(name, 0) + 1
+
+    device.setOutput(output)
+    start = time.perf_counter()
+    try:
+        for record in reader.records(CaptureDirection.Sent):
+            if realtime:
+                delay = record.timestamp / 1e9 - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            device.receive(bytes(record.data))
+            result.bytes += len(record.data)
+            result.records += 1
+        device.waitUntilSent()
+        result.seconds = time.perf_counter() - start
+    finally:
+        device.close()
+    return result
@@ -0,0 +1,58 @@
+"""Show or replay SmartWave capture files from the command line, e.g.
+
+    python -m SmartWaveAPI.communication.capturetool replay session.swcap --target decoder --repeat 10"""
+import argparse
+import time
+from typing import Dict, List, Optional, Sequence
+
+from SmartWaveAPI.communication.capture import CaptureDirection, CaptureReader, replayToDecoder, replayToDevice
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    """Show or replay SmartWave capture files from the command line.
+
+    :param Optional[Sequence[str]] argv: The command line arguments, by default those of the process"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="action", required=True)
+
+    infoParser = subparsers.add_parser("info", help="show a summary of a capture")
+    infoParser.add_argument("capture", help="the capture file")
+    infoParser.add_argument("--records", action="store_true", help="list every record")
+
+    replayParser = subparsers.add_parser("replay", help="replay a capture")
+    replayParser.add_argument("capture", help="the capture file")
+    replayParser.add_argument("--target", choices=("decoder", "device"), default="decoder",
+                              help="replay the received stream through the decoder, or the sent stream against "
+                                   "a simulated device")
+    replayParser.add_argument("--realtime", action="store_true",
+                              help="keep the original timing when replaying against a device")
+    replayParser.add_argument("--repeat", type=int, default=1, help="number of times to replay the capture")
+    args = parser.parse_args(argv)
+
+    with CaptureReader(args.capture) as reader:
+        if args.action == "info":
+            totals: Dict[CaptureDirection, List[int]] = {direction: [0, 0] for direction in CaptureDirection}
+            duration = 0
+            for record in reader:
+                totals[record.direction][0] += 1
+                totals[record.direction][1] += len(record.data)
+                duration = record.timestamp
+                if args.records:
+                    print("%12.6f %-8s %6d  %s" % (record.timestamp / 1e9, record.direction.name, len(record.data),
+                                                   bytes(record.data[:16]).hex()))
+
+            print("started %s, %.3f s" % (time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(reader.startTime)),
+                                          duration / 1e9))
+            for direction, (records, size) in totals.items():
+                print("%-8s %8d records %12d bytes" % (direction.name, records, size))
+
+        else:
+            for i in range(args.repeat):
+                if args.target == "decoder":
+                    print(replayToDecoder(reader))
+                else:
+                    print(replayToDevice(reader, realtime=args.realtime))
+
+
+if __name__ == "__main__":
+    main()
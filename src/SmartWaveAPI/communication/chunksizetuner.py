@@ -0,0 +1,76 @@
+from typing import Dict, List, Optional, Sequence
+
+# the maximum packet size of the full-speed USB bulk endpoints of the SmartWave's CDC interface
+UsbPacketSize: int = 64
+
+
+class ChunkSizeTuner(object):
+    """Find the chunk size with the highest throughput for large writes to the device by measuring.
+
+    Each candidate chunk size is tried for a number of chunks, and the one with the highest measured throughput is
+    used from then on."""
+
+    def __init__(self,
+                 candidates: Optional[Sequence[int]] = None,
+                 chunks_per_candidate: int = 8):
+        """Create a new ChunkSizeTuner.
+
+        :param Optional[Sequence[int]] candidates: The chunk sizes to try. By default, powers of two multiples of the
+            USB packet size between 64B and 16kB
+        :param int chunks_per_candidate: How many chunks to measure per candidate"""
+        self._candidates: List[int] = list(candidates) if candidates is not None else \
+            [UsbPacketSize << shift for shift in range(9)]
+        self._chunksPerCandidate: int = chunks_per_candidate
+        self.reset()
+
+    def reset(self):
+        """Forget all measurements and start tuning again."""
+        self._candidateIndex: int = 0
+        self._measuredChunks: int = 0
+        self._measuredBytes: int = 0
+        self._measuredSeconds: float = 0.0
+        self._throughputs: Dict[int, float] = {}
+        self._bestChunkSize: Optional[int] = None
+
+    @property
+    def chunkSize(self) -> int:
+        """The chunk size to use for the next chunk."""
+        if self._bestChunkSize is not None:
+            return self._bestChunkSize
+        return self._candidates[self._candidateIndex]
+
+    @property
+    def tuned(self) -> bool:
+        """Whether all candidates have been measured."""
+        return self._bestChunkSize is not None
+
+    @property
+    def throughputs(self) -> Dict[int, float]:
+        """The measured throughput in bytes per second by chunk size."""
+        return dict(self._throughputs)
+
+    def record(self, num_bytes: int, seconds: float):
+        """Record the time a write of a chunk took.
+
+        Only full chunks of the current candidate are meaningful; shorter chunks at the end of a write are ignored.
+
+        :param int num_bytes: The length of the written chunk
+        :param float seconds: How long the write took"""
+        if self._bestChunkSize is not None or num_bytes != self.chunkSize:
+            return
+
+        self._measuredChunks += 1
+        self._measuredBytes += num_bytes
+        self._measuredSeconds += seconds
+
+        if self._measuredChunks < self._chunksPerCandidate:
+            return
+
+        self._throughputs[num_bytes] = self._measuredBytes / max(self._measuredSeconds, 1e-9)
+        self._measuredChunks = 0
+        self._measuredBytes = 0
+        self._measuredSeconds = 0.0
+        self._candidateIndex += 1
+
+        if self._candidateIndex == len(self._candidates):
+            self._bestChunkSize = max(self._throughputs, key=self._throughputs.get)
@@ -0,0 +1,111 @@
+from typing import List, Optional, Tuple, Union
+
+from SmartWaveAPI.definitions import Command, DriverType
+
+_fixedCommandLengths = {
+    Command.Reset.value: 1,
+    Command.Trigger.value: 1,
+    Command.Stop.value: 1,
+    Command.Pin.value: 4,
+    Command.StimulusDriverMatrix.value: 7,
+    Command.General.value: 8,
+    Command.Info.value: 1,
+    Command.Heartbeat.value: 1,
+    Command.FpgaWrite.value: 8,
+    Command.FpgaRead.value: 4,
+}
+_driverCommandLengths = {
+    DriverType.SPI.value: 12,
+    DriverType.I2C.value: 6,
+}
+# the number of bytes which is always enough to tell the length of a command frame
+_maxHeaderLength = 8
+
+
+def commandFrameLength(buffer: Union[bytes, bytearray, memoryview], position: int = 0) -> Optional[int]:
+    """Get the length of the command frame starting at a position in a buffer of data sent to the device.
+
+    :param Union[bytes, bytearray, memoryview] buffer: The data sent to the device
+    :param int position: The position of the command byte
+    :return: The length of the frame, or None if the buffer ends before the length can be told
+    :rtype: Optional[int]
+    :raises ValueError: If the command byte is not a known command"""
+    available = len(buffer) - position
+    command = buffer[position]
+
+    if command in _fixedCommandLengths:
+        return _fixedCommandLengths[command]
+
+    if command == Command.Driver.value:
+        if available < 2:
+            return None
+        return _driverCommandLengths.get(buffer[position + 1], 6)
+
+    if command == Command.Stimulus.value:
+        if available < 7:
+            return None
+        numSamples = (buffer[position + 5] << 8) | buffer[position + 6]
+        return 7 + numSamples * (buffer[position + 3] // 8)
+
+    if command == Command.DriverPinMatrix.value:
+        if available < 8:
+            return None
+        return 8 + buffer[position + 7]
+
+    if command in (Command.FirmwareUpdate.value, Command.FpgaUpdate.value):
+        if available < 6:
+            return None
+        return 6 + int.from_bytes(buffer[position + 2:position + 6], 'big') + 4
+
+    raise ValueError("Unknown command 0x%02x" % command)
+
+
+class CommandFrameSplitter(object):
+    """A stateful splitter which tells the command frames in the byte stream sent to the device.
+
+    Only the headers of the frames are looked at; the rest of each frame is skipped without copying, so large
+    frames like firmware updates are cheap to split. Data can be fed in arbitrarily sized pieces."""
+
+    def __init__(self):
+        """Create a new CommandFrameSplitter at the start of a frame."""
+        self._header: bytes = b''
+        self._remaining: int = 0
+
+    def reset(self):
+        """Continue at the start of a frame, e.g. after reconnecting to a device."""
+        self._header = b''
+        self._remaining = 0
+
+    def feed(self, data: Union[bytes, bytearray, memoryview]) -> List[Tuple[int, int]]:
+        """Split the next piece of the stream.
+
+        A frame is returned as soon as its length is known, which can be before all of its bytes were fed.
+        Unknown command bytes are returned as frames of length 1.
+
+        :param Union[bytes, bytearray, memoryview] data: The next data sent to the device
+        :return: The command byte and the length of each frame starting in the data, in order
+        :rtype: List[Tuple[int, int]]"""
+        frames: List[Tuple[int, int]] = []
+        length = len(data)
+        position = min(self._remaining, length)
+        self._remaining -= position
+
+        while position < length:
+            header = self._header + bytes(data[position:position + _maxHeaderLength - len(self._header)])
+            try:
+                frameLength = commandFrameLength(header)
+            except ValueError:
+                frameLength = 1
+
+            if frameLength is None:
+                # all remaining data is part of the header
+                self._header = header
+                break
+
+            frames.append((header[0], frameLength))
+            position += frameLength - len(self._header)
+            self._header = b''
+
+        if position > length:
+            self._remaining = position - length
+        return frames
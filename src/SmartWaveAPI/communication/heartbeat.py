@@ -0,0 +1,122 @@
+import threading
+import time
+from typing import List, Optional
+
+from SmartWaveAPI.diagnostics import transportLogger
+
+
+class HeartbeatScheduler(object):
+    """Sends the heartbeats of many devices from a single timer thread, instead of a thread per device.
+
+    A device only needs a heartbeat if nothing else was written to it within the interval, so the heartbeat of a
+    device is skipped while other traffic goes out, and the thread sleeps until the next heartbeat of any device is
+    due. A heartbeat is due a margin before the interval ends, to allow for timer jitter. If a batch is open on the
+    device when its heartbeat is due, the heartbeat is added to the batch instead of being written on its own; if
+    the batch is not sent within half of the margin, the heartbeat is written on its own after all, still within the
+    interval. A device which is busy writing does not hold up the heartbeats of the others.
+
+    All devices use the shared() scheduler, unless their heartbeatScheduler is set to another one before they
+    connect. The thread runs while at least one device is registered."""
+
+    _shared: Optional["HeartbeatScheduler"] = None
+    _sharedLock = threading.Lock()
+
+    def __init__(self, interval: float = 0.5, margin: Optional[float] = None):
+        """Create a new heartbeat scheduler.
+
+        :param float interval: The longest time a device goes without a write in seconds
+        :param Optional[float] margin: How long before the end of the interval a heartbeat is due in seconds.
+            Default: a quarter of the interval"""
+        self.interval: float = interval
+        self.margin: float = margin if margin is not None else interval / 4
+        self._devices: List = []
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self._devices)
+
+    @classmethod
+    def shared(cls) -> "HeartbeatScheduler":
+        """Get the scheduler shared by all devices of the process.
+
+        :return: The shared scheduler
+        :rtype: HeartbeatScheduler"""
+        with cls._sharedLock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def register(self, device):
+        """Start sending the heartbeats of a device. Called by the device when it connects.
+
+        :param SmartWave device: The device"""
+        with self._condition:
+            if device not in self._devices:
+                self._devices.append(device)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="SmartWave heartbeat scheduler")
+                self._thread.start()
+            self._condition.notify_all()
+
+    def unregister(self, device):
+        """Stop sending the heartbeats of a device. Called by the device when it disconnects.
+
+        :param SmartWave device: The device"""
+        with self._condition:
+            if device in self._devices:
+                self._devices.remove(device)
+            self._condition.notify_all()
+
+    def _run(self):
+        """Send the heartbeats of the registered devices as they are due, until no device is left."""
+        while True:
+            with self._condition:
+                if not self._devices:
+                    self._thread = None
+                    return
+                devices = list(self._devices)
+
+            now = time.monotonic()
+            nextDue = now + self.interval
+            for device in devices:
+                try:
+                    due = self._beat(device, now)
+                except Exception as e:
+                    transportLogger.debug("Sending a heartbeat to %r failed: %s", device, e)
+                    due = None
+
+                if due is None:
+                    self.unregister(device)
+                else:
+                    nextDue = min(nextDue, due)
+
+            with self._condition:
+                if self._devices == devices:
+                    self._condition.wait(max(nextDue - time.monotonic(), 0))
+
+    def _beat(self, device, now: float) -> Optional[float]:
+        """Send the heartbeat of a device if it is due.
+
+        :param SmartWave device: The device
+        :param float now: The current time
+        :return: When the next heartbeat of the device is due, or None if the device needs no more heartbeats
+        :rtype: Optional[float]"""
+        if not device._heartbeatAlive():
+            return None
+
+        due = device._lastWrite + self.interval - self.margin
+        if now < due:
+            return due
+
+        if device._openBatches and not device._heartbeatPending:
+            # added to the batch when it is sent, see SmartWave.flushBatch(); the other half of the margin is left
+            # to write the heartbeat on its own if the batch is not sent in time
+            device._heartbeatPending = True
+            return now + self.margin / 2
+
+        device._heartbeatPending = False
+        if not device._sendHeartbeat(False):
+            return None
+        # if another write held the serial resource, the heartbeat is tried again shortly
+        return max(device._lastWrite + self.interval - self.margin, now + self.margin / 8)
@@ -0,0 +1,389 @@
+import heapq
+import struct
+import threading
+import time
+from itertools import count
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from SmartWaveAPI.definitions import Command, Statusbit, DriverType, StimulusType, TriggerMode
+from SmartWaveAPI.communication.commandframe import commandFrameLength
+
+
+class SimulatedStimulus(object):
+    """The state of a stimulus on the simulated device."""
+    __slots__ = ('sampleBitWidth', 'samples')
+
+    def __init__(self, sample_bit_width: int, samples: List[int]):
+        self.sampleBitWidth: int = sample_bit_width
+        self.samples: List[int] = samples
+
+
+class SimulatedDevice(object):
+    """A pure-Python model of a SmartWave device, for testing and benchmarking the host stack without hardware.
+
+    The device decodes the command frames sent by the host and keeps the stimulus, driver, pin and FPGA register
+    state. On a trigger, every recorder connected to a driver sends a readback: SPI drivers loop MOSI back to MISO,
+    and I2C drivers talk to simulated targets, see i2cRead() and i2cWrite(), which can be overridden.
+    In TriggerMode.Full and TriggerMode.Toggle, the device repeats the configuration every runPeriod until it is
+    stopped.
+    All status frames are sent in order, each after the configured latency."""
+    def __init__(self,
+                 latency: float = 0.0,
+                 i2c_addresses: Optional[Set[int]] = None,
+                 hardware_version: Tuple[int, int, int] = (1, 0, 0),
+                 firmware_version: Tuple[int, int, int] = (1, 0, 0),
+                 fpga_version: Tuple[int, int, int] = (1, 0, 0),
+                 flash_id: int = 0x5357_0000_0000_0001,
+                 run_period: float = 0.001):
+        """Create a new simulated device.
+
+        :param float latency: How long the device takes to answer, in seconds
+        :param Optional[Set[int]] i2c_addresses: The addresses of the simulated I2C targets, which acknowledge their
+            address. By default, every address is acknowledged.
+        :param Tuple[int, int, int] hardware_version: The hardware version reported in the device info
+        :param Tuple[int, int, int] firmware_version: The microcontroller firmware version reported in the device info
+        :param Tuple[int, int, int] fpga_version: The FPGA version reported in the device info
+        :param int flash_id: The flash ID reported in the device info
+        :param float run_period: How often the configuration is repeated when the device runs continuously,
+            in seconds"""
+        self.latency: float = latency
+        self.i2cAddresses: Optional[Set[int]] = i2c_addresses
+        self.hardwareVersion: Tuple[int, int, int] = hardware_version
+        self.firmwareVersion: Tuple[int, int, int] = firmware_version
+        self.fpgaVersion: Tuple[int, int, int] = fpga_version
+        self.flashId: int = flash_id
+        self.runPeriod: float = run_period
+
+        self.stimuli: Dict[int, SimulatedStimulus] = {}
+        self.drivers: Dict[Tuple[int, int], bytes] = {}
+        self.pins: Dict[int, bool] = {}
+        # (driver type, driver id) -> (stimulus id, number of samples to read back)
+        self.connections: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        self.registers: Dict[int, int] = {}
+        self.general: bytes = b''
+        self.triggerCount: int = 0
+        self.receivedBytes: int = 0
+
+        self._buffer: bytearray = bytearray()
+        self._lock = threading.Lock()
+        self._output: Optional[Callable[[bytes], None]] = None
+
+        # status frames waiting to be sent, ordered by due time and sequence number
+        self._outbox: List[Tuple[float, int, bytes]] = []
+        self._sequence = count()
+        self._lastDue: float = 0.0
+        self._outboxCondition = threading.Condition()
+        self._deliveryThread: Optional[threading.Thread] = None
+        self._delivering: bool = False
+        self._running: bool = False
+        self._runGeneration: int = 0
+        self._closed: bool = False
+
+    def __repr__(self) -> str:
+        return "SimulatedDevice(latency=%g)" % self.latency
+
+    def setOutput(self, output: Callable[[bytes], None]):
+        """Set where the status frames of the device are sent to.
+
+        :param Callable[[bytes], None] output: Called with the bytes of the status frames, in order"""
+        with self._outboxCondition:
+            self._output = output
+            self._closed = False
+
+    def waitUntilSent(self, timeout: Optional[float] = None) -> bool:
+        """Wait until all status frames which are waiting to be sent were passed to the output.
+
+        :param Optional[float] timeout: How long to wait in seconds, or None to wait indefinitely
+        :return: True if all frames were sent, False if the timeout passed first
+        :rtype: bool"""
+        with self._outboxCondition:
+            return self._outboxCondition.wait_for(lambda: self._closed or not (self._outbox or self._delivering),
+                                                  timeout)
+
+    def close(self):
+        """Stop sending status frames and discard the ones waiting to be sent."""
+        self._running = False
+        with self._outboxCondition:
+            self._closed = True
+            self._outbox = []
+            self._outboxCondition.notify_all()
+
+    def receive(self, data: bytes):
+        """Handle bytes sent by the host. Incomplete commands are kept until the rest arrives.
+
+        :param bytes data: The bytes sent by the host"""
+        with self._lock:
+            self.receivedBytes += len(data)
+            self._buffer += data
+
+            position = 0
+            while position < len(self._buffer):
+                length = self._commandLength(position)
+                if length is None or position + length > len(self._buffer):
+                    break
+
+                self._handleCommand(bytes(self._buffer[position:position + length]))
+                position += length
+
+            del self._buffer[:position]
+
+    def _commandLength(self, position: int) -> Optional[int]:
+        """Get the length of the command frame starting at a position in the receive buffer.
+
+        :param int position: The position of the command byte
+        :return: The length of the frame, or None if not enough bytes are buffered to tell
+        :rtype: Optional[int]"""
+        try:
+            return commandFrameLength(self._buffer, position)
+        except ValueError as e:
+            # unknown command - skip it, so the rest of the stream can still be decoded
+            self._send(bytes([Statusbit.Debug.value]) + str(e).encode() + b"\0")
+            return 1
+
+    def _handleCommand(self, frame: bytes):
+        """Handle a complete command frame.
+
+        :param bytes frame: The command frame, starting with the command byte"""
+        command = frame[0]
+
+        if command == Command.Reset.value:
+            self._stopRunning()
+            self.stimuli.clear()
+            self.drivers.clear()
+            self.pins.clear()
+            self.connections.clear()
+
+        elif command == Command.Trigger.value:
+            self.triggerCount += 1
+            triggerMode = self.general[4] if len(self.general) > 4 else TriggerMode.Single.value
+            if triggerMode == TriggerMode.Full.value:
+                self._startRunning()
+            elif triggerMode == TriggerMode.Toggle.value:
+                if self._running:
+                    self._stopRunning()
+                else:
+                    self._startRunning()
+            else:
+                self._runConnections()
+
+        elif command == Command.Stop.value:
+            self._stopRunning()
+
+        elif command == Command.Stimulus.value:
+            sampleBitWidth = frame[3]
+            bytesPerSample = sampleBitWidth // 8
+            raw = frame[7:]
+            samples = [int.from_bytes(raw[i:i + bytesPerSample], 'big') for i in range(0, len(raw), bytesPerSample)] \
+                if bytesPerSample else []
+            self.stimuli[frame[2]] = SimulatedStimulus(sampleBitWidth, samples)
+
+        elif command == Command.Driver.value:
+            self.drivers[(frame[1], frame[2])] = frame[3:]
+
+        elif command == Command.Pin.value:
+            self.pins[frame[1]] = bool(frame[3])
+
+        elif command == Command.StimulusDriverMatrix.value:
+            key = (frame[3], frame[4])
+            if frame[1] == StimulusType.NoStimulus.value:
+                self.connections.pop(key, None)
+            else:
+                self.connections[key] = (frame[2], (frame[5] << 8) | frame[6])
+
+        elif command == Command.General.value:
+            self.general = frame[1:]
+
+        elif command == Command.Info.value:
+            self._send(bytes([Statusbit.Info.value]) +
+                       bytes(self.hardwareVersion) +
+                       bytes(self.firmwareVersion) +
+                       bytes(self.fpgaVersion) +
+                       self.flashId.to_bytes(8, 'big'))
+
+        elif command == Command.FpgaWrite.value:
+            self.registers[int.from_bytes(frame[1:4], 'big')] = int.from_bytes(frame[4:8], 'big')
+
+        elif command == Command.FpgaRead.value:
+            value = self.registers.get(int.from_bytes(frame[1:4], 'big'), 0)
+            self._send(bytes([Statusbit.SingleAddressRead.value]) + value.to_bytes(4, 'big'))
+
+        elif command == Command.FirmwareUpdate.value:
+            if self._checksum(frame[6:-4], '<') == int.from_bytes(frame[-4:], 'big'):
+                self._send(bytes([Statusbit.FirmwareUpdateOk.value]))
+            else:
+                self._send(bytes([Statusbit.FirmwareUpdateFailed.value]))
+
+        elif command == Command.FpgaUpdate.value:
+            if self._checksum(frame[6:-4], '>') == int.from_bytes(frame[-4:], 'big'):
+                # the FPGA update is done
+                self._send(bytes([Statusbit.FirmwareUpdateStatus.value, 0x7f]))
+            else:
+                self._send(bytes([Statusbit.FirmwareUpdateFailed.value]))
+
+    @staticmethod
+    def _checksum(data: bytes, byteorder: str) -> int:
+        """Calculate the checksum of an update image, as the sum of its 32-bit words.
+
+        :param bytes data: The image
+        :param str byteorder: The byte order of the words, '<' or '>'
+        :return: The checksum
+        :rtype: int"""
+        numWords = len(data) // 4
+        return (0xC0DEF19E + sum(struct.unpack('%s%dI' % (byteorder, numWords), data[:numWords * 4]))) % 0x100000000
+
+    def _runConnections(self):
+        """Run every stimulus on its driver and send the readbacks of the recorders."""
+        for (driverType, driverId), (stimulusId, readNumber) in sorted(self.connections.items()):
+            stimulus = self.stimuli.get(stimulusId)
+            if stimulus is None or readNumber == 0:
+                continue
+
+            if driverType == DriverType.SPI.value:
+                mask = (1 << stimulus.sampleBitWidth) - 1
+                values = [sample & mask for sample in stimulus.samples]
+            elif driverType == DriverType.I2C.value:
+                values = self._runI2C(stimulus.samples)
+            else:
+                continue
+
+            # the recorder sends exactly the expected number of samples
+            values = (values + [0] * readNumber)[:readNumber]
+            self._send(struct.pack('>BBH%dI' % readNumber, Statusbit.Readback.value, stimulusId, readNumber, *values))
+
+    def _startRunning(self):
+        """Start repeating the configuration every runPeriod, if it is not running yet."""
+        if self._running:
+            return
+
+        self._running = True
+        self._runGeneration += 1
+        self._send(bytes([Statusbit.Running.value]))
+        threading.Thread(target=self._runContinuously, args=(self._runGeneration,), daemon=True).start()
+
+    def _stopRunning(self):
+        """Stop repeating the configuration, if it is running."""
+        if not self._running:
+            return
+
+        self._running = False
+        self._send(bytes([Statusbit.Idle.value]))
+
+    def _runContinuously(self, generation: int):
+        """Repeat the configuration every runPeriod, until the device is stopped or closed.
+
+        :param int generation: The number of the run; the thread ends when the device is stopped or started anew"""
+        while True:
+            with self._lock:
+                if not self._running or self._runGeneration != generation:
+                    return
+                self._runConnections()
+            time.sleep(self.runPeriod)
+
+    def _runI2C(self, frames: List[int]) -> List[int]:
+        """Perform the I2C transactions encoded in the stimulus frames and record their results.
+
+        :param List[int] frames: The command and data frames of the transactions
+        :return: The recorded info words and data frames
+        :rtype: List[int]"""
+        recorded = []
+        index = 0
+        while index < len(frames):
+            commandFrame = frames[index]
+            index += 1
+            if commandFrame >> 28 != 0xC:
+                continue
+
+            length = commandFrame & 0xff
+            read = bool(commandFrame & (1 << 9))
+            deviceId = (commandFrame >> 16) & 0x7f
+            numFrames = (length + 1) // 2
+            dataFrames = frames[index:index + numFrames]
+            index += numFrames
+
+            acked = self.i2cAddresses is None or deviceId in self.i2cAddresses
+            recorded.append(length | (deviceId << 8) | (int(read) << 16) | (int(acked) << 17))
+
+            if read:
+                data = self.i2cRead(deviceId, length) if acked else b'\xff' * length
+            else:
+                data = bytearray()
+                for frame in dataFrames:
+                    data.append(frame & 0xff)
+                    if frame & (1 << 25):
+                        data.append((frame >> 16) & 0xff)
+                data = bytes(data[:length])
+                if acked:
+                    self.i2cWrite(deviceId, data)
+
+            # reads are acknowledged by the host, writes by an existing target
+            ack = 1 if read or acked else 0
+            for i in range(numFrames):
+                frame = data[2 * i] | (ack << 8) | (1 << 9)
+                if 2 * i + 1 < length:
+                    frame |= (data[2 * i + 1] << 16) | (ack << 24) | (1 << 25)
+                recorded.append(frame)
+
+        return recorded
+
+    def i2cRead(self, device_id: int, length: int) -> bytes:
+        """Get the bytes a simulated I2C target sends on a read. Override to simulate specific targets.
+
+        :param int device_id: The address of the target
+        :param int length: The number of bytes to read
+        :return: The read bytes; zeros by default
+        :rtype: bytes"""
+        return bytes(length)
+
+    def i2cWrite(self, device_id: int, data: bytes):
+        """Handle the bytes written to a simulated I2C target. Override to simulate specific targets.
+
+        :param int device_id: The address of the target
+        :param bytes data: The written bytes"""
+        pass
+
+    def _send(self, frame: bytes):
+        """Send a status frame to the host after the latency, keeping the order of all frames.
+
+        :param bytes frame: The status frame"""
+        with self._outboxCondition:
+            if self._closed:
+                return
+
+            due = max(time.monotonic() + self.latency, self._lastDue)
+            self._lastDue = due
+            heapq.heappush(self._outbox, (due, next(self._sequence), frame))
+
+            if self._deliveryThread is None or not self._deliveryThread.is_alive():
+                self._deliveryThread = threading.Thread(target=self._deliver, daemon=True)
+                self._deliveryThread.start()
+            self._outboxCondition.notify_all()
+
+    def _deliver(self):
+        """Send the status frames which are due to the host, until the device is closed."""
+        with self._outboxCondition:
+            while not self._closed:
+                if not self._outbox:
+                    self._outboxCondition.wait()
+                    continue
+
+                due = self._outbox[0][0]
+                now = time.monotonic()
+                if due > now:
+                    self._outboxCondition.wait(due - now)
+                    continue
+
+                # send all frames which are due at once
+                frames = []
+                while self._outbox and self._outbox[0][0] <= now:
+                    frames.append(heapq.heappop(self._outbox)[2])
+                output = self._output
+
+                self._delivering = True
+                self._outboxCondition.release()
+                try:
+                    if output is not None:
+                        output(b''.join(frames))
+                finally:
+                    self._outboxCondition.acquire()
+                    self._delivering = False
+                    self._outboxCondition.notify_all()
@@ -0,0 +1,260 @@
+import threading
+from bisect import bisect_left
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from SmartWaveAPI.definitions import Command, Statusbit
+from SmartWaveAPI.communication.commandframe import CommandFrameSplitter
+
+# upper bounds of the latency histogram buckets in seconds
+DefaultLatencyBuckets: Tuple[float, ...] = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def _enumName(enum, value: int) -> str:
+    """Get the name of an enum member by value, or the hex value if there is no such member."""
+    try:
+        return enum(value).name
+    except ValueError:
+        return "0x%02x" % value
+
+
+class LatencyHistogram(object):
+    """A histogram of durations with fixed buckets, as used by Prometheus."""
+
+    def __init__(self, buckets: Sequence[float] = DefaultLatencyBuckets):
+        """Create a new, empty histogram.
+
+        :param Sequence[float] buckets: The ascending upper bounds of the buckets in seconds. Durations above the
+            last bound are only counted in the total."""
+        self.buckets: Tuple[float, ...] = tuple(buckets)
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)
+        self.count: int = 0
+        self.sum: float = 0.0
+
+    def observe(self, seconds: float):
+        """Add a duration to the histogram.
+
+        :param float seconds: The duration in seconds"""
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def mean(self) -> Optional[float]:
+        """Get the mean of all observed durations.
+
+        :return: The mean in seconds, or None if nothing was observed
+        :rtype: Optional[float]"""
+        return self.sum / self.count if self.count else None
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile of the observed durations as the upper bound of the bucket it falls into.
+
+        :param float q: The quantile, between 0 and 1
+        :return: The estimated quantile in seconds, infinity if it is above the last bucket,
+            or None if nothing was observed
+        :rtype: Optional[float]"""
+        if not self.count:
+            return None
+
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+
+class Statistics(object):
+    """Counters and latency histograms of the communication with a SmartWave device.
+
+    Collects the command frames and bytes sent per Command, the status frames and bytes received per Statusbit,
+    the time spent waiting for the serial lock, the round-trip latency from a trigger to the readback of each
+    config, and how often a config could skip reconfiguring the device because the request was unchanged.
+    Enable collection with SmartWave.enableStatistics(); nothing is collected while it is disabled."""
+
+    def __init__(self, latency_buckets: Sequence[float] = DefaultLatencyBuckets):
+        """Create a new, empty set of statistics.
+
+        :param Sequence[float] latency_buckets: The ascending upper bounds of the latency histogram buckets
+            in seconds"""
+        self._latencyBuckets: Tuple[float, ...] = tuple(latency_buckets)
+        self._lock = threading.Lock()
+        self._splitter = CommandFrameSplitter()
+        self.reset()
+
+    def reset(self):
+        """Clear all counters and histograms."""
+        with self._lock:
+            self._splitter.reset()
+            self.commandFrames: Dict[int, int] = {}
+            self.commandBytes: Dict[int, int] = {}
+            self.statusFrames: Dict[int, int] = {}
+            self.statusBytes: Dict[int, int] = {}
+            self.lockWait: LatencyHistogram = LatencyHistogram(self._latencyBuckets)
+            # (config type, recorder ID) -> trigger to readback latencies
+            self.roundTrips: Dict[Tuple[str, int], LatencyHistogram] = {}
+            # config type -> [requests which skipped reconfiguration, requests which reconfigured the device]
+            self.reconfigurations: Dict[str, List[int]] = {}
+            # recorder ID -> times of the triggers whose readbacks are outstanding
+            self._triggerTimes: Dict[int, Deque[float]] = {}
+
+    def recordWrite(self, data: Union[bytes, bytearray, memoryview]):
+        """Count the command frames in data written to the device.
+
+        :param Union[bytes, bytearray, memoryview] data: The data, in the order it is sent"""
+        with self._lock:
+            for command, length in self._splitter.feed(data):
+                self.commandFrames[command] = self.commandFrames.get(command, 0) + 1
+                self.commandBytes[command] = self.commandBytes.get(command, 0) + length
+
+    def recordStatusFrame(self, statusbit: int, length: int):
+        """Count a status frame received from the device.
+
+        :param int statusbit: The status bit of the frame
+        :param int length: The length of the frame in bytes"""
+        with self._lock:
+            self.statusFrames[statusbit] = self.statusFrames.get(statusbit, 0) + 1
+            self.statusBytes[statusbit] = self.statusBytes.get(statusbit, 0) + length
+
+    def recordLockWait(self, seconds: float):
+        """Add the time spent waiting for the serial lock.
+
+        :param float seconds: The waiting time in seconds"""
+        with self._lock:
+            self.lockWait.observe(seconds)
+
+    def recordTrigger(self, recorder_ids: Iterable[int], timestamp: float):
+        """Remember when a trigger was sent, for the recorders which will read back because of it.
+
+        :param Iterable[int] recorder_ids: The IDs of the recorders which expect a readback
+        :param float timestamp: The time the trigger was sent, from time.perf_counter()"""
+        with self._lock:
+            for recorderId in recorder_ids:
+                self._triggerTimes.setdefault(recorderId, deque()).append(timestamp)
+
+    def recordReadback(self, recorder_id: int, config_type: str, timestamp: float):
+        """Add the round-trip latency of a readback to the histogram of its config.
+
+        Readbacks of triggers which were sent before the statistics were enabled are not counted.
+
+        :param int recorder_id: The ID of the recorder which read back
+        :param str config_type: The type of the config which receives the readback
+        :param float timestamp: The time the readback was received, from time.perf_counter()"""
+        with self._lock:
+            triggerTimes = self._triggerTimes.get(recorder_id)
+            if not triggerTimes:
+                return
+
+            histogram = self.roundTrips.get((config_type, recorder_id))
+            if histogram is None:
+                histogram = self.roundTrips[(config_type, recorder_id)] = LatencyHistogram(self._latencyBuckets)
+            histogram.observe(timestamp - triggerTimes.popleft())
+
+    def discardTriggers(self, recorder_id: int):
+        """Forget the outstanding triggers of a recorder, e.g. because its config was deleted.
+
+        :param int recorder_id: The ID of the recorder"""
+        with self._lock:
+            self._triggerTimes.pop(recorder_id, None)
+
+    def recordReconfiguration(self, config_type: str, cached: bool):
+        """Count whether a request of a config could skip reconfiguring the device.
+
+        :param str config_type: The type of the config
+        :param bool cached: True if the device already had the configuration, False if it was reconfigured"""
+        with self._lock:
+            counts = self.reconfigurations.setdefault(config_type, [0, 0])
+            counts[0 if cached else 1] += 1
+
+    def snapshot(self) -> dict:
+        """Get a copy of all statistics, with names instead of command and status bytes.
+
+        :return: The statistics as a dict of plain values, e.g. to be serialized as JSON
+        :rtype: dict"""
+        def histogramDict(histogram: LatencyHistogram) -> dict:
+            return {
+                "count": histogram.count,
+                "sum": histogram.sum,
+                "mean": histogram.mean(),
+                "p50": histogram.quantile(0.5),
+                "p99": histogram.quantile(0.99),
+                "buckets": dict(zip([repr(bound) for bound in histogram.buckets] + ["+Inf"], histogram.counts)),
+            }
+
+        with self._lock:
+            return {
+                "commandFrames": {_enumName(Command, k): v for k, v in self.commandFrames.items()},
+                "commandBytes": {_enumName(Command, k): v for k, v in self.commandBytes.items()},
+                "statusFrames": {_enumName(Statusbit, k): v for k, v in self.statusFrames.items()},
+                "statusBytes": {_enumName(Statusbit, k): v for k, v in self.statusBytes.items()},
+                "lockWait": histogramDict(self.lockWait),
+                "roundTrips": {"%s(%d)" % key: histogramDict(histogram)
+                               for key, histogram in self.roundTrips.items()},
+                "reconfigurations": {configType: {"hits": counts[0], "misses": counts[1]}
+                                     for configType, counts in self.reconfigurations.items()},
+            }
+
+    def toPrometheus(self, prefix: str = "smartwave", labels: Optional[Dict[str, str]] = None) -> str:
+        """Dump the statistics in the Prometheus text exposition format.
+
+        :param str prefix: The prefix of all metric names
+        :param Optional[Dict[str, str]] labels: Labels to add to all samples, e.g. to tell several devices apart
+        :return: The metrics, one sample per line
+        :rtype: str"""
+        def labelString(extra: Dict[str, str]) -> str:
+            allLabels = dict(labels or {})
+            allLabels.update(extra)
+            if not allLabels:
+                return ""
+            return "{%s}" % ",".join('%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                                     for k, v in allLabels.items())
+
+        lines: List[str] = []
+
+        def counter(name: str, help_text: str, values: Dict[int, int], enum, label: str):
+            lines.append("# HELP %s_%s %s" % (prefix, name, help_text))
+            lines.append("# TYPE %s_%s counter" % (prefix, name))
+            for key, value in sorted(values.items()):
+                lines.append("%s_%s%s %d" % (prefix, name, labelString({label: _enumName(enum, key)}), value))
+
+        def histogram(name: str, values: LatencyHistogram, extra: Dict[str, str]):
+            cumulative = 0
+            for bound, count in zip(values.buckets, values.counts):
+                cumulative += count
+                lines.append("%s_%s_bucket%s %d" % (prefix, name, labelString(dict(extra, le=repr(bound))), cumulative))
+            lines.append("%s_%s_bucket%s %d" % (prefix, name, labelString(dict(extra, le="+Inf")), values.count))
+            lines.append("%s_%s_sum%s %r" % (prefix, name, labelString(extra), values.sum))
+            lines.append("%s_%s_count%s %d" % (prefix, name, labelString(extra), values.count))
+
+        with self._lock:
+            counter("command_frames_total", "Command frames sent to the device.",
+                    self.commandFrames, Command, "command")
+            counter("command_bytes_total", "Bytes of command frames sent to the device.",
+                    self.commandBytes, Command, "command")
+            counter("status_frames_total", "Status frames received from the device.",
+                    self.statusFrames, Statusbit, "statusbit")
+            counter("status_bytes_total", "Bytes of status frames received from the device.",
+                    self.statusBytes, Statusbit, "statusbit")
+
+            lines.append("# HELP %s_lock_wait_seconds Time spent waiting for the serial lock." % prefix)
+            lines.append("# TYPE %s_lock_wait_seconds histogram" % prefix)
+            histogram("lock_wait_seconds", self.lockWait, {})
+
+            lines.append("# HELP %s_round_trip_seconds Latency from a trigger to the readback of a config." % prefix)
+            lines.append("# TYPE %s_round_trip_seconds histogram" % prefix)
+            for (configType, recorderId), values in sorted(self.roundTrips.items()):
+                histogram("round_trip_seconds", values, {"config": configType, "recorder": str(recorderId)})
+
+            lines.append("# HELP %s_reconfigurations_total Requests of a config by whether the device already had "
+                         "the configuration." % prefix)
+            lines.append("# TYPE %s_reconfigurations_total counter" % prefix)
+            for configType, (hits, misses) in sorted(self.reconfigurations.items()):
+                lines.append("%s_reconfigurations_total%s %d" %
+                             (prefix, labelString({"config": configType, "result": "hit"}), hits))
+                lines.append("%s_reconfigurations_total%s %d" %
+                             (prefix, labelString({"config": configType, "result": "miss"}), misses))
+
+        return "\n".join(lines) + "\n"
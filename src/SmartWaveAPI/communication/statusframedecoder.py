@@ -0,0 +1,173 @@
+import sys
+from array import array
+from typing import List, Optional, Tuple, Union
+
+from SmartWaveAPI.definitions import Statusbit
+
+# typecode of an unsigned 32-bit integer array on this platform
+_sampleTypecode: str = 'I' if array('I').itemsize == 4 else 'L'
+
+
+class StatusFrame(object):
+    """A complete status frame received from the device."""
+    __slots__ = ('statusbit', 'payload')
+
+    def __init__(self, statusbit: int, payload: memoryview):
+        """Create a status frame. Only to be called by the StatusFrameDecoder.
+
+        :param int statusbit: The status bit, i.e. the first byte of the frame
+        :param memoryview payload: The bytes following the status bit. This is a view into the receive buffer of the
+            decoder, which is only guaranteed to be valid until the next call to StatusFrameDecoder.feed();
+            copy it if it needs to be kept for longer."""
+        self.statusbit: int = statusbit
+        self.payload: memoryview = payload
+
+
+class StatusFrameDecoder(object):
+    """A stateful decoder which splits the byte stream received from the device into status frames.
+
+    Data can be fed in arbitrarily sized pieces; incomplete frames are kept in the receive buffer until the rest of
+    the frame arrives."""
+    _fixedPayloadLengths = {
+        Statusbit.Idle.value: 0,
+        Statusbit.Running.value: 0,
+        Statusbit.Error.value: 1,
+        Statusbit.Info.value: 17,  # hardware, microcontroller and fpga versions, flash ID
+        Statusbit.FirmwareUpdateOk.value: 0,
+        Statusbit.FirmwareUpdateFailed.value: 0,
+        Statusbit.SingleAddressRead.value: 4,
+        Statusbit.PinsStatus.value: 2,
+        Statusbit.FirmwareUpdateStatus.value: 1,
+    }
+    _readbackHeaderLength = 3  # recorder ID, number of samples
+
+    def __init__(self):
+        """Create a new StatusFrameDecoder with an empty receive buffer."""
+        self._buffer: bytearray = bytearray()
+        self._position: int = 0
+
+    def reset(self):
+        """Discard all buffered data, e.g. after reconnecting to a device."""
+        self._buffer = bytearray()
+        self._position = 0
+
+    def bufferedLength(self) -> int:
+        """Get the number of received bytes which do not form a complete frame yet.
+
+        :return: The number of buffered bytes
+        :rtype: int"""
+        return len(self._buffer) - self._position
+
+    def feed(self, data: bytes) -> List[StatusFrame]:
+        """Append received data to the receive buffer and decode all frames which are complete.
+
+        The payloads of the returned frames reference the receive buffer without copying it. Callers must drop all
+        references to the frames and their payloads before the next call; while a payload is still referenced, the
+        buffer cannot be resized in place and is copied on every call instead.
+
+        :param bytes data: The data received from the device
+        :return: The list of complete frames, in the order they were received
+        :rtype: List[StatusFrame]"""
+        self._compact()
+        try:
+            self._buffer += data
+        except BufferError:
+            # a payload of a previous frame is still referenced; continue in a new buffer
+            self._buffer = self._buffer + data
+
+        frames: List[StatusFrame] = []
+        view = memoryview(self._buffer)
+        position = self._position
+
+        while True:
+            bounds = self._frameBounds(position)
+            if bounds is None:
+                break
+
+            payloadEnd, frameEnd = bounds
+            frames.append(StatusFrame(self._buffer[position], view[position + 1:payloadEnd]))
+            position = frameEnd
+
+        self._position = position
+        return frames
+
+    def _compact(self):
+        """Remove all bytes of already decoded frames from the receive buffer."""
+        if self._position == 0:
+            return
+
+        try:
+            del self._buffer[:self._position]
+        except BufferError:
+            # a payload of a previous frame is still referenced; move the remaining data to a new buffer
+            self._buffer = self._buffer[self._position:]
+        self._position = 0
+
+    def _frameBounds(self, position: int) -> Optional[Tuple[int, int]]:
+        """Get the bounds of the frame starting at the given position in the receive buffer.
+
+        :param int position: The position of the status bit in the receive buffer
+        :return: The end of the payload and the end of the frame, or None if the frame is not complete yet
+        :rtype: Optional[Tuple[int, int]]"""
+        bufferLength = len(self._buffer)
+        if position >= bufferLength:
+            return None
+
+        statusbit = self._buffer[position]
+        if statusbit == Statusbit.Readback.value:
+            headerEnd = position + 1 + self._readbackHeaderLength
+            if headerEnd > bufferLength:
+                return None
+            numSamples = (self._buffer[position + 2] << 8) | self._buffer[position + 3]
+            frameEnd = headerEnd + 4 * numSamples
+            payloadEnd = frameEnd
+
+        elif statusbit == Statusbit.Debug.value:
+            # zero-terminated string; the terminator is not part of the payload
+            payloadEnd = self._buffer.find(0, position + 1)
+            if payloadEnd == -1:
+                return None
+            frameEnd = payloadEnd + 1
+
+        else:
+            # unknown status bits are treated as frames without payload
+            frameEnd = position + 1 + self._fixedPayloadLengths.get(statusbit, 0)
+            payloadEnd = frameEnd
+
+        if frameEnd > bufferLength:
+            return None
+
+        return payloadEnd, frameEnd
+
+
+def unpackReadbackSamples(raw_samples: Union[bytes, bytearray, memoryview]) -> array:
+    """Convert the big-endian 32-bit samples of a readback frame into an array of unsigned integers.
+
+    The conversion is done in bulk, without creating an intermediate object per sample.
+
+    :param Union[bytes, bytearray, memoryview] raw_samples: The raw samples, as sent by the device
+    :return: The samples in native byte order
+    :rtype: array"""
+    samples = array(_sampleTypecode)
+    samples.frombytes(raw_samples)
+    if sys.byteorder == 'little':
+        samples.byteswap()
+    return samples
+
+
+def readbackSamplesAsNumpy(samples: Union[array, bytes, bytearray, memoryview]):
+    """Get a NumPy view of readback samples without copying them.
+
+    Requires NumPy to be installed.
+
+    :param Union[array, bytes, bytearray, memoryview] samples: Either the samples as passed to the readback callback
+        with SmartWave.readbackAsArray set, or the raw big-endian samples of a readback frame
+    :return: A read-only array of dtype uint32 for decoded samples, or dtype >u4 for raw samples
+    :rtype: numpy.ndarray
+    :raises ImportError: If NumPy is not installed"""
+    import numpy
+
+    if isinstance(samples, array):
+        return numpy.frombuffer(samples, dtype=numpy.uint32)
+
+    return numpy.frombuffer(samples, dtype='>u4')
@@ -0,0 +1,336 @@
+import os
+import select
+import threading
+from typing import Optional, Union
+
+import serial
+
+from SmartWaveAPI.communication.chunksizetuner import UsbPacketSize
+
+
+class Transport(object):
+    """A byte stream connection to a SmartWave device.
+
+    The SmartWave class only talks to the device through this interface, so the device can be reached over a serial
+    port, a pseudo terminal, or simulated in-process."""
+    # default size of the pieces large writes are split into
+    writeChunkSize: int = 16 * UsbPacketSize
+
+    def open(self):
+        """Open the connection.
+
+        :raises OSError: If the connection could not be opened"""
+        raise NotImplementedError
+
+    def close(self):
+        """Close the connection. Blocking reads return or raise an OSError."""
+        raise NotImplementedError
+
+    def isOpen(self) -> bool:
+        """Return whether the connection is open.
+
+        :return: True if the connection is open, False otherwise
+        :rtype: bool"""
+        raise NotImplementedError
+
+    def read(self, size: int) -> bytes:
+        """Read up to size bytes, waiting until at least one byte is available or the read timeout passes.
+
+        :param int size: The maximum number of bytes to read
+        :return: The received bytes; empty if the read timed out
+        :rtype: bytes
+        :raises OSError: If the connection failed or was closed"""
+        raise NotImplementedError
+
+    def inWaiting(self) -> int:
+        """Get the number of received bytes which can be read without waiting.
+
+        :return: The number of bytes
+        :rtype: int"""
+        raise NotImplementedError
+
+    def write(self, data: Union[bytes, bytearray, memoryview]):
+        """Write all data to the connection.
+
+        :param Union[bytes, bytearray, memoryview] data: The data to write
+        :raises OSError: If the connection failed or was closed"""
+        raise NotImplementedError
+
+    def flush(self):
+        """Wait until all written data is sent."""
+        pass
+
+
+class SerialTransport(Transport):
+    """A connection to a SmartWave device over a serial port, e.g. the USB CDC port of the device."""
+
+    def __init__(self, port_name: str, baudrate: int = 115200, timeout: float = 1.0):
+        """Create a new serial connection. The port is not opened until open() is called.
+
+        :param str port_name: The name of the serial port, e.g. COM3 or /dev/ttyACM0
+        :param int baudrate: The baud rate; ignored by USB CDC devices
+        :param float timeout: How long a read waits for data in seconds"""
+        self.portName: str = port_name
+        self._baudrate: int = baudrate
+        self._timeout: float = timeout
+        self._serialPort: Optional[serial.Serial] = None
+
+    def __repr__(self) -> str:
+        return "SerialTransport(%s)" % self.portName
+
+    def open(self):
+        """Open the serial port exclusively.
+
+        :raises serial.SerialException: If the port could not be opened"""
+        self._serialPort = serial.Serial(self.portName, baudrate=self._baudrate, exclusive=True, timeout=self._timeout)
+
+    def close(self):
+        """Close the serial port."""
+        if self._serialPort is not None:
+            self._serialPort.close()
+
+    def isOpen(self) -> bool:
+        """Return whether the serial port is open.
+
+        :return: True if the port is open, False otherwise
+        :rtype: bool"""
+        return self._serialPort is not None and self._serialPort.is_open
+
+    def read(self, size: int) -> bytes:
+        """Read up to size bytes from the serial port.
+
+        :param int size: The maximum number of bytes to read
+        :return: The received bytes; empty if the read timed out
+        :rtype: bytes
+        :raises serial.SerialException: If the port failed"""
+        return self._serialPort.read(size)
+
+    def inWaiting(self) -> int:
+        """Get the number of received bytes which can be read without waiting.
+
+        :return: The number of bytes
+        :rtype: int"""
+        return self._serialPort.in_waiting
+
+    def write(self, data: Union[bytes, bytearray, memoryview]):
+        """Write all data to the serial port.
+
+        :param Union[bytes, bytearray, memoryview] data: The data to write
+        :raises serial.SerialException: If the port failed"""
+        self._serialPort.write(data)
+
+    def flush(self):
+        """Wait until all written data is sent."""
+        self._serialPort.flush()
+
+
+class PtyTransport(Transport):
+    """A connection over a pseudo terminal pair, e.g. to a device simulator running in another process.
+
+    The host side uses the master end; the peer opens the slave end by its name, peerName. Alternatively, a
+    SimulatedDevice can be served on the slave end in-process, so the whole terminal I/O path is exercised.
+    Only available on POSIX systems."""
+
+    def __init__(self, device=None, timeout: float = 1.0):
+        """Create a new pseudo terminal connection. The pair is not created until open() is called.
+
+        :param Optional[SimulatedDevice] device: A simulated device to serve on the slave end
+        :param float timeout: How long a read waits for data in seconds"""
+        self._device = device
+        self._timeout: float = timeout
+        self._masterFd: Optional[int] = None
+        self._slaveFd: Optional[int] = None
+        self._peerThread: Optional[threading.Thread] = None
+        self.peerName: Optional[str] = None
+
+    def __repr__(self) -> str:
+        return "PtyTransport(%s)" % self.peerName
+
+    def open(self):
+        """Create the pseudo terminal pair, in raw mode, and start serving the simulated device if one is given.
+
+        :raises OSError: If no pseudo terminal could be created"""
+        import tty
+
+        self._masterFd, self._slaveFd = os.openpty()
+        tty.setraw(self._masterFd)
+        tty.setraw(self._slaveFd)
+        self.peerName = os.ttyname(self._slaveFd)
+
+        if self._device is not None:
+            self._device.setOutput(self._writeToPeer)
+            self._peerThread = threading.Thread(target=self._servePeer, daemon=True)
+            self._peerThread.start()
+
+    def _writeToPeer(self, data: bytes):
+        """Write the output of the simulated device to the slave end.
+
+        :param bytes data: The data to write"""
+        slaveFd = self._slaveFd
+        if slaveFd is None:
+            return
+
+        view = memoryview(data)
+        while len(view):
+            view = view[os.write(slaveFd, view):]
+
+    def _servePeer(self):
+        """Pass everything written by the host to the simulated device, until the pair is closed."""
+        slaveFd = self._slaveFd
+        while self.isOpen():
+            try:
+                readable, _, _ = select.select([slaveFd], [], [], self._timeout)
+                if readable:
+                    self._device.receive(os.read(slaveFd, 4096))
+            except (OSError, ValueError):
+                # the pair was closed
+                break
+
+    def close(self):
+        """Close both ends of the pseudo terminal pair."""
+        masterFd, slaveFd = self._masterFd, self._slaveFd
+        self._masterFd = None
+        self._slaveFd = None
+        for fd in (masterFd, slaveFd):
+            if fd is not None:
+                os.close(fd)
+
+        if self._device is not None:
+            self._device.close()
+
+    def isOpen(self) -> bool:
+        """Return whether the pseudo terminal pair is open.
+
+        :return: True if the pair is open, False otherwise
+        :rtype: bool"""
+        return self._masterFd is not None
+
+    def read(self, size: int) -> bytes:
+        """Read up to size bytes from the master end.
+
+        :param int size: The maximum number of bytes to read
+        :return: The received bytes; empty if the read timed out
+        :rtype: bytes
+        :raises OSError: If the pair was closed"""
+        masterFd = self._masterFd
+        if masterFd is None:
+            raise OSError("The pseudo terminal is closed")
+
+        readable, _, _ = select.select([masterFd], [], [], self._timeout)
+        if not readable:
+            return b''
+        return os.read(masterFd, size)
+
+    def inWaiting(self) -> int:
+        """Get the number of received bytes which can be read without waiting.
+
+        :return: The number of bytes
+        :rtype: int"""
+        import fcntl
+        import termios
+        import struct
+
+        masterFd = self._masterFd
+        if masterFd is None:
+            return 0
+        return struct.unpack('I', fcntl.ioctl(masterFd, termios.FIONREAD, b'\0\0\0\0'))[0]
+
+    def write(self, data: Union[bytes, bytearray, memoryview]):
+        """Write all data to the master end.
+
+        :param Union[bytes, bytearray, memoryview] data: The data to write
+        :raises OSError: If the pair was closed"""
+        masterFd = self._masterFd
+        if masterFd is None:
+            raise OSError("The pseudo terminal is closed")
+
+        view = memoryview(data)
+        while len(view):
+            view = view[os.write(masterFd, view):]
+
+
+class SimulatedTransport(Transport):
+    """An in-process connection to a SimulatedDevice, without any operating system I/O."""
+    # there is no USB link to adapt to
+    writeChunkSize: int = 1 << 16
+
+    def __init__(self, device=None, timeout: float = 1.0):
+        """Create a new connection to a simulated device.
+
+        :param Optional[SimulatedDevice] device: The simulated device. By default, a new one is created.
+        :param float timeout: How long a read waits for data in seconds"""
+        if device is None:
+            from SmartWaveAPI.communication.simulateddevice import SimulatedDevice
+            device = SimulatedDevice()
+
+        self.device = device
+        self._timeout: float = timeout
+        self._received: bytearray = bytearray()
+        self._condition = threading.Condition()
+        self._open: bool = False
+
+    def __repr__(self) -> str:
+        return "SimulatedTransport(%r)" % self.device
+
+    def open(self):
+        """Connect to the simulated device."""
+        with self._condition:
+            self._received = bytearray()
+            self._open = True
+        self.device.setOutput(self._receiveFromDevice)
+
+    def _receiveFromDevice(self, data: bytes):
+        """Buffer the output of the simulated device and wake up a waiting read.
+
+        :param bytes data: The output of the device"""
+        with self._condition:
+            if self._open:
+                self._received += data
+                self._condition.notify_all()
+
+    def close(self):
+        """Disconnect from the simulated device and wake up a waiting read."""
+        with self._condition:
+            self._open = False
+            self._condition.notify_all()
+        self.device.close()
+
+    def isOpen(self) -> bool:
+        """Return whether the simulated device is connected.
+
+        :return: True if the device is connected, False otherwise
+        :rtype: bool"""
+        return self._open
+
+    def read(self, size: int) -> bytes:
+        """Read up to size bytes of the output of the simulated device.
+
+        :param int size: The maximum number of bytes to read
+        :return: The received bytes; empty if the read timed out
+        :rtype: bytes
+        :raises OSError: If the connection was closed"""
+        with self._condition:
+            if not self._received and self._open:
+                self._condition.wait(self._timeout)
+            if not self._open:
+                raise OSError("The simulated device is disconnected")
+
+            data = bytes(self._received[:size])
+            del self._received[:size]
+            return data
+
+    def inWaiting(self) -> int:
+        """Get the number of received bytes which can be read without waiting.
+
+        :return: The number of bytes
+        :rtype: int"""
+        return len(self._received)
+
+    def write(self, data: Union[bytes, bytearray, memoryview]):
+        """Pass data to the simulated device.
+
+        :param Union[bytes, bytearray, memoryview] data: The data to write
+        :raises OSError: If the connection was closed"""
+        if not self._open:
+            raise OSError("The simulated device is disconnected")
+        self.device.receive(bytes(data))
@@ -5,5 +5,6 @@ from SmartWaveAPI.configitems.driver import *
 from SmartWaveAPI.configitems.i2cdriver import *
 from SmartWaveAPI.configitems.spidriver import *
 from SmartWaveAPI.configitems.stimulus import *
+from SmartWaveAPI.configitems.readbackstream import *
 from SmartWaveAPI.configitems.config import *
 from SmartWaveAPI.configitems.gpio import *
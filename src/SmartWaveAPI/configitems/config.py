@@ -1,5 +1,11 @@
+import threading
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Deque, Optional, Sequence, Tuple, Union, Any
+
 from SmartWaveAPI.definitions import Command, StimulusType
 from SmartWaveAPI.configitems import Driver, Stimulus
+from SmartWaveAPI.configitems.readbackstream import ReadbackStream
 
 
 class Config:
@@ -19,6 +25,15 @@ class Config:
         self._driver: Driver = driver
         self._stimulus: Stimulus = stimulus
 
+        # outstanding readbacks as (trigger number, (future, decode)), oldest first; the request is None for a
+        # readback nobody waits for
+        self._pendingReadbacks: Deque[Tuple[int, Optional[Tuple[Future, bool]]]] = deque()
+        self._pendingLock = threading.Lock()
+        self._requestLock = threading.Lock()
+        # the stream which receives all readbacks nobody waits for
+        self._stream: Optional[ReadbackStream] = None
+        self._device.registerReadbackConfig(self)
+
     def __del__(self) -> None:
         """Destructor - return all resources to the device."""
         self.delete()
@@ -58,12 +73,13 @@ class Config:
             ]))
 
     def writeToDevice(self):
-        """Write the configurations of all relevant objects to the device."""
-        self._driver.writeToDevice()
-        self._stimulus.writeToDevice()
-        self._driver.writePinConnectionsToDevice()
-        self._driver.writePinsToDevice()
-        self.writeStimulusDriverConnectionToDevice()
+        """Write the configurations of all relevant objects to the device, in a single write."""
+        with self._device.batch():
+            self._driver.writeToDevice()
+            self._stimulus.writeToDevice()
+            self._driver.writePinConnectionsToDevice()
+            self._driver.writePinsToDevice()
+            self.writeStimulusDriverConnectionToDevice()
 
     def getRecorderId(self) -> int:
         """Get the ID of the recorder associated with this Config object.
@@ -73,9 +89,172 @@ class Config:
         return self._stimulus.getId()
 
     def delete(self):
-        """Delete this configuration and return all resources to the device."""
-        self._driver.delete()
-        self._stimulus.delete()
+        """Delete this configuration and return all resources to the device.
+
+        Outstanding readback requests are cancelled, and a running stream is stopped."""
+        stream = self._stream
+        if stream is not None:
+            stream.stop(0)
+
+        self._device.unregisterReadbackConfig(self)
+        self.discardPendingReadbacks()
+
+        with self._device.batch():
+            self._driver.delete()
+            self._stimulus.delete()
+
+    def _configureRequest(self, request: Any):
+        """Send the configuration of a request to the device, before the device is triggered.
+
+        :param Any request: The request, e.g. the data to send"""
+        raise NotImplementedError
+
+    def _decodeReadback(self, samples: Sequence[int]) -> Any:
+        """Decode the samples read back from the device into the result of a request.
+
+        :param Sequence[int] samples: The samples read back from the device
+        :return: The result of the request"""
+        return samples
+
+    def _submitRequest(self, request: Any, decode: bool, track: bool = True) -> Optional[Future]:
+        """Configure a request on the device, trigger it and queue the request for the readback.
+
+        The configuration and the trigger are sent to the device in a single write.
+
+        :param Any request: The request, e.g. the data to send
+        :param bool decode: Whether the future resolves to the decoded result, or to the raw readback samples
+        :param bool track: Whether to track the readback in a future
+        :return: The future of the readback if track is set, else None
+        :rtype: Optional[Future]"""
+        future: Optional[Future] = Future() if track else None
+        # the configuration is sent together with the trigger
+        with self._requestLock, self._device.batch():
+            self._configureRequest(request)
+            self._device.triggerForConfig(self, (future, decode) if track else None)
+
+        return future
+
+    def queueReadback(self, request: Optional[Tuple[Future, bool]], trigger: int = 0) -> bool:
+        """Queue the readback which the device sends for this config after a trigger.
+
+        Called by the device for every trigger, before the trigger is sent. Every trigger starts all configurations
+        on the device, so readbacks are expected for triggers of other configs as well; these are queued as None
+        and dropped when they arrive.
+
+        :param Optional[Tuple[Future, bool]] request: The future of the request which caused the trigger and whether
+            it resolves to the decoded result, or None if nobody waits for the readback
+        :param int trigger: The number of the trigger since the device was connected
+        :return: Whether a readback was queued
+        :rtype: bool"""
+        if request is None and self._getReadNumber() == 0:
+            # nothing is read back for this config
+            return False
+
+        with self._pendingLock:
+            self._pendingReadbacks.append((trigger, request))
+        return True
+
+    def unqueueReadback(self):
+        """Remove the most recently queued readback, if the trigger could not be sent to the device."""
+        with self._pendingLock:
+            if self._pendingReadbacks:
+                self._pendingReadbacks.pop()
+
+    def _waitForReadback(self, future: Future, timeout: Union[float, None]) -> Sequence[int]:
+        """Wait for the raw readback samples of a request.
+
+        :param Future future: The future of the request, created with decode set to False
+        :param Union[float, None] timeout: How long to wait for the response from the device in seconds,
+            or None to wait indefinitely
+        :return: The samples read back from the device
+        :rtype: Sequence[int]
+        :raises TimeoutError: If the timeout for reading back from the device is exceeded."""
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # nobody waits for the readback anymore, drop it when it arrives
+            with self._pendingLock:
+                for i, (trigger, request) in enumerate(self._pendingReadbacks):
+                    if request is not None and request[0] is future:
+                        self._pendingReadbacks[i] = (trigger, None)
+                        break
+            raise TimeoutError("Timeout waiting for readback from device.")
+
+    def readbackHandler(self, recorder_id: int, samples: Sequence[int]):
+        """Resolve the oldest queued readback with a readback of this config's recorder.
+
+        Called by the reading thread of the device. Readbacks nobody waits for are passed to the stream of the
+        config, if one is running.
+
+        :param int recorder_id: The ID of the recorder the samples were read from
+        :param Sequence[int] samples: The samples read back from the device"""
+        with self._pendingLock:
+            request = self._pendingReadbacks.popleft()[1] if self._pendingReadbacks else None
+            stream = self._stream
+
+        if request is not None:
+            future, decode = request
+            if future.set_running_or_notify_cancel():
+                future.set_result(self._decodeReadback(samples) if decode else samples)
+        elif stream is not None:
+            stream._push(samples)
+
+    def discardPendingReadbacks(self):
+        """Cancel all outstanding readback requests, e.g. because the device was reset or disconnected and will not
+        send their readbacks anymore."""
+        with self._pendingLock:
+            pending = list(self._pendingReadbacks)
+            self._pendingReadbacks.clear()
+
+        for trigger, request in pending:
+            if request is not None:
+                request[0].cancel()
+
+    def discardLostReadbacks(self, completed_triggers: int):
+        """Drop the queued readbacks of triggers which the device finished without sending them.
+
+        Called by the device when it reports idle. Readbacks arrive before the device reports idle, so a readback
+        still queued for a finished trigger was lost; if it was left in the queue, it would take the place of every
+        later readback of this config. Requests waiting for a lost readback fail with a TimeoutError.
+
+        :param int completed_triggers: The number of triggers since the device was connected, which it finished"""
+        lost = []
+        with self._pendingLock:
+            while self._pendingReadbacks and self._pendingReadbacks[0][0] <= completed_triggers:
+                lost.append(self._pendingReadbacks.popleft()[1])
+
+        for request in lost:
+            if request is not None and request[0].set_running_or_notify_cancel():
+                request[0].set_exception(TimeoutError("The device finished without sending the readback."))
+
+    def _startStream(self, request: Any, **kwargs) -> ReadbackStream:
+        """Start a stream which repeats a request and collects its readbacks.
+
+        :param Any request: The request to repeat, e.g. the data to send
+        :param kwargs: The parameters of the ReadbackStream
+        :return: The running stream
+        :rtype: ReadbackStream"""
+        stream = ReadbackStream(self, request, **kwargs)
+        stream.start()
+        return stream
+
+    def _attachStream(self, stream: ReadbackStream):
+        """Pass the readbacks nobody waits for to a stream.
+
+        :param ReadbackStream stream: The stream
+        :raises Exception: If another stream is already attached"""
+        with self._pendingLock:
+            if self._stream is not None and self._stream is not stream:
+                raise Exception("This config already has a running stream")
+            self._stream = stream
+
+    def _detachStream(self, stream: ReadbackStream):
+        """Stop passing readbacks to a stream, if it is attached.
+
+        :param ReadbackStream stream: The stream"""
+        with self._pendingLock:
+            if self._stream is stream:
+                self._stream = None
 
     def _getReadNumber(self) -> int:
         """Get the number of samples to read back from the device.
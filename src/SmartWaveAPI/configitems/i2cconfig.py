@@ -1,10 +1,10 @@
 import math
-import threading
+from concurrent.futures import Future
 
-from SmartWaveAPI.configitems import Config, I2CDriver, Pin
+from SmartWaveAPI.configitems import Config, I2CDriver, Pin, ReadbackStream
 from SmartWaveAPI.definitions import I2CTransaction, I2CWrite, I2CRead, I2CTransactionResult
 
-from typing import List, Union, Optional
+from typing import List, Union, Optional, Sequence
 
 
 class I2CConfig(Config):
@@ -27,9 +27,6 @@ class I2CConfig(Config):
         :param str sda_display_name: The name to display for the driver's SDA pin. Default: SDA"""
         self._device = device
 
-        self._readSemaphore = threading.Semaphore(0)
-        self._latestReadValues: List[I2CTransactionResult] = []
-
         self._driver: I2CDriver = self._device.getNextAvailableI2CDriver()
         self._driver.configure(clock_speed=clock_speed, scl_display_name=scl_display_name,
                                sda_display_name=sda_display_name)
@@ -55,19 +52,17 @@ class I2CConfig(Config):
         """Set the list of transactions and send the configuration to the connected device.
 
         Also checks if the transactions were already the same, and skips reconfiguring the device if so.
+        As transactions are immutable, this is an identity or hash comparison for each transaction.
 
         :param List[I2CTransaction] transactions: The list of transactions"""
-        changedTransactions = True
-        if len(transactions) == len(self._lastTransactions):
-            changedTransactions = False
-            for newTransaction, oldTransaction in zip(transactions, self._lastTransactions):
-                if newTransaction.__dict__ != oldTransaction.__dict__:
-                    changedTransactions = True
-                    break
+        changedTransactions = transactions != self._lastTransactions
+        statistics = self._device.statistics
+        if statistics is not None:
+            statistics.recordReconfiguration(type(self).__name__, not changedTransactions)
 
         if changedTransactions:
             # write new transactions
-            self._lastTransactions = transactions
+            self._lastTransactions = list(transactions)
             self._stimulus.samples = self._driver.generateSamples(transactions)
             self._stimulus.writeToDevice()
 
@@ -91,35 +86,77 @@ class I2CConfig(Config):
 
         :return: If blocking == true, return the information about the transaction on the I2C bus. Else return None.
         :rtype: Union[None, List[I2CTransactionResult]]
-        :raises Exception: If the blocking mode is requested and another callback
-        for a readback operation is already registered
         :raises TimeoutError: If the timeout for reading back from the device is exceeded."""
-        if blocking:
-            if self._device.readbackCallback is not None:
-                raise Exception("Cannot configure a blocking write operation because there is already a readback "
-                                "callback registered on the device")
+        samples = self._sendAndReadback(transactions, blocking, timeout)
+        if samples is None:
+            return None
+
+        return list(self._driver.decodeSamples(samples))
+
+    def stream(self,
+               transactions: List[I2CTransaction],
+               max_blocks: int = 64,
+               in_flight: int = 4,
+               continuous: bool = False,
+               timeout: float = 1.0) -> ReadbackStream:
+        """Perform the same transactions on the I2C bus over and over, and stream their results.
+
+        :param List[I2CTransaction] transactions: The transactions to perform in every block
+        :param int max_blocks: The number of blocks the queue of the stream holds
+        :param int in_flight: The number of blocks which may wait for their readback at the same time
+        :param bool continuous: Run the device in TriggerMode.Full instead of retriggering it for every block
+        :param float timeout: How long to wait for a block in seconds
+        :return: The running stream, which yields the information about the transactions of each block
+        :rtype: ReadbackStream"""
+        return self._startStream(transactions, max_blocks=max_blocks, in_flight=in_flight, continuous=continuous,
+                                 timeout=timeout)
+
+    def submitTransactions(self, transactions: List[I2CTransaction]) -> Future:
+        """Send a transaction over I2C with the connected device without waiting for the response.
+
+        Several submitted transactions can be outstanding at the same time; their readbacks are matched to the
+        requests in the order they were submitted. If the same transaction already exists on the device,
+        the reconfiguration of the device is skipped.
 
-            # acquire callback
-            self._device.readbackCallback = self._readCallback
+        :param List[I2CTransaction] transactions: The transaction to perform on the bus
+        :return: A future which resolves to the information about the transaction on the I2C bus
+        :rtype: Future[List[I2CTransactionResult]]"""
+        return self._submitRequest(transactions, True)
 
-        self.setTransactions(transactions)
-        self._device.trigger()
+    def _sendAndReadback(self,
+                         transactions: List[I2CTransaction],
+                         blocking: bool = True,
+                         timeout: Union[float, None] = 1.0
+                         ) -> Union[None, Sequence[int]]:
+        """Send a transaction over I2C with the connected device and return the undecoded readback samples.
 
-        if blocking:
-            # wait for readback
-            if self._readSemaphore.acquire(timeout=timeout):
-                # readback successful
+        :param List[I2CTransaction] transactions: The transaction to perform on the bus
+        :param bool blocking: If true, wait for the response from the connected device
+        :param Union[float, None] timeout: How long to wait for the response from the device in seconds.
+            Ignored if blocking is set to False, default 1s, set to None to deactivate timeout.
+
+        :return: If blocking == true, return the samples read back from the device. Else return None.
+        :rtype: Union[None, Sequence[int]]
+        :raises TimeoutError: If the timeout for reading back from the device is exceeded."""
+        if not blocking:
+            self._submitRequest(transactions, False, False)
+            return None
+
+        return self._waitForReadback(self._submitRequest(transactions, False), timeout)
 
-                # release callback
-                self._device.readbackCallback = None
+    def _configureRequest(self, request: List[I2CTransaction]):
+        """Send the transactions of a request to the device, before the device is triggered.
 
-                return self._latestReadValues
-            else:
-                # timeout expired
-                self._device.readbackCallback = None
-                raise TimeoutError("Timeout waiting for readback from device.")
+        :param List[I2CTransaction] request: The transactions to perform on the bus"""
+        self.setTransactions(request)
 
-        return None
+    def _decodeReadback(self, samples: Sequence[int]) -> List[I2CTransactionResult]:
+        """Decode the samples read back from the device into the results of the transactions.
+
+        :param Sequence[int] samples: The samples read back from the device
+        :return: The information about the transactions on the I2C bus
+        :rtype: List[I2CTransactionResult]"""
+        return list(self._driver.decodeSamples(samples))
 
     def write(self,
               device_id: int,
@@ -140,8 +177,6 @@ class I2CConfig(Config):
 
         :return: If blocking == true, return the information on the transaction on the I2C bus. Else return None.
         :rtype: Union[None, I2CTransactionResult]
-        :raises Exception: If the blocking mode is requested and another callback
-        for a readback operation is already registered
         :raises TimeoutError: If the timeout for reading back from the device is exceeded."""
         transactions = [I2CWrite(device_id, data)]
         ret = self.sendTransactions(transactions, blocking, timeout)
@@ -173,56 +208,26 @@ class I2CConfig(Config):
             If blocking == false, return None.
         :rtype: Union[True, None]
         :raises ConnectionError: If the transaction on the I2C bus was not acknowledged by the target device.
-        :raises Exception: If the blocking mode is requested and another callback
-        for a readback operation is already registered
         :raises TimeoutError: If the timeout for reading back from the device is exceeded."""
         res = self.write(device_id, address + value, blocking, timeout)
 
         if res is None:
             return res
         else:
-            if res.ack_device_id and False not in res.acks_data:
-                return True
-            else:
-                raise ConnectionError("The target device did not acknowledge the write operation.")
-
-    def _readCallback(self, recorder_id: int, values: List[int]):
-        """Handle the result of an I2C read."""
-        if recorder_id == self.getRecorderId():
-            self._latestReadValues = []
-            while len(values):
-                info = values.pop(0)
-
-                datalen = info & (0xff)
-                device_id = (info >> 8) & 0x7f
-                read = True if info & (1 << 16) else False
-                ack_device_id = True if info & (1 << 17) else False
-
-                data = []
-                data_acks = []
-                for i in range(math.ceil(datalen / 2.0)):
-                    if len(values) == 0:
-                        break
-                    dataframe = values.pop(0)
-
-                    # first
-                    data.append(dataframe & 0xff)
-                    data_acks.append(True if dataframe & (1 << 8) else False)
-
-                    # second
-                    if (dataframe & (1 << 25)):
-                        data.append(dataframe >> 16 & 0xff)
-                        data_acks.append(True if dataframe & (1 << 24) else False)
-
-                self._latestReadValues.append(I2CTransactionResult(
-                    read=read,
-                    device_id=device_id,
-                    ack_device_id=ack_device_id,
-                    data=bytes(data),
-                    acks_data=data_acks
-                ))
-
-            self._readSemaphore.release()
+            return self._checkWriteRegisterResult(res)
+
+    @staticmethod
+    def _checkWriteRegisterResult(res: I2CTransactionResult) -> bool:
+        """Check the result of a register write for acknowledgement.
+
+        :param I2CTransactionResult res: The result of the write transaction
+        :return: True if the transaction succeeded
+        :rtype: True
+        :raises ConnectionError: If the transaction on the I2C bus was not acknowledged by the target device."""
+        if res.ack_device_id and res.data_acked:
+            return True
+        else:
+            raise ConnectionError("The target device did not acknowledge the write operation.")
 
     def read(self,
              device_id: int,
@@ -243,8 +248,6 @@ class I2CConfig(Config):
 
         :return: If blocking == True, return the information on the transaction on the I2C bus. Else return None.
         :rtype: Union[None, I2CTransactionResult]
-        :raises Exception: If the blocking mode is requested and another callback
-        for a readback operation is already registered
         :raises TimeoutError: If the timeout for reading back from the device is exceeded."""
 
         transactions = [I2CRead(device_id, length)]
@@ -279,8 +282,6 @@ class I2CConfig(Config):
             If blocking == False, return None.
         :rtype: Union[bytes, None]
         :raises ConnectionError: If the transaction on the I2C bus was not acknowledged by the target device.
-        :raises Exception: If the blocking mode is requested and another callback
-        for a readback operation is already registered
         :raises TimeoutError: If the timeout for reading back from the device is exceeded."""
 
         transactions = [
@@ -293,12 +294,22 @@ class I2CConfig(Config):
         if res is None:
             return res
         else:
-            for res_part in res:
-                if (not res_part.ack_device_id   # no ack in devId
-                        or (not res_part.read and False in res_part.acks_data)):  # no ack in write data
-                    raise ConnectionError("The target device did not acknowledge the read operation.")
+            return self._checkReadRegisterResult(res)
+
+    @staticmethod
+    def _checkReadRegisterResult(res: List[I2CTransactionResult]) -> bytes:
+        """Check the results of a register read for acknowledgement and return the read bytes.
+
+        :param List[I2CTransactionResult] res: The results of the address write and the read transaction
+        :return: The read bytes from the target device
+        :rtype: bytes
+        :raises ConnectionError: If the transaction on the I2C bus was not acknowledged by the target device."""
+        for res_part in res:
+            if (not res_part.ack_device_id   # no ack in devId
+                    or (not res_part.read and not res_part.data_acked)):  # no ack in write data
+                raise ConnectionError("The target device did not acknowledge the read operation.")
 
-            return res[1].data
+        return res[1].data
 
     def _getReadNumber(self) -> int:
         """Get the number of samples to read back from the device.
@@ -309,8 +320,7 @@ class I2CConfig(Config):
 
         for transaction in self._lastTransactions:
             readNumber += 1  # info word
-            datalength = len(transaction.data) if type(transaction) is I2CWrite else transaction.length
-            readNumber += math.ceil(datalength / 2.0)
+            readNumber += math.ceil(transaction.length / 2.0)
 
         return readNumber
 
@@ -327,8 +337,7 @@ class I2CConfig(Config):
         
         :returns: A list of connected device IDs
         :rtype: List[int]
-        :raises ValueError If the range is not within [0x00, 0x7f] or range_lower is bigger than range_upper
-        :raises Exception: If another callback for a readback operation is already registered"""
+        :raises ValueError If the range is not within [0x00, 0x7f] or range_lower is bigger than range_upper"""
         if range_lower > range_upper:
             raise ValueError("range_lower cannot be bigger than range_upper")
         if range_lower < 0:
@@ -341,10 +350,10 @@ class I2CConfig(Config):
             for x in range(range_lower, range_upper + 1)
         ]
 
-        results = self.sendTransactions(transactions, timeout=timeout)
+        samples = self._sendAndReadback(transactions, timeout=timeout)
 
         device_ids = []
-        for result in results:
+        for result in self._driver.decodeSamples(samples):
             if (result.ack_device_id):
                 device_ids.append(result.device_id)
 
@@ -1,9 +1,59 @@
-import math
-from typing import Dict, List, Optional
+import struct
+from typing import Dict, List, Optional, Sequence, Iterator, Tuple
 from .pin import Pin
 
 from SmartWaveAPI.configitems import Driver
-from SmartWaveAPI.definitions import Command, DriverType, I2CRead, I2CWrite, I2CTransaction
+from SmartWaveAPI.definitions import Command, DriverType, I2CTransaction, I2CTransactionResult
+
+# translation tables for single bytes of big-endian data frames
+_lowestBitCharTable = bytes(ord('1') if b & 1 else ord('0') for b in range(256))
+_secondBitTable = bytes((b >> 1) & 1 for b in range(256))
+
+
+def _decodeDataFrames(frames: Sequence[int]) -> Tuple[bytes, int]:
+    """Split the data frames of one I2C transaction into the transferred bytes and the acks.
+
+    Each frame holds the first byte in bits 0-7 and its ack in bit 8, and optionally a second byte in bits 16-23,
+    its ack in bit 24 and its valid flag in bit 25.
+
+    :param Sequence[int] frames: The data frames of the transaction
+    :return: The transferred bytes, and the acks as a bitmask where bit i corresponds to byte i
+    :rtype: Tuple[bytes, int]"""
+    numFrames = len(frames)
+    if numFrames == 0:
+        return b'', 0
+
+    raw = struct.pack('>%dI' % numFrames, *frames)
+    secondValid = raw[0::4].translate(_secondBitTable)
+    numSecond = secondValid.count(1)
+
+    if numSecond == numFrames or (numSecond == numFrames - 1 and secondValid[-1] == 0):
+        # all frames but the last one are full - interleave the first and second bytes of all frames
+        length = numFrames + numSecond
+        data = bytearray(length)
+        data[0::2] = raw[3::4]
+        data[1::2] = raw[1::4][:numSecond]
+
+        ackChars = bytearray(length)
+        ackChars[0::2] = raw[2::4].translate(_lowestBitCharTable)
+        ackChars[1::2] = raw[0::4][:numSecond].translate(_lowestBitCharTable)
+        return bytes(data), int(ackChars[::-1], 2)
+
+    data = bytearray()
+    acks_mask = 0
+    for dataframe in frames:
+        # first
+        if dataframe & (1 << 8):
+            acks_mask |= 1 << len(data)
+        data.append(dataframe & 0xff)
+
+        # second
+        if dataframe & (1 << 25):
+            if dataframe & (1 << 24):
+                acks_mask |= 1 << len(data)
+            data.append(dataframe >> 16 & 0xff)
+
+    return bytes(data), acks_mask
 
 
 class I2CDriver(Driver):
@@ -83,8 +133,9 @@ class I2CDriver(Driver):
             self._displayNames["SDA"] = sda_display_name
 
         if self._device.isConnected():
-            self.writeToDevice()
-            self.writePinConnectionsToDevice()
+            with self._device.batch():
+                self.writeToDevice()
+                self.writePinConnectionsToDevice()
 
     @property
     def clockSpeed(self) -> int:
@@ -132,50 +183,50 @@ class I2CDriver(Driver):
     def generateSamples(self, transactions: List[I2CTransaction]) -> List[int]:
         """Generate a stream of bytes for the SmartWave to interpret as I2C Transactions.
 
+        The frames of each transaction are only encoded once and cached in the transaction object.
+
         :param I2CTransaction transactions: List of I2C transactions
         :return: List of samples for the SmartWave to interpret as I2C Transactions
         :rtype: List[int]"""
         samples = []
         for transaction in transactions:
-            length = len(transaction.data) if type(transaction) is I2CWrite else transaction.length
-            read = type(transaction) is I2CRead
-
-            command_frame = 0
-            command_frame |= length & 0xff  # datalength
-            command_frame |= (1 if read else 0) << 9  # read/not write
-            command_frame |= 1 << 10  # use device select in frame
-            command_frame |= (transaction.deviceId & 0xff) << 16  # device Id
-            command_frame |= 0xC << 28  # command frame marker
-
-            samples.append(command_frame)
-
-            data_frame = 0
-            data_frame |= 0xD << 28  # data frame marker
-
-            num_data_frames = math.ceil(length / 2.0)
-
-            data_frames = [data_frame] * num_data_frames
-            for i in range(num_data_frames):
-                # first data in frame
-                if not read:
-                    data_frames[i] |= (transaction.data[i * 2])  # data
-                if read:
-                    data_frames[i] |= 1 << 8  # ack
-                data_frames[i] |= 1 << 9  # valid
-
-                if (i + 1) * 2 <= length:
-                    # second data in frame
-                    if not read:
-                        data_frames[i] |= (transaction.data[i * 2 + 1]) << 16  # data
-                    if read:
-                        data_frames[i] |= 1 << 24  # ack
-                    data_frames[i] |= 1 << 25  # valid
-
-
-            samples += data_frames
+            samples += transaction.samples
 
         return samples
 
+    @staticmethod
+    def decodeSamples(samples: Sequence[int]) -> Iterator[I2CTransactionResult]:
+        """Decode the samples read back from the device into the results of the I2C transactions.
+
+        The samples are walked by index, and the data frames of each transaction are split into data bytes and acks
+        in bulk. The results are created lazily while iterating.
+
+        :param Sequence[int] samples: The samples read back from the device
+        :return: An iterator over the results of the transactions, in the order they were performed
+        :rtype: Iterator[I2CTransactionResult]"""
+        index = 0
+        numSamples = len(samples)
+        while index < numSamples:
+            info = samples[index]
+            index += 1
+
+            datalen = info & 0xff
+            device_id = (info >> 8) & 0x7f
+            read = True if info & (1 << 16) else False
+            ack_device_id = True if info & (1 << 17) else False
+
+            numFrames = min((datalen + 1) // 2, numSamples - index)
+            data, acks_mask = _decodeDataFrames(samples[index:index + numFrames])
+            index += numFrames
+
+            yield I2CTransactionResult(
+                read=read,
+                device_id=device_id,
+                ack_device_id=ack_device_id,
+                data=data,
+                acks_data=acks_mask
+            )
+
     def delete(self):
         """Unconfigure this driver along with its pins and return all resources to the device."""
         if self.pins["SDA"]:
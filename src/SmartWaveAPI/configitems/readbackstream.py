@@ -0,0 +1,234 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Iterator, Optional, Sequence
+
+from SmartWaveAPI.definitions import TriggerMode
+
+
+class ReadbackStream:
+    """A continuous stream of readbacks of a config, e.g. to sample a sensor at a high rate.
+
+    The stream either retriggers the device for every block, keeping a number of triggers in flight, or runs the
+    device in TriggerMode.Full, where the device repeats the configuration by itself. The readbacks are buffered in
+    a bounded queue and decoded when they are taken out, so the reading thread of the device is not slowed down.
+
+    When retriggering, no more triggers are sent than there is room in the queue, so a slow consumer throttles the
+    stream and no readback is lost. In continuous mode the device does not wait, so the oldest block is dropped when
+    the queue is full; the dropped blocks are counted in dropped."""
+
+    def __init__(self,
+                 config,
+                 request: Any,
+                 max_blocks: int = 64,
+                 in_flight: int = 4,
+                 continuous: bool = False,
+                 decode: bool = True,
+                 timeout: float = 1.0):
+        """Create a new stream of a config. The stream is not started until start() is called.
+
+        :param Config config: The config to stream the readbacks of
+        :param Any request: The request which is repeated, e.g. the data to send
+        :param int max_blocks: The number of readbacks the queue holds
+        :param int in_flight: The number of triggers which may wait for their readback at the same time, when
+            retriggering
+        :param bool continuous: Run the device in TriggerMode.Full instead of retriggering it
+        :param bool decode: Decode the readbacks like the config does, instead of returning the raw samples
+        :param float timeout: How long to wait for a readback in seconds, before a trigger is counted as lost
+        :raises ValueError: If max_blocks or in_flight is smaller than 1"""
+        if max_blocks < 1 or in_flight < 1:
+            raise ValueError("The stream needs room for at least one block in the queue and in flight")
+
+        self._config = config
+        self._request: Any = request
+        self.maxBlocks: int = max_blocks
+        self.inFlight: int = min(in_flight, max_blocks)
+        self.continuous: bool = continuous
+        self.decode: bool = decode
+        self.timeout: float = timeout
+
+        # the number of triggers sent, readbacks received, blocks dropped because the queue was full, and triggers
+        # whose readback did not arrive in time
+        self.triggers: int = 0
+        self.received: int = 0
+        self.dropped: int = 0
+        self.lost: int = 0
+
+        self._blocks: Deque[Sequence[int]] = deque()
+        self._condition = threading.Condition()
+        self._outstanding: int = 0
+        self._lastReadback: float = 0.0
+        self._running: bool = False
+        self._stopped: bool = False
+        self._error: Optional[BaseException] = None
+        self._thread: Optional[threading.Thread] = None
+        self._previousTriggerMode: Optional[TriggerMode] = None
+
+    def __enter__(self):
+        """Enter - return instance."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Exit - stop the stream."""
+        self.stop()
+
+    def __iter__(self) -> Iterator[Any]:
+        """Iterate over the blocks until the stream is stopped and all blocks are taken out.
+
+        :raises TimeoutError: If no block arrives within the timeout of the stream"""
+        while True:
+            block = self.get(self.timeout)
+            if block is None:
+                return
+            yield block
+
+    def start(self):
+        """Start the stream.
+
+        :raises Exception: If the stream was already started, or the config already has a stream"""
+        if self._running or self._stopped:
+            raise Exception("The stream was already started")
+
+        self._config._attachStream(self)
+        self._running = True
+        self._lastReadback = time.monotonic()
+        device = self._config._device
+
+        if self.continuous:
+            self._previousTriggerMode = device.triggerMode
+            try:
+                with device.batch():
+                    device.triggerMode = TriggerMode.Full
+                    self._config._submitRequest(self._request, False, False)
+                self.triggers += 1
+            except Exception:
+                self._running = False
+                self._config._detachStream(self)
+                raise
+        else:
+            self._thread = threading.Thread(target=self._retrigger, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the stream, and wait for the readbacks of the triggers in flight.
+
+        The blocks in the queue can still be taken out afterwards.
+
+        :param Optional[float] timeout: How long to wait for the readbacks in flight in seconds; by default the
+            timeout of the stream"""
+        with self._condition:
+            if not self._running:
+                return
+            self._running = False
+            self._condition.notify_all()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        device = self._config._device
+        if self.continuous and device.isConnected():
+            # the readbacks sent before the device stopped arrive before it reports idle
+            device.stop(max(deadline - time.monotonic(), 0))
+            device.triggerMode = self._previousTriggerMode
+
+        with self._condition:
+            while self._outstanding > 0 and time.monotonic() < deadline:
+                self._condition.wait(deadline - time.monotonic())
+            self.lost += self._outstanding
+            self._outstanding = 0
+
+            self._config._detachStream(self)
+            self._stopped = True
+            self._condition.notify_all()
+
+    def isRunning(self) -> bool:
+        """Return whether the stream is running.
+
+        :return: True if the stream is running, False otherwise
+        :rtype: bool"""
+        return self._running
+
+    def pending(self) -> int:
+        """Get the number of blocks in the queue.
+
+        :return: The number of blocks
+        :rtype: int"""
+        return len(self._blocks)
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """Take the oldest block out of the queue, waiting for one if the queue is empty.
+
+        :param Optional[float] timeout: How long to wait for a block in seconds, or None to wait indefinitely
+        :return: The decoded readback, or the raw samples if decode is not set; None if the stream is stopped and
+            the queue is empty
+        :rtype: Any
+        :raises TimeoutError: If no block arrives within the timeout
+        :raises Exception: If retriggering the device failed"""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._blocks or self._stopped or self._error is not None,
+                                            timeout):
+                raise TimeoutError("Timeout waiting for readback from device.")
+
+            if not self._blocks:
+                if self._error is not None:
+                    raise self._error
+                return None
+
+            samples = self._blocks.popleft()
+            # there is room for another trigger
+            self._condition.notify_all()
+
+        return self._config._decodeReadback(samples) if self.decode else samples
+
+    def _push(self, samples: Sequence[int]):
+        """Add a readback to the queue. Called by the config in the reading thread of the device.
+
+        :param Sequence[int] samples: The samples read back from the device"""
+        with self._condition:
+            self.received += 1
+            self._lastReadback = time.monotonic()
+            if self._outstanding > 0:
+                self._outstanding -= 1
+
+            if len(self._blocks) >= self.maxBlocks:
+                self._blocks.popleft()
+                self.dropped += 1
+            self._blocks.append(samples)
+            self._condition.notify_all()
+
+    def _hasRoom(self) -> bool:
+        """Return whether another trigger may be sent. Only to be called with the condition held."""
+        return self._outstanding < self.inFlight and len(self._blocks) + self._outstanding < self.maxBlocks
+
+    def _retrigger(self):
+        """Keep triggering the device while there is room in the queue, until the stream is stopped."""
+        while True:
+            with self._condition:
+                while self._running and not self._hasRoom():
+                    if self._outstanding and time.monotonic() - self._lastReadback > self.timeout:
+                        # the readbacks did not arrive; do not wait for them forever
+                        self.lost += self._outstanding
+                        self._outstanding = 0
+                        break
+                    self._condition.wait(self.timeout)
+
+                if not self._running:
+                    return
+                if self._outstanding == 0:
+                    self._lastReadback = time.monotonic()
+                self._outstanding += 1
+
+            try:
+                self._config._submitRequest(self._request, False, False)
+                self.triggers += 1
+            except Exception as e:
+                with self._condition:
+                    self._outstanding -= 1
+                    self._error = e
+                    self._running = False
+                    self._stopped = True
+                    self._config._detachStream(self)
+                    self._condition.notify_all()
+                return
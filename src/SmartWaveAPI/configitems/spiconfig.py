@@ -1,6 +1,6 @@
-from typing import Union
-from SmartWaveAPI.configitems import Pin, Config, SPIDriver, Literal, List, Optional
-import threading
+from concurrent.futures import Future
+from typing import Union, Sequence
+from SmartWaveAPI.configitems import Pin, Config, SPIDriver, ReadbackStream, Literal, List, Optional
 
 
 class SPIConfig(Config):
@@ -42,9 +42,6 @@ class SPIConfig(Config):
         :param int cs_inactive_time: How long the CS line should send an inactive level between words, in clock cycles. Default: 1"""
         self._device = device
 
-        self._readSemaphore = threading.Semaphore(0)
-        self._latestReadValues: List[int] = []
-
         self._driver: SPIDriver = self._device.getNextAvailableSPIDriver()
         self._driver.configure(
             clockSpeed=clockspeed,
@@ -89,6 +86,10 @@ class SPIConfig(Config):
                     changedData = True
                     break
 
+        statistics = self._device.statistics
+        if statistics is not None:
+            statistics.recordReconfiguration(type(self).__name__, not changedData)
+
         if changedData:
             # write new transactions
             self._lastData = data
@@ -98,12 +99,6 @@ class SPIConfig(Config):
             # write new expected read number
             self.writeStimulusDriverConnectionToDevice()
 
-    def _readCallback(self, recorder_id: int, values: List[int]):
-        """Handle the result of an SPI read."""
-        if recorder_id == self.getRecorderId():
-            self._latestReadValues = values
-            self._readSemaphore.release()
-
     def write(self,
               data: List[int],
               blocking_read: bool = True,
@@ -120,36 +115,55 @@ class SPIConfig(Config):
 
         :return: If blockingRead == True, return the values that were read over SPI. Else return None.
         :rtype: Union[None, List[int]]
-        :raises Exception: If the blocking read mode is requested and another callback for a
-            readback operation is already registered.
         :raises TimeoutError: If the timeout for reading back from the device is exceeded."""
+        if not blocking_read:
+            self._submitRequest(data, False, False)
+            return None
+
+        return self._decodeReadback(self._waitForReadback(self._submitRequest(data, False), timeout))
+
+    def stream(self,
+               data: List[int],
+               max_blocks: int = 64,
+               in_flight: int = 4,
+               continuous: bool = False,
+               timeout: float = 1.0) -> ReadbackStream:
+        """Write the same data over SPI over and over, and stream the values that were read.
+
+        :param List[int] data: The data to write in every block
+        :param int max_blocks: The number of blocks the queue of the stream holds
+        :param int in_flight: The number of writes which may wait for their readback at the same time
+        :param bool continuous: Run the device in TriggerMode.Full instead of retriggering it for every block
+        :param float timeout: How long to wait for a block in seconds
+        :return: The running stream, which yields the values read in each block
+        :rtype: ReadbackStream"""
+        return self._startStream(data, max_blocks=max_blocks, in_flight=in_flight, continuous=continuous,
+                                 timeout=timeout)
+
+    def submitWrite(self, data: List[int]) -> Future:
+        """Write data over SPI with the connected device without waiting for the response.
+
+        Several submitted writes can be outstanding at the same time; their readbacks are matched to the
+        requests in the order they were submitted. If the data is not new, the reconfiguration of the device is skipped.
 
-        if blocking_read:
-            if self._device.readbackCallback is not None:
-                raise Exception("Cannot configure a blocking read operation because there is already "
-                                "a readback callback registered on the device")
-
-            # acquire callback
-            self._device.readbackCallback = self._readCallback
-
-        self.setData(data)
-        self._device.trigger()
+        :param List[int] data: The data to write
+        :return: A future which resolves to the values that were read over SPI
+        :rtype: Future[List[int]]"""
+        return self._submitRequest(data, True)
 
-        if blocking_read:
-            # wait for readback
-            if self._readSemaphore.acquire(timeout=timeout):
-                # readback successful
+    def _configureRequest(self, request: List[int]):
+        """Send the data of a request to the device, before the device is triggered.
 
-                # release callback
-                self._device.readbackCallback = None
+        :param List[int] request: The data to write"""
+        self.setData(request)
 
-                return self._latestReadValues
-            else:
-                # timeout expired
-                self._device.readbackCallback = None
-                raise TimeoutError("Timeout waiting for readback from device.")
+    def _decodeReadback(self, samples: Sequence[int]) -> List[int]:
+        """Convert the samples read back from the device into the values that were read over SPI.
 
-        return None
+        :param Sequence[int] samples: The samples read back from the device
+        :return: The values that were read over SPI
+        :rtype: List[int]"""
+        return list(samples)
 
     def _getReadNumber(self) -> int:
         """Get the number of samples to read back from the device.
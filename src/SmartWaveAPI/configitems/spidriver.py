@@ -172,8 +172,9 @@ class SPIDriver(Driver):
             self._csInactiveTime = cs_inactive_time
 
         if self._device.isConnected():
-            self.writeToDevice()
-            self.writePinConnectionsToDevice()
+            with self._device.batch():
+                self.writeToDevice()
+                self.writePinConnectionsToDevice()
 
     @property
     def clockSpeed(self) -> int:
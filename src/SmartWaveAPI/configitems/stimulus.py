@@ -1,5 +1,14 @@
+import sys
+from array import array
+
 from SmartWaveAPI.definitions import TriggerMode, Command, StimulusType
-from typing import List
+from typing import List, Sequence
+
+# typecodes of unsigned arrays with the given word size in bits
+_wordTypecodes = {
+    16: 'H',
+    32: 'I' if array('I').itemsize == 4 else 'L',
+}
 
 
 class Stimulus(object):
@@ -23,15 +32,6 @@ class Stimulus(object):
 
     def writeToDevice(self):
         """Write the configuration parameters of this pin to the device."""
-        shiftedSamples = []
-
-        for sample in self.samples:
-            bitShift = self.sampleBitWidth - 8
-            while bitShift >= 0:
-                shiftedSamples.append((sample >> bitShift) & 0xff)
-
-                bitShift = bitShift - 8
-
         self._device.writeToDevice(bytes([
             Command.Stimulus.value,
             self.stimulusType,  # only arbitrary stimulus supported right now
@@ -40,7 +40,55 @@ class Stimulus(object):
             0 if self.triggerMode == TriggerMode.Toggle else 1,
             (len(self.samples) >> 8) & 0xff,
             len(self.samples) & 0xff
-        ] + shiftedSamples))
+        ]) + self.packSamples(self.samples, self.sampleBitWidth))
+
+    @staticmethod
+    def packSamples(samples: Sequence[int], sample_bit_width: int) -> bytes:
+        """Convert samples to the big-endian byte stream which is sent to the device.
+
+        Every sample is truncated to its lowest sample_bit_width bits. Sample bit widths of 8, 16, 24 and 32 bits are
+        converted in bulk; other widths, or samples which do not fit into the bit width, are converted one by one.
+
+        :param Sequence[int] samples: The samples to convert
+        :param int sample_bit_width: The bit width of each sample
+        :return: The packed samples
+        :rtype: bytes"""
+        try:
+            if sample_bit_width == 8:
+                return bytes(samples)
+
+            if sample_bit_width in (16, 32):
+                packed = array(_wordTypecodes[sample_bit_width], samples)
+                if sys.byteorder == 'little':
+                    packed.byteswap()
+                return packed.tobytes()
+
+            if sample_bit_width == 24:
+                words = array(_wordTypecodes[32], samples)
+                if sys.byteorder == 'little':
+                    words.byteswap()
+                rawWords = words.tobytes()
+
+                # drop the most significant byte of each big-endian word
+                packed = bytearray(3 * len(words))
+                packed[0::3] = rawWords[1::4]
+                packed[1::3] = rawWords[2::4]
+                packed[2::3] = rawWords[3::4]
+                return bytes(packed)
+
+        except (OverflowError, ValueError):
+            # at least one sample does not fit into the bit width and needs to be truncated
+            pass
+
+        packed = bytearray()
+        for sample in samples:
+            bitShift = sample_bit_width - 8
+            while bitShift >= 0:
+                packed.append((sample >> bitShift) & 0xff)
+
+                bitShift = bitShift - 8
+
+        return bytes(packed)
 
     def getId(self) -> int:
         """Get the ID of this stimulus.
@@ -1,41 +1,238 @@
-from typing import Union, List
+from typing import Union, List, Optional, Tuple
 
 
-class I2CWrite(object):
+def _encodeI2CTransaction(device_id: int, data: Optional[bytes], length: int) -> Tuple[int, ...]:
+    """Encode an I2C transaction as the 32-bit frames which the SmartWave interprets as an I2C transaction.
+
+    :param int device_id: The device ID to communicate with
+    :param Optional[bytes] data: The data to write, or None for a read operation
+    :param int length: The number of bytes to transfer
+    :return: The command frame, followed by the data frames
+    :rtype: Tuple[int, ...]"""
+    read = data is None
+
+    command_frame = 0
+    command_frame |= length & 0xff  # datalength
+    command_frame |= (1 if read else 0) << 9  # read/not write
+    command_frame |= 1 << 10  # use device select in frame
+    command_frame |= (device_id & 0xff) << 16  # device Id
+    command_frame |= 0xC << 28  # command frame marker
+
+    frames = [command_frame]
+    for i in range((length + 1) // 2):
+        data_frame = 0xD << 28  # data frame marker
+
+        # first data in frame
+        if read:
+            data_frame |= 1 << 8  # ack
+        else:
+            data_frame |= data[i * 2]  # data
+        data_frame |= 1 << 9  # valid
+
+        if (i + 1) * 2 <= length:
+            # second data in frame
+            if read:
+                data_frame |= 1 << 24  # ack
+            else:
+                data_frame |= data[i * 2 + 1] << 16  # data
+            data_frame |= 1 << 25  # valid
+
+        frames.append(data_frame)
+
+    return tuple(frames)
+
+
+class _I2COperation(object):
+    """Common base of the immutable I2C operations.
+
+    Operations are hashable and compare equal if they have the same type and parameters. The frames which encode an
+    operation on the device are only computed once per operation."""
+    __slots__ = ('_deviceId', '_hash', '_samples')
+
+    def __init__(self, device_id: int, key: tuple):
+        """Initialize the common fields of an I2C operation.
+
+        :param int device_id: The device ID to communicate with
+        :param tuple key: The parameters which identify the operation"""
+        self._deviceId: int = device_id
+        self._hash: int = hash((type(self), device_id) + key)
+        self._samples: Optional[Tuple[int, ...]] = None
+
+    def __hash__(self) -> int:
+        """Hash of the operation type and parameters."""
+        return self._hash
+
+    def __eq__(self, other) -> bool:
+        """Operations are equal if they have the same type and parameters."""
+        if self is other:
+            return True
+        if type(other) is not type(self) or other._hash != self._hash:
+            return False
+        return self._key() == other._key()
+
+    def __ne__(self, other) -> bool:
+        """Operations are not equal if they differ in type or parameters."""
+        return not self.__eq__(other)
+
+    def _key(self) -> tuple:
+        """Get the parameters which identify the operation."""
+        raise NotImplementedError
+
+    def _encode(self) -> Tuple[int, ...]:
+        """Encode the operation as frames for the device."""
+        raise NotImplementedError
+
+    @property
+    def deviceId(self) -> int:
+        """The device ID to communicate with"""
+        return self._deviceId
+
+    @property
+    def length(self) -> int:
+        """The number of bytes to transfer"""
+        raise NotImplementedError
+
+    @property
+    def samples(self) -> Tuple[int, ...]:
+        """The 32-bit frames which the SmartWave interprets as this operation; computed on first access.
+
+        :return: The command frame, followed by the data frames
+        :rtype: Tuple[int, ...]"""
+        if self._samples is None:
+            self._samples = self._encode()
+        return self._samples
+
+
+class I2CWrite(_I2COperation):
     """A write operation on an I2C driver"""
+    __slots__ = ('_data',)
+
     def __init__(self, device_id: int, data: bytes):
         """Create an I2C write operation.
 
         :param int device_id: The device ID to write to
-        :param bytes data: The data to write to the device"""
-        self.deviceId = device_id
-        self.data = data
+        :param bytes data: The data to write to the device
+        :raises TypeError: If data is an int, which bytes() would turn into as many zero bytes"""
+        if isinstance(data, int):
+            raise TypeError("The data of an I2CWrite must be bytes or a sequence of ints, not an int")
+        self._data: bytes = bytes(data)
+        super().__init__(device_id, (self._data,))
+
+    def __repr__(self) -> str:
+        """String representation of the write operation."""
+        return "I2CWrite(device_id=0x%02x, data=%r)" % (self._deviceId, self._data)
+
+    def _key(self) -> tuple:
+        """Get the parameters which identify the operation."""
+        return self._deviceId, self._data
+
+    def _encode(self) -> Tuple[int, ...]:
+        """Encode the operation as frames for the device."""
+        return _encodeI2CTransaction(self._deviceId, self._data, len(self._data))
+
+    @property
+    def data(self) -> bytes:
+        """The data to write to the device"""
+        return self._data
 
+    @property
+    def length(self) -> int:
+        """The number of bytes to write"""
+        return len(self._data)
 
-class I2CRead(object):
+
+class I2CRead(_I2COperation):
     """A read operation on an I2C driver"""
+    __slots__ = ('_length',)
+
     def __init__(self, device_id: int, length: int):
         """Create an I2C read operation.
 
         :param int device_id: The device ID to read from
         :param int length: The number of bytes to read from the device"""
-        self.deviceId = device_id
-        self.length = length
+        self._length: int = length
+        super().__init__(device_id, (length,))
+
+    def __repr__(self) -> str:
+        """String representation of the read operation."""
+        return "I2CRead(device_id=0x%02x, length=%d)" % (self._deviceId, self._length)
+
+    def _key(self) -> tuple:
+        """Get the parameters which identify the operation."""
+        return self._deviceId, self._length
+
+    def _encode(self) -> Tuple[int, ...]:
+        """Encode the operation as frames for the device."""
+        return _encodeI2CTransaction(self._deviceId, None, self._length)
+
+    @property
+    def length(self) -> int:
+        """The number of bytes to read from the device"""
+        return self._length
 
 class I2CTransactionResult(object):
-    """The result of an I2C transaction"""
-    def __init__(self, read: bool, device_id: int, ack_device_id: bool, data: bytes, acks_data: List[bool]):
+    """The result of an I2C transaction
+
+    The acknowledge bits of the data bytes are stored as a bitmask; bit i of acks_mask is set if data byte i was
+    acknowledged."""
+    __slots__ = ('read', 'device_id', 'ack_device_id', 'data', 'acks_mask')
+
+    def __init__(self, read: bool, device_id: int, ack_device_id: bool, data: bytes,
+                 acks_data: Union[List[bool], int]):
         """Create an I2C transaction result.
 
         :param bool read: Whether the transaction was a Read or a Write
         :param int device_id: The device ID that was communicated with
         :param bool ack_device_id: Whether the device sent an ACK in response to the device ID
         :param bytes data: The data that was transferred
-        :param bool acks_data: The list of acks received for each data byte """
+        :param Union[List[bool], int] acks_data: The list of acks received for each data byte,
+            or the acks as a bitmask where bit i corresponds to data byte i"""
         self.read: bool = read
         self.device_id: int = device_id
         self.ack_device_id: bool = ack_device_id
         self.data: bytes = data
-        self.acks_data: List[bool] = acks_data
+
+        if isinstance(acks_data, int):
+            self.acks_mask: int = acks_data
+        else:
+            self.acks_mask: int = 0
+            for i, ack in enumerate(acks_data):
+                if ack:
+                    self.acks_mask |= 1 << i
+
+    def __repr__(self) -> str:
+        """String representation of the transaction result."""
+        return ("I2CTransactionResult(read=%s, device_id=0x%02x, ack_device_id=%s, data=%r, acks_data=%s)" %
+                (self.read, self.device_id, self.ack_device_id, self.data, self.acks_data))
+
+    def __eq__(self, other) -> bool:
+        """Results are equal if all their fields are equal."""
+        if not isinstance(other, I2CTransactionResult):
+            return NotImplemented
+        return (self.read == other.read and
+                self.device_id == other.device_id and
+                self.ack_device_id == other.ack_device_id and
+                self.acks_mask == other.acks_mask and
+                self.data == other.data)
+
+    def __hash__(self) -> int:
+        """Hash of all fields of the result."""
+        return hash((self.read, self.device_id, self.ack_device_id, self.data, self.acks_mask))
+
+    @property
+    def acks_data(self) -> List[bool]:
+        """The list of acks received for each data byte, created from the ack bitmask on access.
+
+        :return: One entry per data byte, True if the byte was acknowledged
+        :rtype: List[bool]"""
+        return [bool((self.acks_mask >> i) & 1) for i in range(len(self.data))]
+
+    @property
+    def data_acked(self) -> bool:
+        """Whether every data byte was acknowledged.
+
+        :return: True if all data bytes were acknowledged
+        :rtype: bool"""
+        return self.acks_mask == (1 << len(self.data)) - 1
 
 I2CTransaction = Union[I2CWrite, I2CRead]
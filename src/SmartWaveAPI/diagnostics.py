@@ -0,0 +1,86 @@
+"""Diagnostics of the communication with SmartWave devices.
+
+The API logs to a logger per subsystem, with the standard logging module:
+
+- SmartWaveAPI.transport: connecting to and disconnecting from devices, and transport errors
+- SmartWaveAPI.decoder: the status frames received from the device; every frame is logged at DEBUG level
+- SmartWaveAPI.firmware: the progress of firmware and FPGA bitstream updates, at INFO level
+
+If the application does not configure logging, warnings are printed to stderr by the fallback handler of the logging
+module, and the progress of updates is printed, so an update never runs silently. Everything else is only shown
+once the application configures logging, e.g. with logging.basicConfig(level=logging.INFO).
+The raw byte streams can additionally be traced to files with a RawTrace, see SmartWave.startRawTrace()."""
+import logging
+import threading
+from typing import BinaryIO, Optional, Union
+
+transportLogger: logging.Logger = logging.getLogger("SmartWaveAPI.transport")
+decoderLogger: logging.Logger = logging.getLogger("SmartWaveAPI.decoder")
+firmwareLogger: logging.Logger = logging.getLogger("SmartWaveAPI.firmware")
+
+
+def logUpdateProgress(message: str, *args):
+    """Log the progress of a firmware or FPGA bitstream update at INFO level, or print it if the application did not
+    configure logging.
+
+    :param str message: The message, formatted with args like a logging call"""
+    if firmwareLogger.hasHandlers():
+        firmwareLogger.info(message, *args)
+    else:
+        print(message % args)
+
+
+class RawTrace(object):
+    """Writes the raw byte streams received from and sent to a device to files, exactly as they are transferred.
+
+    A trace of the received stream can be fed to a StatusFrameDecoder, and a trace of the sent stream to a
+    SimulatedDevice, to reproduce a session without hardware."""
+
+    def __init__(self, received_path: str, sent_path: Optional[str] = None):
+        """Create a new trace and open its files for writing.
+
+        :param str received_path: The file to write the bytes received from the device to
+        :param Optional[str] sent_path: The file to write the bytes sent to the device to, or None to not trace them
+        :raises OSError: If a file could not be opened"""
+        self._lock = threading.Lock()
+        self._receivedFile: Optional[BinaryIO] = open(received_path, "wb")
+        self._sentFile: Optional[BinaryIO] = None
+        if sent_path is not None:
+            try:
+                self._sentFile = open(sent_path, "wb")
+            except OSError:
+                self._receivedFile.close()
+                raise
+
+    def __enter__(self):
+        """Enter - return instance."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Exit - close the files."""
+        self.close()
+
+    def received(self, data: Union[bytes, bytearray, memoryview]):
+        """Append bytes received from the device to the trace.
+
+        :param Union[bytes, bytearray, memoryview] data: The received bytes"""
+        with self._lock:
+            if self._receivedFile is not None:
+                self._receivedFile.write(data)
+
+    def sent(self, data: Union[bytes, bytearray, memoryview]):
+        """Append bytes sent to the device to the trace.
+
+        :param Union[bytes, bytearray, memoryview] data: The sent bytes"""
+        with self._lock:
+            if self._sentFile is not None:
+                self._sentFile.write(data)
+
+    def close(self):
+        """Flush and close the files. Data traced afterwards is dropped."""
+        with self._lock:
+            for f in (self._receivedFile, self._sentFile):
+                if f is not None:
+                    f.close()
+            self._receivedFile = None
+            self._sentFile = None
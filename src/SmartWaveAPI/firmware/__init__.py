@@ -0,0 +1,5 @@
+"""Reading, checking and uploading firmware and FPGA bitstream images of SmartWave devices."""
+
+from SmartWaveAPI.firmware.image import *
+from SmartWaveAPI.firmware.checksum import *
+from SmartWaveAPI.firmware.validation import *
@@ -0,0 +1,73 @@
+import sys
+from array import array
+from typing import Literal, Union
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# the initial value of the additive checksum of firmware and bitstream updates
+ChecksumSeed: int = 0xC0DEF19E
+
+# typecode of an unsigned 32-bit integer array on this platform
+_wordTypecode: str = 'I' if array('I').itemsize == 4 else 'L'
+
+
+def sumWords(data: Union[bytes, bytearray, memoryview], byteorder: Literal["little", "big"]) -> int:
+    """Sum the 32-bit words of data in one vectorized pass, with NumPy if it is installed.
+
+    Trailing bytes which do not form a whole word are ignored.
+
+    :param Union[bytes, bytearray, memoryview] data: The data
+    :param Literal["little", "big"] byteorder: The byte order of the words
+    :return: The sum of the words; not truncated
+    :rtype: int"""
+    data = memoryview(data).cast('B')
+    numWords = len(data) // 4
+    data = data[:numWords * 4]
+
+    if numpy is not None:
+        words = numpy.frombuffer(data, dtype='<u4' if byteorder == "little" else '>u4')
+        return int(words.sum(dtype=numpy.uint64))
+
+    words = array(_wordTypecode)
+    words.frombytes(data)
+    if byteorder != sys.byteorder:
+        words.byteswap()
+    return sum(words)
+
+
+def firmwareChecksum(image: Union[bytes, bytearray, memoryview], start: int, end: int) -> int:
+    """Calculate the checksum of a microcontroller firmware update.
+
+    This is the sum of the little-endian words at start, start + 4, ... up to and including the word at end, plus
+    ChecksumSeed, modulo 2^32. Words which reach past the end of the image only count with the bytes they have.
+
+    :param Union[bytes, bytearray, memoryview] image: The firmware image
+    :param int start: The offset of the first word
+    :param int end: The offset of the last word
+    :return: The checksum
+    :rtype: int"""
+    image = memoryview(image).cast('B')
+    if end < start:
+        return ChecksumSeed
+
+    numWords = (end - start) // 4 + 1
+    words = image[start:start + numWords * 4]
+    # a partial word at the end of the image
+    wholeLength = len(words) - len(words) % 4
+    checksum = ChecksumSeed + sumWords(words[:wholeLength], "little") + \
+        int.from_bytes(words[wholeLength:], "little")
+    return checksum % 0x100000000
+
+
+def bitstreamChecksum(image: Union[bytes, bytearray, memoryview]) -> int:
+    """Calculate the checksum of an FPGA bitstream update.
+
+    This is the sum of all whole big-endian words of the bitstream, plus ChecksumSeed, modulo 2^32.
+
+    :param Union[bytes, bytearray, memoryview] image: The bitstream image
+    :return: The checksum
+    :rtype: int"""
+    return (ChecksumSeed + sumWords(image, "big")) % 0x100000000
@@ -0,0 +1,55 @@
+import mmap
+import os
+from typing import Tuple, Union
+
+
+class FirmwareImage(object):
+    """A firmware or FPGA bitstream file, memory-mapped read-only.
+
+    Slices of the image are memoryviews into the mapping, so the image is never copied into memory as a whole;
+    the operating system pages it in while it is checked and sent."""
+
+    def __init__(self, path: str):
+        """Open and memory-map an image file.
+
+        :param str path: The path of the image
+        :raises FileNotFoundError: If the image file could not be found"""
+        self.path: str = path
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self.size: int = stat.st_size
+            # identifies the file and its version without reading it, e.g. to cache the result of validating it
+            self.identity: Tuple = (os.path.realpath(path), stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+            # empty files cannot be mapped
+            self._mmap: Union[mmap.mmap, bytes] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) \
+                if self.size else b''
+        self._view: memoryview = memoryview(self._mmap)
+
+    def __enter__(self):
+        """Enter - return instance."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Exit - close the image."""
+        self.close()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def view(self, start: int = 0, end: Union[int, None] = None) -> memoryview:
+        """Get a part of the image without copying it. Like slicing, the bounds are clipped to the image.
+
+        :param int start: The offset of the first byte
+        :param Union[int, None] end: The offset after the last byte, or None for the end of the image
+        :return: A view of the bytes, valid until the image is closed
+        :rtype: memoryview"""
+        return self._view[start:end]
+
+    def close(self):
+        """Close the image. If views of it are still referenced, it is closed once the last one is gone."""
+        self._view.release()
+        if isinstance(self._mmap, mmap.mmap):
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass
@@ -0,0 +1,173 @@
+import hashlib
+import threading
+from typing import Dict, Hashable, Optional, Sequence, Tuple, Union
+
+from SmartWaveAPI.firmware.checksum import firmwareChecksum, bitstreamChecksum
+
+# the sizes of the bitstreams of the supported FPGAs
+BitstreamSizes: Tuple[int, ...] = (0x21728c, 0x3a607c)
+
+# the number of zero bytes a raw firmware must have after the end of the firmware region
+FirmwarePaddingLength: int = 16
+
+# the results of validating images, by the identity of the image and the layout they were validated against
+_cache: Dict[tuple, Union["ValidatedFirmware", "ValidatedBitstream"]] = {}
+_cacheLock = threading.Lock()
+
+
+class ValidatedFirmware(object):
+    """The result of checking a microcontroller firmware image; everything needed to upload it."""
+
+    def __init__(self, identity: Hashable, cropped: bool, start: int, length: int, checksum: int):
+        """Create a validation result. Only to be called by validateFirmware().
+
+        :param Hashable identity: The identity of the image in the validation cache
+        :param bool cropped: Whether the image only contains the firmware region, as downloaded from the webgui,
+            rather than a raw image including the bootloader, as built by the arduino IDE
+        :param int start: The offset of the firmware region in the image
+        :param int length: The number of bytes to upload
+        :param int checksum: The checksum of the firmware"""
+        self.identity: Hashable = identity
+        self.cropped: bool = cropped
+        self.start: int = start
+        self.length: int = length
+        self.checksum: int = checksum
+
+
+class ValidatedBitstream(object):
+    """The result of checking an FPGA bitstream image; everything needed to upload it."""
+
+    def __init__(self, identity: Hashable, start: int, size: int, checksum: int):
+        """Create a validation result. Only to be called by validateBitstream().
+
+        :param Hashable identity: The identity of the image in the validation cache
+        :param int start: The offset of the bitstream in the image
+        :param int size: The size of the image
+        :param int checksum: The checksum of the bitstream"""
+        self.identity: Hashable = identity
+        self.start: int = start
+        self.size: int = size
+        self.checksum: int = checksum
+
+
+def imageDigest(image: Union[bytes, bytearray, memoryview]) -> bytes:
+    """Calculate the digest of an image, which identifies it in the validation cache if no cheaper identity is known.
+
+    :param Union[bytes, bytearray, memoryview] image: The image
+    :return: The digest
+    :rtype: bytes"""
+    return hashlib.blake2b(image, digest_size=32).digest()
+
+
+def clearValidationCache():
+    """Forget the results of all validated images."""
+    with _cacheLock:
+        _cache.clear()
+
+
+def _cached(key: tuple, validate):
+    """Get a validation result from the cache, or validate the image and add the result to the cache.
+    Failed validations are not cached."""
+    with _cacheLock:
+        result = _cache.get(key)
+    if result is None:
+        result = validate()
+        with _cacheLock:
+            _cache[key] = result
+    return result
+
+
+def validateFirmware(image: Union[bytes, bytearray, memoryview],
+                     reference: Union[bytes, bytearray, memoryview],
+                     sbl_start: int,
+                     firmware_start: int,
+                     firmware_end: int,
+                     identity: Optional[Hashable] = None,
+                     reference_identity: Optional[Hashable] = None) -> ValidatedFirmware:
+    """Check a microcontroller firmware image for plausibility and calculate its checksum.
+
+    A raw image, which has the size of the reference, must contain the same bootloader as the reference, and be
+    padded with zeros after the end of the firmware region. Any image larger than the firmware region is taken to
+    be cropped to it. The result is cached by the identity of the image, so checking the same image again is free.
+    Pass the identity of a FirmwareImage where possible; hashing the whole image costs about as much as checking it.
+
+    :param Union[bytes, bytearray, memoryview] image: The firmware image, e.g. the view of a FirmwareImage
+    :param Union[bytes, bytearray, memoryview] reference: A raw image with the bootloader of the device
+    :param int sbl_start: The offset of the bootloader in a raw image
+    :param int firmware_start: The offset of the firmware region in a raw image
+    :param int firmware_end: The offset of the end of the firmware region in a raw image
+    :param Optional[Hashable] identity: What identifies the image, e.g. FirmwareImage.identity.
+        By default, the digest of the image.
+    :param Optional[Hashable] reference_identity: What identifies the reference, e.g. FirmwareImage.identity.
+        By default, the digest of its bootloader.
+    :return: The validation result
+    :rtype: ValidatedFirmware
+    :raises Exception: If the firmware file is incompatible with the bootloader
+    :raises Exception: If the firmware size is incompatible with the bootloader"""
+    image = memoryview(image).cast('B')
+    reference = memoryview(reference).cast('B')
+    if identity is None:
+        identity = imageDigest(image)
+    if reference_identity is None:
+        reference_identity = imageDigest(reference[sbl_start:firmware_start])
+    key = ("firmware", identity, reference_identity, len(reference), sbl_start, firmware_start, firmware_end)
+
+    def validate() -> ValidatedFirmware:
+        length = firmware_end - firmware_start
+
+        # check if given file is cropped (webgui) or raw (from arduino IDE)
+        if len(image) == len(reference):
+            cropped = False
+        elif len(image) > length:
+            cropped = True
+        else:
+            raise Exception("The size of the given file suggests that it is not a valid firmware")
+
+        if not cropped:
+            if image[sbl_start:firmware_start] != reference[sbl_start:firmware_start]:
+                # the given firmware has a different SBL; will not be compatible
+                raise Exception("The given firmware is not compatible with the current bootloader on the device!")
+
+            # check if firmware chunk is big enough
+            if image[firmware_end:firmware_end + FirmwarePaddingLength] != bytes(FirmwarePaddingLength):
+                raise Exception("The firmware size seems to be incompatible with the device!")
+
+        start = firmware_start if not cropped else 0
+        end = firmware_end if not cropped else length
+        return ValidatedFirmware(identity, cropped, start, length, firmwareChecksum(image, start, end))
+
+    return _cached(key, validate)
+
+
+def validateBitstream(image: Union[bytes, bytearray, memoryview],
+                      start: int = 0,
+                      end: Optional[int] = None,
+                      sizes: Sequence[int] = BitstreamSizes,
+                      identity: Optional[Hashable] = None) -> ValidatedBitstream:
+    """Check an FPGA bitstream image for plausibility and calculate its checksum.
+
+    The result is cached by the identity of the image, so checking the same image again is free.
+    Pass the identity of a FirmwareImage where possible; hashing the whole image costs about as much as checking it.
+
+    :param Union[bytes, bytearray, memoryview] image: The bitstream image, e.g. the view of a FirmwareImage
+    :param int start: The offset of the bitstream in the image
+    :param Optional[int] end: The offset of the end of the bitstream, or None for the end of the image
+    :param Sequence[int] sizes: The valid sizes of the image
+    :param Optional[Hashable] identity: What identifies the image, e.g. FirmwareImage.identity.
+        By default, the digest of the image.
+    :return: The validation result
+    :rtype: ValidatedBitstream
+    :raises Exception: If the bitstream file is of the wrong size"""
+    image = memoryview(image).cast('B')
+    if identity is None:
+        identity = imageDigest(image)
+    key = ("bitstream", identity, start, end, tuple(sizes))
+
+    def validate() -> ValidatedBitstream:
+        if len(image) not in sizes:
+            raise Exception(
+                "The bitstream seems to be of the wrong size: 0x%x. Please check for correctness." % len(image))
+
+        return ValidatedBitstream(identity, start, len(image), bitstreamChecksum(image[start:end]))
+
+    return _cached(key, validate)
@@ -0,0 +1,388 @@
+"""Managing many SmartWave devices attached to one host at once."""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Union
+
+from SmartWaveAPI.smartwave import SmartWave
+from SmartWaveAPI.communication import SerialTransport, Transport, HeartbeatScheduler
+from SmartWaveAPI.firmware import FirmwareImage, validateFirmware, validateBitstream
+from SmartWaveAPI.diagnostics import firmwareLogger, transportLogger, logUpdateProgress
+
+_packageDirectory = os.path.dirname(os.path.abspath(__file__))
+
+
+class FleetUpdateResult(object):
+    """The outcome of updating one device of a fleet."""
+
+    def __init__(self, name: str, device: Optional[SmartWave]):
+        """Create the result of a device. Only to be called by the FleetUpdater.
+
+        :param str name: The name of the device, e.g. its port
+        :param Optional[SmartWave] device: The device, or None if no connection could be established"""
+        self.name: str = name
+        self.device: Optional[SmartWave] = device
+        self.succeeded: bool = False
+        self.error: Optional[BaseException] = None
+        self.seconds: float = 0.0
+
+    def __repr__(self) -> str:
+        return "FleetUpdateResult(%s: %s in %.1f s)" % \
+            (self.name, "succeeded" if self.succeeded else "failed: %r" % self.error, self.seconds)
+
+
+class FleetUpdater(object):
+    """Updates the firmware or FPGA bitstream of many SmartWave devices at the same time.
+
+    The image is read, validated and its checksum calculated once, and then sent to all devices concurrently, so
+    updating a rack of devices takes about as long as updating one. The progress the devices report through
+    firmwareUpdateStatusCallback is collected per device and passed on as a whole to the progress callback."""
+
+    def __init__(self,
+                 devices: Optional[Sequence[SmartWave]] = None,
+                 progress_callback: Optional[Callable[[str, int, int], None]] = None):
+        """Create a new fleet updater.
+
+        :param Optional[Sequence[SmartWave]] devices: The connected devices to update. By default, every
+            SmartWave attached to the host is connected to for the update, and disconnected afterwards.
+        :param Optional[Callable[[str, int, int], None]] progress_callback: Called when a device reports
+            progress, with the name of the device, its progress and the progress of the whole fleet in percent"""
+        self.devices: Optional[List[SmartWave]] = list(devices) if devices is not None else None
+        self.progressCallback: Optional[Callable[[str, int, int], None]] = progress_callback
+        # the progress of each device in percent, by name
+        self.progress: Dict[str, int] = {}
+        self._progressLock = threading.Lock()
+
+    def updateFirmware(self,
+                       firmware_path: Optional[str] = None,
+                       timeout: Optional[float] = None) -> List[FleetUpdateResult]:
+        """Update the microcontroller firmware of all devices with a given firmware, or to the newest version.
+
+        Every device checks the checksum of the firmware it received, and reports whether the update succeeded.
+        The devices restart after the update.
+
+        :param Optional[str] firmware_path: The path to the new firmware. If unspecified, upload newest
+            packaged firmware.
+        :param Optional[float] timeout: How long to wait for a device to report the result of its update in seconds,
+            after the firmware was sent. Default None to wait indefinitely.
+        :return: The result of each device
+        :rtype: List[FleetUpdateResult]
+        :raises FileNotFoundError: If the firmware file could not be found
+        :raises Exception: If the firmware file is incompatible with the bootloader
+        :raises Exception: If the firmware size is incompatible with the bootloader"""
+        with FirmwareImage(firmware_path if firmware_path else
+                           os.path.join(_packageDirectory, "newest_firmware.bin")) as image, \
+                FirmwareImage(os.path.join(_packageDirectory, "SBL_sample.bin")) as reference:
+            firmware = validateFirmware(image.view(), reference.view(),
+                                        SmartWave.SBLStart, SmartWave.FirmwareStart, SmartWave.FirmwareEnd,
+                                        image.identity, reference.identity)
+
+            def update(device: SmartWave) -> bool:
+                finished = threading.Event()
+                succeeded = []
+
+                def ok():
+                    succeeded.append(True)
+                    finished.set()
+
+                def failed():
+                    finished.set()
+
+                previousCallbacks = device.firmwareUpdateOKCallback, device.firmwareUpdateFailedCallback
+                device.firmwareUpdateOKCallback = ok
+                device.firmwareUpdateFailedCallback = failed
+                try:
+                    device._uploadFirmware(image.view(), firmware)
+                    if not finished.wait(timeout):
+                        raise TimeoutError("Timeout waiting for the firmware update to finish.")
+                finally:
+                    device.firmwareUpdateOKCallback, device.firmwareUpdateFailedCallback = previousCallbacks
+                return bool(succeeded)
+
+            firmwareLogger.warning("Updating firmware of the fleet - do not disconnect the devices. "
+                                   "The devices will disconnect and restart after the update is finished.")
+            return self._run(update)
+
+    def updateFPGABitstream(self,
+                            bitstream_path: Optional[str] = None,
+                            timeout: Optional[float] = None) -> List[FleetUpdateResult]:
+        """Update the FPGA bitstream of all devices with a given bitstream, or to the newest version.
+
+        :param Optional[str] bitstream_path: The path to the bitstream. If unspecified,
+            upload newest packaged bitstream.
+        :param Optional[float] timeout: How long to wait for a device to finish its update in seconds, after the
+            bitstream was sent. Default None to wait indefinitely.
+        :return: The result of each device
+        :rtype: List[FleetUpdateResult]
+        :raises FileNotFoundError: If the bitstream file could not be found
+        :raises Exception: If the bitstream file is of the wrong size"""
+        with FirmwareImage(bitstream_path if bitstream_path else
+                           os.path.join(_packageDirectory, "newest_fpga_bitstream.bin")) as image:
+            bitstream = validateBitstream(image.view(), SmartWave.FPGABitstreamStart, SmartWave.FPGABitstreamEnd,
+                                          identity=image.identity)
+
+            def update(device: SmartWave) -> bool:
+                finished = threading.Event()
+                failed = []
+
+                def fail():
+                    failed.append(True)
+                    finished.set()
+
+                previousCallbacks = device.firmwareUpdateFailedCallback, device._bitstreamUpdateDoneCallback
+                device.firmwareUpdateFailedCallback = fail
+                device._bitstreamUpdateDoneCallback = finished.set
+                try:
+                    device._uploadBitstream(image.view(), bitstream)
+                    if not finished.wait(timeout):
+                        raise TimeoutError("Timeout waiting for the FPGA bitstream update to finish.")
+                finally:
+                    device.firmwareUpdateFailedCallback, device._bitstreamUpdateDoneCallback = previousCallbacks
+                return not failed
+
+            firmwareLogger.warning("Updating Bitstream of the fleet - do not disconnect the devices.")
+            return self._run(update)
+
+    def _run(self, update: Callable[[SmartWave], bool]) -> List[FleetUpdateResult]:
+        """Connect to the devices if necessary, and run an update on all of them concurrently.
+
+        :param Callable[[SmartWave], bool] update: Updates a device, returns whether the update succeeded
+        :return: The result of each device
+        :rtype: List[FleetUpdateResult]"""
+        if self.devices is not None:
+            results = []
+            names = set()
+            for device in self.devices:
+                name = repr(device._transport)
+                # e.g. simulated devices are all named alike
+                if name in names:
+                    name = "%s #%d" % (name, len(results))
+                names.add(name)
+                results.append(FleetUpdateResult(name, device))
+            owned = False
+        else:
+            results = self._connectAll()
+            owned = True
+
+        with self._progressLock:
+            self.progress = {result.name: 0 for result in results if result.device is not None}
+
+        def run(result: FleetUpdateResult):
+            device = result.device
+            previousCallback = device.firmwareUpdateStatusCallback
+            device.firmwareUpdateStatusCallback = \
+                lambda isMicrocontroller, status: self._reportProgress(result.name, status)
+            start = time.perf_counter()
+            try:
+                result.succeeded = update(device)
+                if result.succeeded:
+                    self._reportProgress(result.name, 100)
+            except Exception as e:
+                result.error = e
+            finally:
+                result.seconds = time.perf_counter() - start
+                device.firmwareUpdateStatusCallback = previousCallback
+                if owned:
+                    device.disconnect()
+
+            if not result.succeeded:
+                firmwareLogger.error("Update of %s failed: %r", result.name, result.error)
+
+        connected = [result for result in results if result.device is not None]
+        if connected:
+            with ThreadPoolExecutor(max_workers=len(connected)) as executor:
+                list(executor.map(run, connected))
+        return results
+
+    def _connectAll(self) -> List[FleetUpdateResult]:
+        """Connect to every SmartWave attached to the host, concurrently.
+
+        :return: A result for each device found; the device is None if no connection could be established
+        :rtype: List[FleetUpdateResult]"""
+        ports = SmartWave.findDevicePorts()
+
+        def connect(port_name: str, device: SmartWave) -> FleetUpdateResult:
+            try:
+                device.connectTransport(SerialTransport(port_name))
+                return FleetUpdateResult(port_name, device)
+            except ConnectionRefusedError as e:
+                transportLogger.warning("Could not connect to %s", port_name)
+                result = FleetUpdateResult(port_name, None)
+                result.error = e
+                return result
+
+        if not ports:
+            return []
+        # the devices are created in this thread, as they stop when the thread which created them ends
+        devices = [SmartWave() for _ in ports]
+        with ThreadPoolExecutor(max_workers=len(ports)) as executor:
+            return list(executor.map(connect, ports, devices))
+
+    def _reportProgress(self, name: str, status: int):
+        """Record the progress of a device and pass it on to the progress callback.
+
+        :param str name: The name of the device
+        :param int status: The progress of the device in percent"""
+        with self._progressLock:
+            self.progress[name] = status
+            overall = sum(self.progress.values()) // len(self.progress)
+
+        logUpdateProgress("%s update status: %d%%, fleet: %d%%", name, status, overall)
+        if self.progressCallback is not None:
+            self.progressCallback(name, status, overall)
+
+
+class SmartWaveFleet(object):
+    """Many SmartWave devices attached to one host, connected at the same time.
+
+    The devices are connected in parallel, and like all devices send their heartbeats from one shared thread; each
+    device keeps its own thread reading from it. A device can be looked up by its port, the serial
+    number of its USB interface, or the flashId it reports in its info."""
+
+    def __init__(self, heartbeat_interval: Optional[float] = None):
+        """Create a new fleet. No device is connected until connect() is called.
+
+        :param Optional[float] heartbeat_interval: The longest time a device goes without a write in seconds.
+            By default, the devices use the scheduler shared by all devices, otherwise one of their own."""
+        self.devices: List[SmartWave] = []
+        # the ports which could not be connected to, and why; named like the ports in byPort()
+        self.failed: Dict[str, BaseException] = {}
+        self.heartbeatScheduler: HeartbeatScheduler = HeartbeatScheduler.shared() if heartbeat_interval is None \
+            else HeartbeatScheduler(heartbeat_interval)
+        self._byPort: Dict[str, SmartWave] = {}
+        self._bySerialNumber: Dict[str, SmartWave] = {}
+
+    def __enter__(self):
+        """Enter - return instance."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Exit - disconnect from all devices."""
+        self.disconnect()
+
+    def __len__(self) -> int:
+        return len(self.devices)
+
+    def __iter__(self) -> Iterator[SmartWave]:
+        return iter(self.devices)
+
+    def connect(self,
+                ports: Optional[Sequence[Union[str, Transport]]] = None,
+                reset: bool = True,
+                configure_general: bool = True,
+                info_timeout: float = 1.0):
+        """Connect to all devices in parallel, and read their info.
+
+        Devices which could not be connected to are left out, and listed in failed.
+
+        :param Optional[Sequence[Union[str, Transport]]] ports: The names of the ports to connect to, or transports,
+            e.g. SimulatedTransports. By default, every SmartWave attached to the host is connected to.
+        :param bool reset: Reset the devices after connection
+        :param bool configure_general: Configure general with the default values
+        :param float info_timeout: How long to wait for the info of a device in seconds
+        :return: Self
+        :rtype: SmartWaveFleet
+        :raises ConnectionRefusedError: If no device could be connected to"""
+        found = SmartWave.findDevices() if ports is None or any(isinstance(port, str) for port in ports) else []
+        serialNumbers = {port.device: port.serial_number for port in found}
+        if ports is None:
+            ports = list(serialNumbers)
+
+        # e.g. simulated transports are all named alike, so later ones get a number to keep the names apart
+        names = []
+        taken = set(self._byPort)
+        for port in ports:
+            name = port if isinstance(port, str) else repr(port)
+            unique = name
+            number = 1
+            while unique in taken:
+                unique = "%s #%d" % (name, number)
+                number += 1
+            taken.add(unique)
+            names.append(unique)
+
+        def connect(port: Union[str, Transport], name: str, device: SmartWave) -> Optional[SmartWave]:
+            device.heartbeatScheduler = self.heartbeatScheduler
+            try:
+                device.connectTransport(SerialTransport(port) if isinstance(port, str) else port,
+                                        reset, True, configure_general)
+            except ConnectionRefusedError as e:
+                transportLogger.warning("Could not connect to %s", name)
+                self.failed[name] = e
+                return None
+
+            if not device.waitForInfo(info_timeout):
+                transportLogger.warning("%s did not send its info", name)
+
+            self._byPort[name] = device
+            if isinstance(port, str) and serialNumbers.get(port):
+                self._bySerialNumber[serialNumbers[port]] = device
+            return device
+
+        if ports:
+            # the devices are created in this thread, as they stop when the thread which created them ends
+            devices = [SmartWave() for _ in ports]
+            with ThreadPoolExecutor(max_workers=len(ports)) as executor:
+                devices = list(executor.map(connect, ports, names, devices))
+            self.devices.extend(device for device in devices if device is not None)
+
+        if not self.devices:
+            raise ConnectionRefusedError("Could not find a suitable device to connect to")
+        return self
+
+    def disconnect(self):
+        """Disconnect from all devices in parallel."""
+        if self.devices:
+            with ThreadPoolExecutor(max_workers=len(self.devices)) as executor:
+                list(executor.map(SmartWave.disconnect, self.devices))
+
+        self.devices = []
+        self._byPort = {}
+        self._bySerialNumber = {}
+
+    def byPort(self, port_name: str) -> SmartWave:
+        """Get the device connected at a port.
+
+        :param str port_name: The name of the port, e.g. COM3 or /dev/ttyACM0, or the repr of a transport.
+            Transports with the same repr are told apart by a number, e.g. "SimulatedTransport(...) #1".
+        :return: The device
+        :rtype: SmartWave
+        :raises AttributeError: If no device is connected at the port"""
+        device = self._byPort.get(port_name)
+        if device is None:
+            raise AttributeError("No device connected at port %s" % port_name)
+        return device
+
+    def bySerialNumber(self, serial_number: str) -> SmartWave:
+        """Get a device by the serial number of its USB interface.
+
+        :param str serial_number: The serial number
+        :return: The device
+        :rtype: SmartWave
+        :raises AttributeError: If no device with this serial number is connected"""
+        device = self._bySerialNumber.get(serial_number)
+        if device is None:
+            raise AttributeError("No device with serial number %s connected" % serial_number)
+        return device
+
+    def byFlashId(self, flash_id: int) -> SmartWave:
+        """Get a device by the flashId it reported in its info.
+
+        :param int flash_id: The flash id
+        :return: The device
+        :rtype: SmartWave
+        :raises AttributeError: If no device with this flash id is connected"""
+        for device in self.devices:
+            if device.flashId == flash_id:
+                return device
+        raise AttributeError("No device with flash id 0x%x connected" % flash_id)
+
+    def updater(self, progress_callback: Optional[Callable[[str, int, int], None]] = None) -> FleetUpdater:
+        """Get an updater for the firmware or FPGA bitstream of all devices of the fleet.
+
+        :param Optional[Callable[[str, int, int], None]] progress_callback: Called when a device reports
+            progress, with the name of the device, its progress and the progress of the whole fleet in percent
+        :return: The updater
+        :rtype: FleetUpdater"""
+        return FleetUpdater(self.devices, progress_callback)
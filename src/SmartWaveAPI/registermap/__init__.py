@@ -0,0 +1,5 @@
+"""A typed view of the FPGA's register map, with a host-side shadow of the written register values."""
+
+from SmartWaveAPI.registermap.registerfield import *
+from SmartWaveAPI.registermap.register import *
+from SmartWaveAPI.registermap.registermap import *
@@ -0,0 +1,148 @@
+from typing import Dict, Optional, Union
+
+from SmartWaveAPI.registermap.registerfield import RegisterField
+
+
+class Register:
+    """A register of the SmartWave's FPGA, which keeps a host-side shadow of the last written value.
+
+    Writes of the value that is already in the shadow are skipped, and fields are updated by read-modify-write of
+    the shadow without reading from the device. Self-clearing fields are cleared in the shadow after every write,
+    and volatile registers, e.g. interrupt clear registers, keep no shadow at all, so their writes always go out."""
+    __slots__ = ('name', 'address', 'fields', 'volatile', '_device', '_shadow', '_selfClearingMask')
+
+    def __init__(self, device, name: str, address: int, fields: Optional[Dict[str, RegisterField]] = None,
+                 volatile: bool = False):
+        """Create a new register.
+
+        :param SmartWave device: The SmartWave device this register belongs to
+        :param str name: The name of the register
+        :param int address: The address of the register on the FPGA
+        :param Optional[Dict[str, RegisterField]] fields: The fields of the register by name
+        :param bool volatile: Whether the device changes the register by itself, so no shadow value is kept"""
+        self._device = device
+        self.name: str = name
+        self.address: int = address
+        self.fields: Dict[str, RegisterField] = fields if fields is not None else {}
+        self.volatile: bool = volatile
+        self._shadow: Optional[int] = None
+        self._selfClearingMask: int = 0
+        for field in self.fields.values():
+            if field.selfClearing:
+                self._selfClearingMask |= field.mask
+
+    def __repr__(self) -> str:
+        return "Register(%s, 0x%x)" % (self.name, self.address)
+
+    def __getitem__(self, name: str) -> RegisterField:
+        """Get a field of this register by name.
+
+        :param str name: The name of the field
+        :return: The field
+        :rtype: RegisterField
+        :raises KeyError: If the register has no such field"""
+        return self.fields[name]
+
+    def __getattr__(self, name: str) -> RegisterField:
+        """Get a field of this register by name.
+
+        :param str name: The name of the field
+        :return: The field
+        :rtype: RegisterField
+        :raises AttributeError: If the register has no such field"""
+        try:
+            return self.fields[name]
+        except KeyError:
+            raise AttributeError("Register %s has no field %s" % (self.name, name))
+
+    @property
+    def shadow(self) -> Optional[int]:
+        """The last value written to or read from this register, or None if it is unknown."""
+        return self._shadow
+
+    def invalidate(self):
+        """Forget the shadow value, e.g. after the device was reset, so the next write is sent unconditionally."""
+        self._shadow = None
+
+    def write(self, value: int, force: bool = False) -> bool:
+        """Write a value to this register, unless it already holds this value.
+
+        :param int value: The value to write
+        :param bool force: Write the value even if it is equal to the shadow value
+        :return: Whether the value was written to the device
+        :rtype: bool"""
+        if not force and self._isCurrent(value):
+            return False
+
+        self._device.writeFPGARegister(self.address, value)
+        self._written(value)
+        return True
+
+    def read(self) -> int:
+        """Read the value of this register from the device, and update the shadow value.
+
+        :return: The value of the register
+        :rtype: int"""
+        value = self._device.readFPGARegister(self.address)
+        if not self.volatile:
+            self._shadow = value
+        return value
+
+    def value(self) -> int:
+        """Get the value of this register, from the shadow if it is known, or else from the device.
+
+        :return: The value of the register
+        :rtype: int"""
+        shadow = self._shadow
+        if shadow is None:
+            return self.read()
+        return shadow
+
+    def compose(self, base: int = 0, **fields: Union[int, str]) -> int:
+        """Compose a register value by replacing fields within a base value.
+
+        :param int base: The value to start from
+        :param Union[int, str] fields: The values of the fields by field name
+        :return: The composed register value
+        :rtype: int
+        :raises KeyError: If the register has no such field
+        :raises ValueError: If a value does not fit into its field"""
+        for name, fieldValue in fields.items():
+            base = self.fields[name].insert(base, fieldValue)
+        return base
+
+    def writeFields(self, **fields: Union[int, str]) -> bool:
+        """Update the given fields of this register and leave the other fields unchanged.
+
+        The other fields are taken from the shadow value; the device is only read if the shadow value is unknown.
+
+        :param Union[int, str] fields: The new values of the fields by field name
+        :return: Whether the value was written to the device
+        :rtype: bool
+        :raises KeyError: If the register has no such field
+        :raises ValueError: If a value does not fit into its field"""
+        return self.write(self.compose(self.value(), **fields))
+
+    def readField(self, name: str) -> int:
+        """Get the value of a field, from the shadow if it is known, or else from the device.
+
+        :param str name: The name of the field
+        :return: The value of the field
+        :rtype: int
+        :raises KeyError: If the register has no such field"""
+        return self.fields[name].extract(self.value())
+
+    def _isCurrent(self, value: int) -> bool:
+        """Check if the register is known to hold a value already, so writing it can be skipped.
+
+        :param int value: The value to write
+        :return: Whether the shadow value equals the value
+        :rtype: bool"""
+        return value == self._shadow
+
+    def _written(self, value: int):
+        """Update the shadow value after a value was written to the device.
+
+        :param int value: The written value"""
+        if not self.volatile:
+            self._shadow = value & ~self._selfClearingMask
@@ -0,0 +1,68 @@
+from typing import Dict, Optional, Union
+
+
+class RegisterField:
+    """A bit field within a register of the SmartWave's FPGA, with a precomputed mask and shift."""
+    __slots__ = ('name', 'msb', 'lsb', 'width', 'mask', 'values', 'selfClearing')
+
+    def __init__(self, name: str, msb: int, lsb: int, values: Optional[Dict[str, int]] = None,
+                 self_clearing: bool = False):
+        """Create a new register field.
+
+        :param str name: The name of the field
+        :param int msb: The most significant bit of the field within the register
+        :param int lsb: The least significant bit of the field within the register
+        :param Optional[Dict[str, int]] values: Named values of the field, e.g. the selectable sources of a
+            connection
+        :param bool self_clearing: Whether the device clears the field by itself after it was written, e.g. an
+            enable bit which starts an operation. Writes which set the field are never skipped.
+        :raises ValueError: If the bits are not within a 32-bit register"""
+        if not 0 <= lsb <= msb < 32:
+            raise ValueError("Field %s with bits [%d:%d] does not fit into a 32-bit register" % (name, msb, lsb))
+
+        self.name: str = name
+        self.msb: int = msb
+        self.lsb: int = lsb
+        self.width: int = msb - lsb + 1
+        self.mask: int = ((1 << self.width) - 1) << lsb
+        self.values: Dict[str, int] = values if values is not None else {}
+        self.selfClearing: bool = self_clearing
+
+    def __repr__(self) -> str:
+        return "RegisterField(%s, [%d:%d])" % (self.name, self.msb, self.lsb)
+
+    def encode(self, value: Union[int, str]) -> int:
+        """Shift a field value to its position within the register.
+
+        :param Union[int, str] value: The value of the field, or the name of one of its named values
+        :return: The value shifted to the position of the field
+        :rtype: int
+        :raises ValueError: If the value does not fit into the field, or the name is unknown"""
+        if isinstance(value, str):
+            if value not in self.values:
+                raise ValueError("Field %s has no value named %s" % (self.name, value))
+            value = self.values[value]
+
+        encoded = value << self.lsb
+        if value < 0 or encoded & ~self.mask:
+            raise ValueError("Value %d does not fit into the %d bits of field %s" % (value, self.width, self.name))
+
+        return encoded
+
+    def extract(self, register_value: int) -> int:
+        """Get the value of this field from a register value.
+
+        :param int register_value: The value of the whole register
+        :return: The value of the field
+        :rtype: int"""
+        return (register_value & self.mask) >> self.lsb
+
+    def insert(self, register_value: int, value: Union[int, str]) -> int:
+        """Replace the value of this field within a register value.
+
+        :param int register_value: The value of the whole register
+        :param Union[int, str] value: The new value of the field, or the name of one of its named values
+        :return: The new value of the whole register
+        :rtype: int
+        :raises ValueError: If the value does not fit into the field, or the name is unknown"""
+        return (register_value & ~self.mask) | self.encode(value)
@@ -0,0 +1,179 @@
+from fnmatch import fnmatchcase
+from typing import Dict, Iterable, Iterator, List, Tuple, Union, Any
+
+from SmartWaveAPI.registermap.registerfield import RegisterField
+from SmartWaveAPI.registermap.register import Register
+
+
+class RegisterBlock:
+    """A block of registers of the SmartWave's FPGA, e.g. one driver or stimulus memory."""
+    __slots__ = ('name', 'registers')
+
+    def __init__(self, name: str, registers: Dict[str, Register]):
+        """Create a new register block.
+
+        :param str name: The name of the block
+        :param Dict[str, Register] registers: The registers of the block by name"""
+        self.name: str = name
+        self.registers: Dict[str, Register] = registers
+
+    def __repr__(self) -> str:
+        return "RegisterBlock(%s)" % self.name
+
+    def __getitem__(self, name: str) -> Register:
+        """Get a register of this block by name.
+
+        :param str name: The name of the register
+        :return: The register
+        :rtype: Register
+        :raises KeyError: If the block has no such register"""
+        return self.registers[name]
+
+    def __getattr__(self, name: str) -> Register:
+        """Get a register of this block by name.
+
+        :param str name: The name of the register
+        :return: The register
+        :rtype: Register
+        :raises AttributeError: If the block has no such register"""
+        try:
+            return self.registers[name]
+        except KeyError:
+            raise AttributeError("Register block %s has no register %s" % (self.name, name))
+
+    def __iter__(self) -> Iterator[Register]:
+        return iter(self.registers.values())
+
+
+class RegisterMap:
+    """The register map of the SmartWave's FPGA, compiled from a nested description of blocks, registers and fields.
+
+    The description has the layout of the register definitions generated for the FPGA, e.g. FPGA_Reg.registers in
+    the examples: each block maps register names to a dict with the register address in "addr", and the fields as
+    dicts with "MSB" and "LSB". Registers which hold a single selection have "MSB" and "LSB" directly, along with
+    named values; they get a single field named VAL.
+
+    The map is bound to its device, which forgets all shadow values when it is reset, connected or disconnected."""
+    __slots__ = ('blocks', '_device', '_registersByAddress', '__weakref__')
+
+    def __init__(self, device, blocks: Dict[str, RegisterBlock]):
+        """Create a new register map.
+
+        :param SmartWave device: The SmartWave device this register map belongs to
+        :param Dict[str, RegisterBlock] blocks: The register blocks by name"""
+        self._device = device
+        self.blocks: Dict[str, RegisterBlock] = blocks
+        self._registersByAddress: Dict[int, Register] = {
+            register.address: register
+            for block in blocks.values()
+            for register in block
+        }
+        if device is not None:
+            device._registerMaps.add(self)
+
+    @staticmethod
+    def fromDict(registers: Dict[str, Dict[str, Dict[str, Any]]],
+                 device,
+                 volatile_registers: Iterable[str] = ("*.ICR",),
+                 self_clearing_fields: Iterable[str] = ("wfg_stim_mem_top_*.CTRL.EN",)) -> "RegisterMap":
+        """Compile a nested register description into a register map.
+
+        :param Dict[str, Dict[str, Dict[str, Any]]] registers: The register description, e.g. FPGA_Reg.registers
+        :param SmartWave device: The SmartWave device the registers belong to
+        :param Iterable[str] volatile_registers: The registers which keep no shadow value, as "block.REGISTER"
+            patterns, e.g. the write-one-to-clear interrupt clear registers of all blocks
+        :param Iterable[str] self_clearing_fields: The fields which the device clears by itself, as
+            "block.REGISTER.FIELD" patterns, e.g. the enable bits of the stimulus memories. Only list fields which
+            really clear themselves; writes which clear them are skipped if the shadow says they are clear already.
+        :return: The register map
+        :rtype: RegisterMap
+        :raises ValueError: If a register has no address, or a field does not fit into a register"""
+        volatile_registers = list(volatile_registers)
+        self_clearing_fields = list(self_clearing_fields)
+
+        def matches(name: str, patterns: List[str]) -> bool:
+            return any(fnmatchcase(name, pattern) for pattern in patterns)
+
+        blocks = {}
+        for blockName, blockRegisters in registers.items():
+            compiledRegisters = {}
+            for registerName, description in blockRegisters.items():
+                if "addr" not in description:
+                    raise ValueError("Register %s of block %s has no address" % (registerName, blockName))
+
+                fields = {}
+                values = {}
+                for key, entry in description.items():
+                    if isinstance(entry, dict):
+                        fields[key] = RegisterField(key, entry["MSB"], entry["LSB"], self_clearing=matches(
+                            "%s.%s.%s" % (blockName, registerName, key), self_clearing_fields))
+                    elif key not in ("addr", "MSB", "LSB"):
+                        values[key] = entry
+
+                if "MSB" in description and "LSB" in description:
+                    fields["VAL"] = RegisterField("VAL", description["MSB"], description["LSB"], values,
+                                                  self_clearing=matches("%s.%s.VAL" % (blockName, registerName),
+                                                                        self_clearing_fields))
+
+                compiledRegisters[registerName] = Register(device, registerName, description["addr"], fields,
+                                                           matches("%s.%s" % (blockName, registerName),
+                                                                   volatile_registers))
+
+            blocks[blockName] = RegisterBlock(blockName, compiledRegisters)
+
+        return RegisterMap(device, blocks)
+
+    def __getitem__(self, name: str) -> RegisterBlock:
+        """Get a register block by name.
+
+        :param str name: The name of the block
+        :return: The register block
+        :rtype: RegisterBlock
+        :raises KeyError: If there is no such block"""
+        return self.blocks[name]
+
+    def __getattr__(self, name: str) -> RegisterBlock:
+        """Get a register block by name.
+
+        :param str name: The name of the block
+        :return: The register block
+        :rtype: RegisterBlock
+        :raises AttributeError: If there is no such block"""
+        try:
+            return self.blocks[name]
+        except KeyError:
+            raise AttributeError("Register map has no block %s" % name)
+
+    def registerAt(self, address: int) -> Register:
+        """Get the register at an address.
+
+        :param int address: The address of the register
+        :return: The register
+        :rtype: Register
+        :raises KeyError: If there is no register at this address"""
+        return self._registersByAddress[address]
+
+    def writeRegisters(self, values: Union[Dict[Register, int], Iterable[Tuple[Register, int]]],
+                       force: bool = False) -> int:
+        """Write several registers in one transfer, skipping the registers which already hold their value.
+
+        :param Union[Dict[Register, int], Iterable[Tuple[Register, int]]] values: The registers and their values,
+            as a dict or as (register, value) pairs
+        :param bool force: Write all values, even if they are equal to the shadow values
+        :return: The number of registers written to the device
+        :rtype: int"""
+        if isinstance(values, dict):
+            values = values.items()
+
+        changed = [(register, value) for register, value in values if force or not register._isCurrent(value)]
+        if len(changed):
+            self._device.writeFPGARegisters([(register.address, value) for register, value in changed])
+            for register, value in changed:
+                register._written(value)
+
+        return len(changed)
+
+    def invalidate(self):
+        """Forget all shadow values, e.g. after the registers were written without this map."""
+        for register in self._registersByAddress.values():
+            register.invalidate()
@@ -1,15 +1,27 @@
 import serial
 import serial.tools.list_ports
+from serial.tools.list_ports_common import ListPortInfo
 import threading
 import time
 import os
+import struct
+import weakref
 
-from typing import List, Union, Callable, Literal, Optional, Dict
+from contextlib import contextmanager
+
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import List, Union, Callable, Literal, Optional, Dict, Sequence, Tuple, Deque, Iterable, Iterator
 
 from SmartWaveAPI.configitems import Pin, I2CDriver, Stimulus, Config, SPIDriver, GPIO
 from SmartWaveAPI.configitems.i2cconfig import I2CConfig
 from SmartWaveAPI.configitems.spiconfig import SPIConfig
 from SmartWaveAPI.definitions import Command, Statusbit, ErrorCode, TriggerMode, PinOutputType
+from SmartWaveAPI.communication import StatusFrame, StatusFrameDecoder, unpackReadbackSamples, ChunkSizeTuner, \
+    Transport, SerialTransport, Statistics, CaptureWriter, HeartbeatScheduler
+from SmartWaveAPI.diagnostics import RawTrace, transportLogger, decoderLogger, firmwareLogger, logUpdateProgress
+from SmartWaveAPI.firmware import FirmwareImage, validateFirmware, validateBitstream, ValidatedFirmware, \
+    ValidatedBitstream
 
 
 class SmartWave(object):
@@ -27,7 +39,7 @@ class SmartWave(object):
 
     def __init__(self):
         """Create a new SmartWave instance."""
-        self._serialPort = None
+        self._transport: Optional[Transport] = None
 
         self._availableI2CDrivers = [
             I2CDriver(self, 0),
@@ -73,10 +85,31 @@ class SmartWave(object):
             self._allPins.append(pin)
 
         self.configEntries: List[Config] = []
-
-        self._heartbeatThread: Union[threading.Thread, None] = None
+        # register maps of this device, whose shadow values are forgotten whenever the register values are unknown
+        self._registerMaps: weakref.WeakSet = weakref.WeakSet()
+
+        # sends the heartbeats, shared with other devices; to be set before connecting
+        self.heartbeatScheduler: HeartbeatScheduler = HeartbeatScheduler.shared()
+        # the time of the last write to the device, to skip heartbeats while other traffic goes out
+        self._lastWrite: float = 0.0
+        # the number of threads with an open batch, and whether a heartbeat is to be added to the next batch sent
+        self._openBatches: int = 0
+        self._openBatchesLock = threading.Lock()
+        self._heartbeatPending: bool = False
         self._readingThread: Union[threading.Thread, None] = None
         self._serialLock = threading.Lock()
+        # size of the pieces large writes are split into; None to use the default of the transport
+        self._writeChunkSize: Optional[int] = None
+        # measure the throughput of large writes and pick the fastest chunk size instead of writeChunkSize
+        self.autoTuneChunkSize: bool = False
+        self._chunkSizeTuner = ChunkSizeTuner()
+        # per-thread buffer of writes collected by batch()
+        self._batchState = threading.local()
+        self._statusFrameDecoder = StatusFrameDecoder()
+        # communication statistics; None while disabled, see enableStatistics()
+        self.statistics: Optional[Statistics] = None
+        # trace or capture of the raw byte streams; None while disabled, see startRawTrace() and startCapture()
+        self._trace: Optional[Union[RawTrace, CaptureWriter]] = None
         self.killWithParentThread = True
         self._parentThread = threading.current_thread()
 
@@ -88,15 +121,36 @@ class SmartWave(object):
         self.firmwareUpdateOKCallback: Optional[Callable[[], None]] = None
         self.firmwareUpdateFailedCallback: Optional[Callable[[], None]] = None
         self.readbackCallback: Optional[Callable[[int, List[int]], None]] = None
+        # pass readback samples to the readback callback as an array('I') instead of a list, without converting them
+        self.readbackAsArray: bool = False
+        self._readbackConfigs: Dict[int, Config] = {}
+        self._triggerLock = threading.Lock()
+        # the triggers sent since connecting, and the ones the device reported running in TriggerMode.Single;
+        # once the device is idle again, the readbacks of all triggers it ran have arrived
+        self._triggerCount: int = 0
+        self._startedTriggers: int = 0
         self.singleAddressReadCallback: Optional[Callable[[int], None]] = None
         self.firmwareUpdateStatusCallback: Optional[Callable[[bool, int], None]] = \
-            lambda isUc, status : print("%s update status: %d%%" % ("Microcontroller" if isUc else "FPGA", status))
-
-        self._bitstreamUpdateSemaphore = threading.Semaphore(0)
-
-        self._latestFpgaRead: int = 0
-        self._fpgaReadSemaphore = threading.Semaphore(0)
+            lambda isUc, status: logUpdateProgress("%s update status: %d%%",
+                                                   "Microcontroller" if isUc else "FPGA", status)
+
+        # called when the device reports that the FPGA bitstream update finished, while an update is waited for
+        self._bitstreamUpdateDoneCallback: Optional[Callable[[], None]] = None
+
+        # the info of the connected device, once it answered requestInfo()
+        self.hardwareVersion: Optional[Tuple[int, int, int]] = None
+        self.firmwareVersion: Optional[Tuple[int, int, int]] = None
+        self.fpgaVersion: Optional[Tuple[int, int, int]] = None
+        self.flashId: Optional[int] = None
+        self._infoReceived = threading.Event()
+
+        # outstanding FPGA register reads, oldest first; the device answers them in order
+        self._pendingFpgaReads: Deque[Future] = deque()
+        self._fpgaReadLock = threading.Lock()
         self._deviceRunning: bool = False
+        # counts the idle status frames, to wait for the device to stop
+        self._idleCount: int = 0
+        self._idleCondition = threading.Condition()
 
         self._syncDiv: int = 1
         self._subcycles: int = 0
@@ -116,130 +170,190 @@ class SmartWave(object):
         if self.isConnected():
             self.disconnect()
 
-    def _heartbeat(self):
-        """Continually send a heartbeat message to the device until the connection is closed."""
-        while (self._serialPort and self._serialPort.is_open and
-               (self._parentThread.is_alive() or not self.killWithParentThread)):
+    def _heartbeatAlive(self) -> bool:
+        """Return whether heartbeats are to be sent to the device, i.e. it is connected and the parent thread alive.
 
-            self._serialLock.acquire()
-            if self.isConnected():
-                self.writeToDevice(bytes([
-                    Command.Heartbeat.value
-                ]), False)
-                self._serialLock.release()
-                time.sleep(0.5)
-            else:
-                self._serialLock.release()
-                break
+        :return: True if heartbeats are to be sent, False otherwise
+        :rtype: bool"""
+        return self.isConnected() and (self._parentThread.is_alive() or not self.killWithParentThread)
+
+    def _sendHeartbeat(self, blocking: bool = True) -> bool:
+        """Send a heartbeat message to the device. Called by the heartbeat scheduler.
+
+        :param bool blocking: Wait for the serial resource if another write is in progress. Otherwise, the heartbeat
+            is skipped, as the device sees traffic anyway.
+        :return: Whether heartbeats are to be sent further, i.e. the device is connected and the parent thread alive
+        :rtype: bool"""
+        if not (self._parentThread.is_alive() or not self.killWithParentThread):
+            return False
+
+        if blocking:
+            self._acquireSerialLock()
+        elif not self._serialLock.acquire(False):
+            return self.isConnected()
+
+        try:
+            if not self.isConnected():
+                return False
+            self.writeToDevice(bytes([
+                Command.Heartbeat.value
+            ]), False)
+            return True
+        finally:
+            self._serialLock.release()
 
     def _readback(self):
-        """Continually read from the device and handle the status messages."""
+        """Continually read from the device and handle the status messages.
+
+        The reading thread blocks on the transport until data arrives, and does not take the serial lock, which
+        only serializes writes to the device. This way reads and writes can overlap on the same connection.
+        All data that is available is read in one bulk call and split into status frames by the frame decoder."""
         while (self.isConnected() and
                (self._parentThread.is_alive() or not self.killWithParentThread)):
-            self._serialLock.acquire()
+            transport = self._transport
             try:
-                if self.isConnected() and self._serialPort.in_waiting > 0:
-                    statusbit = int.from_bytes(self._serialPort.read(1), byteorder='big')
-                    print("status bit received")
-                    print(statusbit)
-                    if statusbit == Statusbit.Idle.value:
-                        self._deviceRunning = False
-                        if self.idleCallback is not None:
-                            self.idleCallback()
-
-                    elif statusbit == Statusbit.Running.value:
-                        self._deviceRunning = True
-                        if self.runningCallback is not None:
-                            self.runningCallback()
-
-                    elif statusbit == Statusbit.Error.value:
-                        errorByte = self._serialPort.read(1)
-                        error: ErrorCode = ErrorCode.FirmwareCorrupt
-
-                        if errorByte == ErrorCode.FirmwareCorrupt.value:
-                            error = ErrorCode.FirmwareCorrupt
-                        elif errorByte == ErrorCode.FPGACorrupt.value:
-                            error = ErrorCode.FPGACorrupt
-
-                        if self.errorCallback is not None:
-                            self.errorCallback(error)
-                        else:
-                            raise Exception("Device %s firmware is corrupt" %
-                                            ("FPGA" if error == ErrorCode.FPGACorrupt else "microcontroller"))
-
-                    elif statusbit == Statusbit.Info.value:
-                        hwVer = tuple(self._serialPort.read(3))
-                        ucVer = tuple(self._serialPort.read(3))
-                        fpgaVer = tuple(self._serialPort.read(3))
-                        flashId = int.from_bytes(self._serialPort.read(8), byteorder='big')
-
-                        if self.infoCallback is not None:
-                            self.infoCallback(hwVer, ucVer, fpgaVer, flashId)
-
-                    elif statusbit == Statusbit.Debug.value:
-                        string = self._serialPort.read_until(bytes([0]))[:-1].decode("ASCII")
-                        if self.debugCallback is not None:
-                            self.debugCallback(string)
-
-                    elif statusbit == Statusbit.FirmwareUpdateOk.value:
-                        if self.firmwareUpdateOKCallback is not None:
-                            self.firmwareUpdateOKCallback()
-
-                    elif statusbit == Statusbit.FirmwareUpdateFailed.value:
-                        if self.firmwareUpdateFailedCallback is not None:
-                            self.firmwareUpdateFailedCallback()
-
-                    elif statusbit == Statusbit.Readback.value:
-                        recorderId = int.from_bytes(self._serialPort.read(1), 'big')
-                        numSamples = int.from_bytes(self._serialPort.read(2), 'big')
-                        rawSamples = self._serialPort.read(4 * numSamples)
-                        samples = []
-                        for i in range(numSamples):
-                            samples.append(int.from_bytes(rawSamples[i * 4:(i * 4) + 4], 'big'))
-
-                        if self.readbackCallback is not None:
-                            self.readbackCallback(recorderId, samples)
-
-                    elif statusbit == Statusbit.SingleAddressRead.value:
-                        data = int.from_bytes(self._serialPort.read(4), 'big')
-
-                        if self.singleAddressReadCallback is not None:
-                            self.singleAddressReadCallback(data)
-
-                    elif statusbit == Statusbit.PinsStatus.value:
-                        pinsA = int.from_bytes(self._serialPort.read(1), 'big')
-                        pinsB = int.from_bytes(self._serialPort.read(1), 'big')
-                        allPins = pinsA | (pinsB << 8)
-
-                        for pinId in range(16):
-                            self._allPins[pinId].inputLevel = 1 if (allPins & (1 << pinId)) else 0
-
-                    elif statusbit == Statusbit.FirmwareUpdateStatus.value:
-                        print("firmware update status bit received")
-                        byte = int.from_bytes(self._serialPort.read(1), 'big')
-                        print("byte 2:")
-                        print(byte)
-                        isMicrocontroller: bool = (byte & 8) == 1
-                        status: int = byte & 0x7f
-
-                        if not isMicrocontroller and status == 0x7f:
-                            self._bitstreamUpdateSemaphore.release()
-
-                        if self.firmwareUpdateStatusCallback is not None:
-                            self.firmwareUpdateStatusCallback(isMicrocontroller, min(status, 100))
+                data = transport.read(transport.inWaiting() or 1)
+                if len(data) == 0:
+                    # read timeout - check if the connection is still alive
+                    continue
+
+                trace = self._trace
+                if trace is not None:
+                    trace.received(data)
+
+                for frame in self._statusFrameDecoder.feed(data):
+                    self._handleStatusFrame(frame)
+                # release the payload of the last frame, so the decoder compacts its receive buffer in place
+                frame = None
+
+            except serial.SerialException as e:
+                transportLogger.debug("Reading from %r failed: %s", transport, e)
+
+            except (OSError, TypeError, ValueError, AttributeError):
+                if self.isConnected():
+                    raise
+                # otherwise the port was closed while waiting for data
+
+    def _handleStatusFrame(self, frame: StatusFrame):
+        """Handle a single status frame received from the device.
+
+        :param StatusFrame frame: The status frame to handle"""
+        statusbit = frame.statusbit
+        payload = frame.payload
+        statistics = self.statistics
+        if statistics is not None:
+            statistics.recordStatusFrame(statusbit, len(payload) + 1)
+
+        decoderLogger.debug("Status frame 0x%02x with %d bytes of payload", statusbit, len(payload))
+        if statusbit == Statusbit.Idle.value:
+            self._deviceRunning = False
+            if self._triggerMode == TriggerMode.Single:
+                completedTriggers = min(self._startedTriggers, self._triggerCount)
+                for readbackConfig in list(self._readbackConfigs.values()):
+                    readbackConfig.discardLostReadbacks(completedTriggers)
+            with self._idleCondition:
+                self._idleCount += 1
+                self._idleCondition.notify_all()
+            if self.idleCallback is not None:
+                self.idleCallback()
+
+        elif statusbit == Statusbit.Running.value:
+            self._deviceRunning = True
+            if self._triggerMode == TriggerMode.Single:
+                self._startedTriggers += 1
+            if self.runningCallback is not None:
+                self.runningCallback()
+
+        elif statusbit == Statusbit.Error.value:
+            errorByte = payload[0]
+            error: ErrorCode = ErrorCode.FirmwareCorrupt
+
+            if errorByte == ErrorCode.FirmwareCorrupt.value:
+                error = ErrorCode.FirmwareCorrupt
+            elif errorByte == ErrorCode.FPGACorrupt.value:
+                error = ErrorCode.FPGACorrupt
+
+            if self.errorCallback is not None:
+                self.errorCallback(error)
+            else:
+                raise Exception("Device %s firmware is corrupt" %
+                                ("FPGA" if error == ErrorCode.FPGACorrupt else "microcontroller"))
+
+        elif statusbit == Statusbit.Info.value:
+            hwVer = tuple(payload[0:3])
+            ucVer = tuple(payload[3:6])
+            fpgaVer = tuple(payload[6:9])
+            flashId = int.from_bytes(payload[9:17], byteorder='big')
+
+            self.hardwareVersion = hwVer
+            self.firmwareVersion = ucVer
+            self.fpgaVersion = fpgaVer
+            self.flashId = flashId
+            self._infoReceived.set()
+
+            if self.infoCallback is not None:
+                self.infoCallback(hwVer, ucVer, fpgaVer, flashId)
+
+        elif statusbit == Statusbit.Debug.value:
+            string = payload.tobytes().decode("ASCII")
+            decoderLogger.debug("Debug message from device: %s", string)
+            if self.debugCallback is not None:
+                self.debugCallback(string)
+
+        elif statusbit == Statusbit.FirmwareUpdateOk.value:
+            if self.firmwareUpdateOKCallback is not None:
+                self.firmwareUpdateOKCallback()
+
+        elif statusbit == Statusbit.FirmwareUpdateFailed.value:
+            if self.firmwareUpdateFailedCallback is not None:
+                self.firmwareUpdateFailedCallback()
+
+        elif statusbit == Statusbit.Readback.value:
+            recorderId = payload[0]
+            samples = unpackReadbackSamples(payload[3:])
+
+            config = self._readbackConfigs.get(recorderId)
+            if statistics is not None:
+                statistics.recordReadback(recorderId, type(config).__name__, time.perf_counter())
+            if config is not None:
+                config.readbackHandler(recorderId, samples)
+
+            if self.readbackCallback is not None:
+                self.readbackCallback(recorderId, samples if self.readbackAsArray else samples.tolist())
+
+        elif statusbit == Statusbit.SingleAddressRead.value:
+            data = int.from_bytes(payload, 'big')
+
+            with self._fpgaReadLock:
+                future = self._pendingFpgaReads.popleft() if self._pendingFpgaReads else None
+            if future is not None and future.set_running_or_notify_cancel():
+                future.set_result(data)
 
+            if self.singleAddressReadCallback is not None:
+                self.singleAddressReadCallback(data)
 
-                    else:
-                        print("Unknown Status bit: %d" % statusbit)
+        elif statusbit == Statusbit.PinsStatus.value:
+            allPins = payload[0] | (payload[1] << 8)
 
-            except serial.SerialException:
-                pass
+            for pinId in range(16):
+                self._allPins[pinId].inputLevel = 1 if (allPins & (1 << pinId)) else 0
 
-            except Exception as e:
-                self._serialLock.release()
-                raise e
+        elif statusbit == Statusbit.FirmwareUpdateStatus.value:
+            byte = payload[0]
+            firmwareLogger.debug("Firmware update status 0x%02x", byte)
+            isMicrocontroller: bool = (byte & 8) == 1
+            status: int = byte & 0x7f
 
-            self._serialLock.release()
+            if not isMicrocontroller and status == 0x7f:
+                bitstreamUpdateDoneCallback = self._bitstreamUpdateDoneCallback
+                if bitstreamUpdateDoneCallback is not None:
+                    bitstreamUpdateDoneCallback()
+
+            if self.firmwareUpdateStatusCallback is not None:
+                self.firmwareUpdateStatusCallback(isMicrocontroller, min(status, 100))
+
+        else:
+            decoderLogger.warning("Unknown status bit: %d", statusbit)
 
     def _connectToSpecifiedPort(self, port_name: str, reset: bool, request_info: bool, configure_general: bool):
         """Try to connect to the specified port.
@@ -252,35 +366,64 @@ class SmartWave(object):
         :rtype: SmartWave
         :raises ConnectionRefusedError: If no connection to the device could be established"""
         try:
-            self._serialLock.acquire()
-            if self._serialPort is None:
-                self._serialPort = serial.Serial(port_name, baudrate=115200, exclusive=True, timeout=1)
-            else:
-                self._serialPort.port = port_name
+            self.connectTransport(SerialTransport(port_name), reset, request_info, configure_general)
+        except ConnectionRefusedError:
+            raise ConnectionRefusedError("Could not connect to serial port %s" % port_name)
 
+    def connectTransport(self,
+                         transport: Transport,
+                         reset: bool = True,
+                         request_info: bool = True,
+                         configure_general: bool = True):
+        """Connect to a SmartWave device over a given transport, e.g. a SimulatedTransport.
+
+        The transport is opened if it is not open yet.
+
+        :param Transport transport: The transport to the device
+        :param bool reset: Reset the device after connection
+        :param bool request_info: Request info from the device after connection
+        :param bool configure_general: Configure general with the default values
+        :return: Self
+        :rtype: SmartWave
+        :raises ConnectionRefusedError: If the transport could not be opened"""
+        try:
+            self._serialLock.acquire()
+            if not transport.isOpen():
+                transport.open()
+            self._transport = transport
+
+            self._statusFrameDecoder.reset()
+            self._invalidateRegisterMaps()
+            self._discardPendingReadbacks()
+            self._triggerCount = 0
+            self._startedTriggers = 0
             self._serialLock.release()
 
-        except (ConnectionRefusedError, serial.SerialException):
+        except (ConnectionRefusedError, OSError):
             self._serialLock.release()
-            raise ConnectionRefusedError("Could not connect to serial port %s" % port_name)
+            raise ConnectionRefusedError("Could not connect to %r" % transport)
 
-        if reset:
-            self._resetDevice()
+        transportLogger.info("Connected to %r", transport)
+        self._infoReceived.clear()
 
-        if configure_general:
-            self.configGeneral()
+        with self.batch():
+            if reset:
+                self._resetDevice()
 
-        if request_info:
-            self.requestInfo()
+            if configure_general:
+                self.configGeneral()
 
-        self._heartbeatThread = threading.Thread(target=self._heartbeat)
-        self._heartbeatThread.start()
+            if request_info:
+                self.requestInfo()
+
+        self.heartbeatScheduler.register(self)
         self._readingThread = threading.Thread(target=self._readback)
         self._readingThread.start()
 
-        for entry in self.configEntries:
-            entry.writeToDevice()
-        return
+        with self.batch():
+            for entry in self.configEntries:
+                entry.writeToDevice()
+        return self
 
     def scanAndConnect(self, reset: bool = True, request_info: bool = True, configure_general: bool = True):
         """Scan all serial ports on the PC and connect to a SmartWave device if one is found.
@@ -293,18 +436,34 @@ class SmartWave(object):
         :raises ConnectionRefusedError: If no suitable device is found"""
 
         # scans all ports and autoconnects to matching id
-        ports = serial.tools.list_ports.comports()
-        for port in ports:
-            if (port.vid == SmartWave.VID and port.pid == SmartWave.PID) or (port.vid == 9025 and port.pid == 32847):
-                try:
-                    self._connectToSpecifiedPort(port.device, reset, request_info, configure_general)
-                    return self
-                except ConnectionRefusedError:
-                    # try another device
-                    pass
+        for port_name in SmartWave.findDevicePorts():
+            try:
+                self._connectToSpecifiedPort(port_name, reset, request_info, configure_general)
+                return self
+            except ConnectionRefusedError:
+                # try another device
+                transportLogger.debug("Could not connect to %s, trying the next port", port_name)
 
         raise ConnectionRefusedError("Could not find a suitable device to connect to")
 
+    @staticmethod
+    def findDevicePorts() -> List[str]:
+        """Scan all serial ports on the PC for SmartWave devices, without connecting to them.
+
+        :return: The names of the ports with a SmartWave device attached
+        :rtype: List[str]"""
+        return [port.device for port in SmartWave.findDevices()]
+
+    @staticmethod
+    def findDevices() -> List[ListPortInfo]:
+        """Scan all serial ports on the PC for SmartWave devices, without connecting to them.
+
+        :return: The ports with a SmartWave device attached, including e.g. their USB serial numbers
+        :rtype: List[ListPortInfo]"""
+        return [port for port in serial.tools.list_ports.comports()
+                if (port.vid == SmartWave.VID and port.pid == SmartWave.PID) or
+                (port.vid == 9025 and port.pid == 32847)]
+
     def connect(self,
                 port_name: str = None,
                 reset: bool = True,
@@ -334,83 +493,363 @@ class SmartWave(object):
 
         raise ConnectionRefusedError("Could not find specified serial port")
 
+    @contextmanager
+    def batch(self) -> Iterator["SmartWave"]:
+        """Collect all writes to the device of the current thread, and send them in a single write at the end.
+
+        Batches can be nested; the writes are sent when the outermost batch ends, also if it ends with an exception.
+        Waiting for a response from the device inside a batch sends the writes collected so far first.
+
+        :return: Self
+        :rtype: SmartWave"""
+        state = self._batchState
+        if getattr(state, "depth", 0) == 0:
+            state.buffer = bytearray()
+            state.depth = 0
+            with self._openBatchesLock:
+                self._openBatches += 1
+
+        state.depth += 1
+        try:
+            yield self
+        finally:
+            state.depth -= 1
+            if state.depth == 0:
+                try:
+                    self.flushBatch()
+                finally:
+                    with self._openBatchesLock:
+                        self._openBatches -= 1
+
+    def flushBatch(self):
+        """Send the writes collected by the current thread's batch to the device now, and continue the batch.
+
+        Does nothing outside of a batch.
+
+        :raises Exception: If the serial connection is not active"""
+        state = self._batchState
+        buffer = getattr(state, "buffer", None)
+        if buffer:
+            state.buffer = bytearray()
+            if self._heartbeatPending:
+                # the heartbeat was due while the batch was open; send it along instead of on its own
+                self._heartbeatPending = False
+                buffer.append(Command.Heartbeat.value)
+            self._writeToPort(buffer, True, None)
+
+    def _writeToDeviceNow(self, data: bytes):
+        """Write bare data to the connected device immediately, also inside a batch.
+
+        The writes collected by the current thread's batch are sent first, in the same write. This is used for
+        commands whose responses are matched to requests in the order they are sent.
+
+        :param bytes data: the data to write
+        :raises Exception: If the serial connection is not active"""
+        buffer = getattr(self._batchState, "buffer", None)
+        if buffer:
+            self._batchState.buffer = bytearray()
+            data = bytes(buffer) + data
+
+        self._writeToPort(data, True, None)
+
     def writeToDevice(self,
                       data: bytes,
                       acquire_lock: bool = True,
                       progress_callback: Optional[Callable[[int], None]] = None):
         """Write bare data to the connected device.
 
+        Inside a batch, the data is collected and sent at the end of the batch instead, unless a progress callback
+        is given.
+
         :param bytes data: the data to write
         :param bool acquire_lock: Whether to acquire lock for serial resource.
             Setting this to False may have adverse side effects.
         :param Optional[Callable[[int], None]] progress_callback: a callback to tell the progress of the transaction.
             Gives the progress in percent.
         :raises Exception: If the serial connection is not active"""
+        if getattr(self._batchState, "depth", 0) > 0:
+            if self._transport is None:
+                raise Exception("Not connected to a device")
+
+            if progress_callback is None:
+                self._batchState.buffer += data
+                return
+
+            # keep the order of the writes
+            self.flushBatch()
+
+        self._writeToPort(data, acquire_lock, progress_callback)
+
+    def writePartsToDevice(self,
+                           parts: Sequence[Union[bytes, bytearray, memoryview]],
+                           progress_callback: Optional[Callable[[int], None]] = None):
+        """Write several pieces of bare data to the connected device in order, as if they were one, without
+        concatenating them. This way large data, e.g. a memory-mapped image, is sent without copying it.
+
+        Inside a batch, the writes collected so far are sent first.
+
+        :param Sequence[Union[bytes, bytearray, memoryview]] parts: the pieces of data to write, in order
+        :param Optional[Callable[[int], None]] progress_callback: a callback to tell the progress of the transaction.
+            Gives the progress in percent.
+        :raises Exception: If the serial connection is not active"""
+        if getattr(self._batchState, "depth", 0) > 0:
+            self.flushBatch()
 
+        self._writePartsToPort(parts, True, progress_callback)
+
+    def _writeToPort(self,
+                     data: Union[bytes, bytearray, memoryview],
+                     acquire_lock: bool,
+                     progress_callback: Optional[Callable[[int], None]]):
+        """Write bare data to the transport of the connected device.
+
+        :param Union[bytes, bytearray, memoryview] data: the data to write
+        :param bool acquire_lock: Whether to acquire lock for serial resource.
+        :param Optional[Callable[[int], None]] progress_callback: a callback to tell the progress of the transaction.
+            Gives the progress in percent.
+        :raises Exception: If the serial connection is not active"""
+        self._writePartsToPort((data,), acquire_lock, progress_callback)
+
+    def _writePartsToPort(self,
+                          parts: Sequence[Union[bytes, bytearray, memoryview]],
+                          acquire_lock: bool,
+                          progress_callback: Optional[Callable[[int], None]]):
+        """Write pieces of bare data to the transport of the connected device, in order.
+
+        The data is written in chunks of writeChunkSize, or of the tuned chunk size if autoTuneChunkSize is set.
+        Chunks do not span pieces, and the pieces are sliced without copying them.
+
+        :param Sequence[Union[bytes, bytearray, memoryview]] parts: the pieces of data to write
+        :param bool acquire_lock: Whether to acquire lock for serial resource.
+        :param Optional[Callable[[int], None]] progress_callback: a callback to tell the progress of the transaction.
+            Gives the progress in percent.
+        :raises Exception: If the serial connection is not active"""
         if acquire_lock:
-            self._serialLock.acquire()
-        if self._serialPort is None:
+            self._acquireSerialLock()
+        try:
+            transport = self._transport
+            if transport is None:
+                raise Exception("Not connected to a device")
+
+            views = [memoryview(part).cast('B') for part in parts]
+            statistics = self.statistics
+            trace = self._trace
+            for view in views:
+                if statistics is not None:
+                    statistics.recordWrite(view)
+                if trace is not None:
+                    trace.sent(view)
+
+            length = sum(len(view) for view in views)
+            tuner = self._chunkSizeTuner if self.autoTuneChunkSize else None
+            chunkSize = tuner.chunkSize if tuner is not None else self.writeChunkSize
+            progress = 0
+            written = 0
+            for view in views:
+                i = 0
+                while i < len(view):
+                    chunk = view[i:i + chunkSize]
+                    if tuner is not None and not tuner.tuned:
+                        start = time.perf_counter()
+                        transport.write(chunk)
+                        tuner.record(len(chunk), time.perf_counter() - start)
+                        chunkSize = tuner.chunkSize
+                    else:
+                        transport.write(chunk)
+                    i += len(chunk)
+                    written += len(chunk)
+                    self._lastWrite = time.monotonic()
+
+                    if progress_callback is not None:
+                        new_progress = (written * 100) // length
+                        if new_progress != progress:
+                            progress_callback(new_progress)
+                            progress = new_progress
+        finally:
             if acquire_lock:
                 self._serialLock.release()
-            raise Exception("Not connected to a device")
 
-        chunkSize = 100
-        progress = 0
-        i = 0
-        while i < len(data):
-            self._serialPort.write(data[i:i+chunkSize])
-            i += chunkSize
-
-            if progress_callback is not None:
-                new_progress = (i * 100) // len(data)
-                if new_progress != progress:
-                    progress_callback(new_progress)
-                    progress = new_progress
+    def _acquireSerialLock(self):
+        """Acquire the serial lock, and record the time spent waiting for it if statistics are enabled."""
+        statistics = self.statistics
+        if statistics is None:
+            self._serialLock.acquire()
+            return
 
-        if acquire_lock:
-            self._serialLock.release()
+        start = time.perf_counter()
+        self._serialLock.acquire()
+        statistics.recordLockWait(time.perf_counter() - start)
+
+    def enableStatistics(self, statistics: Optional[Statistics] = None) -> Statistics:
+        """Start collecting statistics of the communication with the device.
+
+        :param Optional[Statistics] statistics: The statistics to add to. By default, the statistics collected so
+            far are continued, or new ones are created.
+        :return: The statistics which are collected
+        :rtype: Statistics"""
+        if statistics is None:
+            statistics = self.statistics if self.statistics is not None else Statistics()
+        self.statistics = statistics
+        return statistics
+
+    def disableStatistics(self):
+        """Stop collecting statistics of the communication with the device."""
+        self.statistics = None
+
+    def startRawTrace(self, received_path: str, sent_path: Optional[str] = None) -> RawTrace:
+        """Start writing the raw byte streams received from and sent to the device to files.
+
+        A trace or capture which is already running is stopped first.
+
+        :param str received_path: The file to write the bytes received from the device to
+        :param Optional[str] sent_path: The file to write the bytes sent to the device to, or None to not trace them
+        :return: The trace
+        :rtype: RawTrace
+        :raises OSError: If a file could not be opened"""
+        trace = RawTrace(received_path, sent_path)
+        self._replaceTrace(trace)
+        return trace
+
+    def stopRawTrace(self):
+        """Stop tracing the raw byte streams and close the files, if a trace or capture is running."""
+        self._replaceTrace(None)
+
+    def startCapture(self, path: str) -> CaptureWriter:
+        """Start recording the byte streams sent to and received from the device, with timestamps, to a capture file.
+
+        The capture can be read with a CaptureReader, or replayed with replayToDecoder() and replayToDevice().
+        A trace or capture which is already running is stopped first.
+
+        :param str path: The path of the capture file
+        :return: The capture
+        :rtype: CaptureWriter
+        :raises OSError: If the file could not be created"""
+        capture = CaptureWriter(path)
+        self._replaceTrace(capture)
+        return capture
+
+    def stopCapture(self):
+        """Stop recording the byte streams and close the file, if a trace or capture is running."""
+        self._replaceTrace(None)
+
+    def _replaceTrace(self, trace: Optional[Union[RawTrace, CaptureWriter]]):
+        """Replace the running trace or capture, and close the old one.
+
+        :param Optional[Union[RawTrace, CaptureWriter]] trace: The new trace or capture, or None to stop tracing"""
+        oldTrace = self._trace
+        self._trace = trace
+        if oldTrace is not None:
+            oldTrace.close()
 
     def isConnected(self) -> bool:
         """Return whether a device connection is currently active.
 
         :return: True if the device is connected, False otherwise"""
-        return self._serialPort is not None and self._serialPort.isOpen()
+        return self._transport is not None and self._transport.isOpen()
 
     def disconnect(self):
         """Disconnect from the connected device."""
         self._serialLock.acquire()
         if self.isConnected():
-            self._serialPort.flush()
-            self._serialPort.close()
+            self._transport.flush()
+            self._transport.close()
 
             self._serialLock.release()
-            self._heartbeatThread.join()
-            self._heartbeatThread = None
+            self.heartbeatScheduler.unregister(self)
             self._readingThread.join()
             self._readingThread = None
             self._serialLock.acquire()
-        self._serialPort = None
+            transportLogger.info("Disconnected from %r", self._transport)
+        self._transport = None
         self._serialLock.release()
+        # the device may be power cycled or reset before it is connected again
+        self._invalidateRegisterMaps()
+        self._discardPendingReadbacks()
 
     def trigger(self):
         """Start or Stop the current configuration on the connected device."""
-        self.writeToDevice(bytes([
-            Command.Trigger.value
+        self.triggerForConfig(None, None)
+
+    def stop(self, timeout: Optional[float] = None) -> bool:
+        """Stop the current configuration on the connected device, e.g. when it runs in TriggerMode.Full.
+
+        :param Optional[float] timeout: How long to wait for the device to report that it is idle in seconds,
+            or None to not wait. All readbacks the device sent before it stopped are handled once it reports idle.
+        :return: True if the device reported idle or timeout is None, False if the timeout passed first
+        :rtype: bool
+        :raises Exception: If the serial connection is not active"""
+        with self._idleCondition:
+            idleCount = self._idleCount
+
+        self._writeToDeviceNow(bytes([
+            Command.Stop.value
         ]))
 
+        if timeout is None:
+            return True
+        with self._idleCondition:
+            return self._idleCondition.wait_for(lambda: self._idleCount != idleCount, timeout)
+
+    def triggerForConfig(self, config: Optional[Config], request: Optional[Tuple[Future, bool]]):
+        """Trigger the connected device for a request of a config.
+
+        Every registered config queues the readback it expects from this trigger, in the same order as the
+        triggers are sent, so readbacks can be matched to the requests which caused them.
+
+        :param Optional[Config] config: The config which causes the trigger, or None
+        :param Optional[Tuple[Future, bool]] request: The future of the request which waits for the readback of
+            the config, and whether it resolves to the decoded result
+        :raises Exception: If the serial connection is not active"""
+        with self._triggerLock:
+            self._triggerCount += 1
+            queuedConfigs = [readbackConfig for readbackConfig in list(self._readbackConfigs.values())
+                             if readbackConfig.queueReadback(request if readbackConfig is config else None,
+                                                             self._triggerCount)]
+
+            # the readbacks can arrive before the write returns
+            statistics = self.statistics
+            if statistics is not None:
+                statistics.recordTrigger([readbackConfig.getRecorderId() for readbackConfig in queuedConfigs],
+                                         time.perf_counter())
+
+            try:
+                self._writeToDeviceNow(bytes([
+                    Command.Trigger.value
+                ]))
+            except Exception:
+                self._triggerCount -= 1
+                for readbackConfig in queuedConfigs:
+                    readbackConfig.unqueueReadback()
+                    if statistics is not None:
+                        statistics.discardTriggers(readbackConfig.getRecorderId())
+                raise
+
     def reset(self):
         """Reset the configuration of the connected device."""
-        for configEntry in self.configEntries:
-            configEntry.delete()
+        with self.batch():
+            for configEntry in self.configEntries:
+                configEntry.delete()
 
-        if self.isConnected():
-            self._resetDevice()
+            if self.isConnected():
+                self._resetDevice()
 
     def _resetDevice(self):
         """Cause the connected device to clear all existing configurations, without affecting python software state."""
         self.writeToDevice(bytes([
             Command.Reset.value
         ]))
+        self._invalidateRegisterMaps()
+        self._discardPendingReadbacks()
+
+    def _discardPendingReadbacks(self):
+        """Cancel the outstanding readback requests of all configs, as the device will not send their readbacks."""
+        for readbackConfig in list(self._readbackConfigs.values()):
+            readbackConfig.discardPendingReadbacks()
+
+    def _invalidateRegisterMaps(self):
+        """Forget the shadow values of all register maps of this device, as the values of its registers are unknown."""
+        for registerMap in list(self._registerMaps):
+            registerMap.invalidate()
 
     def configGeneral(self,
                       vddio: Union[float, None] = None,
@@ -463,6 +902,33 @@ class SmartWave(object):
         :raises ValueError: if vddio is not betweeen 1.6V and 5.0V, or exactly 0"""
         self.configGeneral(vddio=new_vddio)
 
+    @property
+    def writeChunkSize(self) -> int:
+        """The size of the pieces large writes to the device are split into, in bytes.
+
+        Ignored while autoTuneChunkSize is set. Defaults to the chunk size of the transport, which is 1024 bytes,
+        a multiple of the USB packet size, for serial ports."""
+        if self._writeChunkSize is not None:
+            return self._writeChunkSize
+        if self._transport is not None:
+            return self._transport.writeChunkSize
+        return Transport.writeChunkSize
+
+    @writeChunkSize.setter
+    def writeChunkSize(self, value: int):
+        """Set the size of the pieces large writes to the device are split into, in bytes.
+
+        :param int value: The chunk size in bytes
+        :raises ValueError: If the chunk size is smaller than 1"""
+        if value < 1:
+            raise ValueError("The write chunk size must be at least 1 byte")
+        self._writeChunkSize = value
+
+    @property
+    def chunkSizeTuner(self) -> ChunkSizeTuner:
+        """The tuner which measures the chunk size with the highest throughput while autoTuneChunkSize is set."""
+        return self._chunkSizeTuner
+
     @property
     def triggerMode(self) -> TriggerMode:
         """Get the current trigger mode of the connected device.
@@ -484,6 +950,14 @@ class SmartWave(object):
             Command.Info.value
         ]))
 
+    def waitForInfo(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the device answered requestInfo(), e.g. to read flashId after connecting.
+
+        :param Optional[float] timeout: How long to wait in seconds, default None to wait indefinitely
+        :return: True if the info was received, False if the timeout was exceeded
+        :rtype: bool"""
+        return self._infoReceived.wait(timeout)
+
     def getNextAvailableI2CDriver(self) -> I2CDriver:
         """Get the next available I2C Driver.
 
@@ -617,7 +1091,9 @@ class SmartWave(object):
         sdaPin = self.getPin(sda_pin_name) if sda_pin_name else None
         sclPin = self.getPin(scl_pin_name) if scl_pin_name else None
 
-        config: I2CConfig = I2CConfig(self, sdaPin, sclPin, clock_speed, scl_display_name, sda_display_name)
+        # send the whole configuration in a single write
+        with self.batch():
+            config: I2CConfig = I2CConfig(self, sdaPin, sclPin, clock_speed, scl_display_name, sda_display_name)
         self.configEntries.append(config)
 
         return config
@@ -664,22 +1140,24 @@ class SmartWave(object):
         mosiPin = self.getPin(mosi_pin_name) if mosi_pin_name else None
         csPin = self.getPin(cs_pin_name) if cs_pin_name else None
 
-        config: SPIConfig = SPIConfig(self,
-                                      sclkPin,
-                                      mosiPin,
-                                      misoPin,
-                                      csPin,
-                                      clock_speed,
-                                      bit_width,
-                                      bit_numbering,
-                                      cspol,
-                                      cpol,
-                                      cphase,
-                                      sclk_display_name,
-                                      mosi_display_name,
-                                      miso_display_name,
-                                      cs_display_name,
-                                      cs_inactive_time)
+        # send the whole configuration in a single write
+        with self.batch():
+            config: SPIConfig = SPIConfig(self,
+                                          sclkPin,
+                                          mosiPin,
+                                          misoPin,
+                                          csPin,
+                                          clock_speed,
+                                          bit_width,
+                                          bit_numbering,
+                                          cspol,
+                                          cpol,
+                                          cphase,
+                                          sclk_display_name,
+                                          mosi_display_name,
+                                          miso_display_name,
+                                          cs_display_name,
+                                          cs_inactive_time)
         self.configEntries.append(config)
 
         return config
@@ -722,9 +1200,36 @@ class SmartWave(object):
         if input_level_callback is not None:
             args["input_level_callback"] = input_level_callback
 
-        gpio: GPIO = GPIO(self, pin, **args)
+        # send the whole configuration in a single write
+        with self.batch():
+            gpio: GPIO = GPIO(self, pin, **args)
         return gpio
 
+    def registerReadbackConfig(self, config: Config):
+        """Register a config to receive the readbacks of its recorder.
+
+        Each config has its own recorder and its own queue of outstanding requests, so several configs can wait for
+        readbacks at the same time.
+
+        :param Config config: The config to register
+        :raises Exception: If another config is already registered for the same recorder"""
+        registeredConfig = self._readbackConfigs.get(config.getRecorderId())
+        if registeredConfig is not None and registeredConfig is not config:
+            raise Exception("There is already a config registered for recorder %d" % config.getRecorderId())
+
+        self._readbackConfigs[config.getRecorderId()] = config
+
+    def unregisterReadbackConfig(self, config: Config):
+        """Stop passing readbacks to a config, if it is registered.
+
+        :param Config config: The config to unregister"""
+        if self._readbackConfigs.get(config.getRecorderId()) is config:
+            del self._readbackConfigs[config.getRecorderId()]
+
+            statistics = self.statistics
+            if statistics is not None:
+                statistics.discardTriggers(config.getRecorderId())
+
     def removeConfig(self, config: Config):
         """Remove a config from the device.
 
@@ -747,40 +1252,125 @@ class SmartWave(object):
                            address.to_bytes(3, 'big') +
                            value.to_bytes(4, 'big'))
 
-    def _fpgaReadCallbackHandler(self, value: int):
-        """Handle the result of an FPGA register read."""
-        self._latestFpgaRead = value
-        self._fpgaReadSemaphore.release()
+    def writeFPGARegisters(self, registers: Union[Dict[int, int], Iterable[Tuple[int, int]]]):
+        """Write directly to several registers on the SmartWave's FPGA in one transfer.
+
+        All write commands are coalesced into a single write to the device, in the given order.
+        To write a range of registers, pass e.g. zip(range(start, start + 4 * len(values), 4), values).
+
+        :param Union[Dict[int, int], Iterable[Tuple[int, int]]] registers: The addresses and values to write,
+            as a dict or as (address, value) pairs
+        :raises ValueError: If an address does not fit into 3 bytes or a value does not fit into 4 bytes"""
+        if isinstance(registers, dict):
+            registers = registers.items()
+
+        words = []
+        for address, value in registers:
+            if not 0 <= address <= 0xffffff:
+                raise ValueError("FPGA register address %x does not fit into 3 bytes" % address)
+            # the command byte and the 3 address bytes form one big-endian word
+            words.append((Command.FpgaWrite.value << 24) | address)
+            words.append(value)
+
+        if len(words):
+            try:
+                self.writeToDevice(struct.pack('>%dI' % len(words), *words))
+            except struct.error:
+                raise ValueError("FPGA register value does not fit into 4 bytes")
+
+    def submitFPGARead(self, address: int) -> Future:
+        """Read directly from a register on the SmartWave's FPGA without waiting for the response.
 
-    def readFPGARegister(self, address: int, blocking: bool = True) -> Union[int, None]:
+        Several reads can be outstanding at the same time; the device answers them in the order they were sent.
+
+        :param int address: The address to read from
+        :return: A future which resolves to the content of the specified register
+        :rtype: Future[int]"""
+        return self.submitFPGAReads([address])[0]
+
+    def submitFPGAReads(self, addresses: Iterable[int]) -> List[Future]:
+        """Read directly from several registers on the SmartWave's FPGA without waiting for the responses.
+
+        All read commands are coalesced into a single write to the device, and the responses are collected in order.
+
+        :param Iterable[int] addresses: The addresses to read from, e.g. a range
+        :return: A future for each address, which resolves to the content of the register
+        :rtype: List[Future[int]]
+        :raises ValueError: If an address does not fit into 3 bytes"""
+        addresses = list(addresses)
+        for address in addresses:
+            if not 0 <= address <= 0xffffff:
+                raise ValueError("FPGA register address %x does not fit into 3 bytes" % address)
+
+        futures = [Future() for _ in addresses]
+        if not len(futures):
+            return futures
+
+        data = struct.pack('>%dI' % len(addresses),
+                           *[(Command.FpgaRead.value << 24) | address for address in addresses])
+        with self._fpgaReadLock:
+            self._pendingFpgaReads.extend(futures)
+            try:
+                self._writeToDeviceNow(data)
+            except Exception:
+                for _ in futures:
+                    self._pendingFpgaReads.pop()
+                raise
+
+        return futures
+
+    def readFPGARegister(self,
+                         address: int,
+                         blocking: bool = True,
+                         timeout: Union[float, None] = None) -> Union[int, None]:
         """Read directly from a register on the SmartWave's FPGA.
 
+        The result is also passed to singleAddressReadCallback, if one is registered.
+
         :param int address: The address to read from
         :param bool blocking: If true, wait for the response from the connected device
+        :param Union[float, None] timeout: How long to wait for the response from the device in seconds.
+            Ignored if blocking is set to False, default None to wait indefinitely.
         :return: If blocking == True, return the content of the specified register. Else return None.
         :rtype: Union[int, None]
-        :raises Exception: If the blocking mode is requested and another callback for a register read operation
-        is already registered"""
-        if blocking:
-            if self.singleAddressReadCallback is not None:
-                raise Exception("Cannot configure a blocking read operation because there is already a single-address"
-                                " read callback registered on the device")
-
-            self.singleAddressReadCallback = self._fpgaReadCallbackHandler
-
-        self.writeToDevice(bytes([Command.FpgaRead.value]) +
-                           address.to_bytes(3, 'big'))
-
-        if blocking:
-            # wait for read value
-            self._fpgaReadSemaphore.acquire()
+        :raises TimeoutError: If the timeout for reading back from the device is exceeded."""
+        future = self.submitFPGARead(address)
 
-            # release callback
-            self.singleAddressReadCallback = None
+        if not blocking:
+            return None
 
-            return self._latestFpgaRead
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # the response is dropped when it arrives
+            future.cancel()
+            raise TimeoutError("Timeout waiting for FPGA register read from device.")
+
+    def readFPGARegisters(self,
+                          addresses: Iterable[int],
+                          timeout: Union[float, None] = None) -> List[int]:
+        """Read directly from several registers on the SmartWave's FPGA in one pipelined transfer.
+
+        The results are also passed to singleAddressReadCallback, if one is registered.
+
+        :param Iterable[int] addresses: The addresses to read from, e.g. a range
+        :param Union[float, None] timeout: How long to wait for all responses from the device in seconds,
+            default None to wait indefinitely.
+        :return: The contents of the specified registers, in the order of the addresses
+        :rtype: List[int]
+        :raises ValueError: If an address does not fit into 3 bytes
+        :raises TimeoutError: If the timeout for reading back from the device is exceeded."""
+        futures = self.submitFPGAReads(addresses)
+        deadline = None if timeout is None else time.monotonic() + timeout
 
-        return None
+        try:
+            return [future.result(timeout=None if deadline is None else max(deadline - time.monotonic(), 0))
+                    for future in futures]
+        except FutureTimeoutError:
+            # the outstanding responses are dropped when they arrive
+            for future in futures:
+                future.cancel()
+            raise TimeoutError("Timeout waiting for FPGA register read from device.")
 
     def updateFirmware(self, firmware_path: Optional[str] = None):
         """Update the microcontroller firmware with a given firmware, or to the newest version.
@@ -793,40 +1383,23 @@ class SmartWave(object):
         :raises Exception: If the firmware file is incompatible with the bootloader
         :raises Exception: If the firmware size is incompatible with the bootloader"""
 
-        print("Updating firmware - do not disconnect your device. The device will disconnect and restart after the update is finished.")
-
-        f = open(firmware_path if firmware_path else
-                 os.path.join(os.path.dirname(os.path.abspath(__file__)), "newest_firmware.bin"), "rb")
-        f_check = open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "SBL_sample.bin"), "rb")
-
-        # check if given file is cropped (webgui) or raw (from arduino IDE)
-        f_size = f.seek(0, os.SEEK_END)
-        f_check_size = f_check.seek(0, os.SEEK_END)
-
-        if f_size == f_check_size:
-            cropped = False
-        elif f_size > self.FirmwareEnd - self.FirmwareStart:
-            cropped = True
-        else:
-            raise Exception("The size of the given file suggests that it is not a valid firmware")
-
-        if not cropped:
-            f.seek(self.SBLStart)
-            f_check.seek(self.SBLStart)
+        firmwareLogger.warning("Updating firmware - do not disconnect your device. "
+                               "The device will disconnect and restart after the update is finished.")
 
-            # check if SBL was changed
-            while f.tell() < self.FirmwareStart:
-                if f.read(1) != f_check.read(1):
-                    # the given firmware has a different SBL; will not be compatible
-                    raise Exception("The given firmware is not compatible with the current bootloader on the device!")
+        with FirmwareImage(firmware_path if firmware_path else
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), "newest_firmware.bin")) as image, \
+                FirmwareImage(os.path.join(os.path.dirname(os.path.abspath(__file__)), "SBL_sample.bin")) as reference:
+            firmware = validateFirmware(image.view(), reference.view(),
+                                        self.SBLStart, self.FirmwareStart, self.FirmwareEnd,
+                                        image.identity, reference.identity)
+            self._uploadFirmware(image.view(), firmware)
 
-            # check if firmware chunk is big enough
-            f.seek(self.FirmwareEnd)
-            for i in range(16):
-                if f.read(1) != b'\x00':
-                    raise Exception("The firmware size seems to be incompatible with the device!")
+    def _uploadFirmware(self, image: memoryview, firmware: ValidatedFirmware):
+        """Send a validated microcontroller firmware to the device.
 
-        dataLen = self.FirmwareEnd - self.FirmwareStart
+        :param memoryview image: The firmware image
+        :param ValidatedFirmware firmware: The result of validating the image"""
+        dataLen = firmware.length
         commands = bytes([
             Command.FirmwareUpdate.value,
             0x1b,
@@ -835,27 +1408,15 @@ class SmartWave(object):
             (dataLen >> 8) & 0xff,
             dataLen & 0xff
         ])
+        checksumArray = int.to_bytes(firmware.checksum, 4, "big")
 
-        f_start = self.FirmwareStart if not cropped else 0
-        f_end = self.FirmwareEnd if not cropped else dataLen
-
-        f.seek(f_start)
-        checksum = 0xC0DEF19E
-        while f.tell() <= f_end:
-            checksum += int.from_bytes(f.read(4), "little")
-        checksum %= 0x100000000
-
-        f.seek(f_start)
-        data = f.read(dataLen)
-
-        checksumArray = int.to_bytes(checksum, 4, "big")
+        # the image is sent straight from the mapping, without copying it
+        self.writePartsToDevice([commands, image[firmware.start:firmware.start + dataLen], checksumArray])
 
-        f.close()
-        f_check.close()
-
-        self.writeToDevice(commands + data + checksumArray)
-
-    def updateFPGABitstream(self, bitstream_path: Optional[str] = None, blocking: bool = True):
+    def updateFPGABitstream(self,
+                            bitstream_path: Optional[str] = None,
+                            blocking: bool = True,
+                            timeout: Optional[float] = None):
         """Update the FPGA bitstream with a given bitstream, or to the newest version.
 
         Also checks the bitstream file for plausibility and calculates the checksum.
@@ -863,30 +1424,44 @@ class SmartWave(object):
         :param Optional[str] bitstream_path: The path to the bitstream. If unspecified,
             upload newest packaged bitstream.
         :param bool blocking: Whether to wait until the bitstream update is finished
+        :param Optional[float] timeout: How long to wait for the update to finish in seconds, after the bitstream
+            was sent. Ignored if blocking is set to False, default None to wait indefinitely.
         :raises FileNotFoundError: If the bitstream file could not be found
-        :raises Exception: If the bitstream file is of the wrong size"""
-
-        print("Updating Bitstream - do not disconnect your device.")
-        f = open(bitstream_path if bitstream_path else
-                 os.path.join(os.path.dirname(os.path.abspath(__file__)), "newest_fpga_bitstream.bin"), "rb")
-
-        # size check
-        f.seek(0, os.SEEK_END)
-        fileSize = f.tell()
-        if fileSize != 0x21728c and fileSize != 0x3a607c:
-            raise Exception(
-                "The bitstream seems to be of the wrong size: 0x%x. Please check for correctness." % fileSize)
-
-        # checksum
-        f.seek(self.FPGABitstreamStart)
-        checksum = 0xC0DEF19E
-        while f.tell() + 4 <= fileSize and f.tell() + 4 <= self.FPGABitstreamEnd:
-            num = int.from_bytes(f.read(4), "big")
-            checksum += num
-            checksum %= 0x100000000
-
-        f.seek(self.FPGABitstreamStart)
-
+        :raises Exception: If the bitstream file is of the wrong size
+        :raises TimeoutError: If the update does not finish within the timeout"""
+
+        firmwareLogger.warning("Updating Bitstream - do not disconnect your device.")
+        with FirmwareImage(bitstream_path if bitstream_path else
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                        "newest_fpga_bitstream.bin")) as image:
+            bitstream = validateBitstream(image.view(), self.FPGABitstreamStart, self.FPGABitstreamEnd,
+                                          identity=image.identity)
+
+            # only this call waits for the end of this update, so no other update can finish it
+            finished = threading.Event()
+            if blocking:
+                self._bitstreamUpdateDoneCallback = finished.set
+            try:
+                self._uploadBitstream(image.view(), bitstream,
+                                      lambda p: logUpdateProgress("FPGA bitstream transfer status: %d%%", p))
+
+                if blocking and not finished.wait(timeout):
+                    raise TimeoutError("Timeout waiting for the FPGA bitstream update to finish.")
+            finally:
+                if blocking:
+                    self._bitstreamUpdateDoneCallback = None
+
+    def _uploadBitstream(self,
+                         image: memoryview,
+                         bitstream: ValidatedBitstream,
+                         progress_callback: Optional[Callable[[int], None]] = None):
+        """Send a validated FPGA bitstream to the device, without waiting for the update to finish.
+
+        :param memoryview image: The bitstream image
+        :param ValidatedBitstream bitstream: The result of validating the image
+        :param Optional[Callable[[int], None]] progress_callback: a callback to tell the progress of the transfer.
+            Gives the progress in percent."""
+        fileSize = bitstream.size
         commands = bytes([
             Command.FpgaUpdate.value,
             0x1c,
@@ -895,12 +1470,7 @@ class SmartWave(object):
             (fileSize >> 8) & 0xff,
             fileSize & 0xff
         ])
-        data = f.read()
-        checksumArray = checksum.to_bytes(4, "big")
-        f.close()
+        checksumArray = bitstream.checksum.to_bytes(4, "big")
 
-        self.writeToDevice(commands + data + checksumArray,
-                           progress_callback=lambda p : print("FPGA bitstream transfer status: %d%%" % p))
-
-        if blocking:
-            self._bitstreamUpdateSemaphore.acquire()
+        # the image is sent straight from the mapping, without copying it
+        self.writePartsToDevice([commands, image[bitstream.start:], checksumArray], progress_callback=progress_callback)